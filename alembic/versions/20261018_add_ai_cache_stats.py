@@ -0,0 +1,27 @@
+"""add ai cache hit/miss counters to transcriptions
+
+Revision ID: d5a1f7c3e842
+Revises: c2d9e4a7b130
+Create Date: 2026-10-18 15:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d5a1f7c3e842"
+down_revision = "c2d9e4a7b130"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    for name in ("ai_cache_hits", "ai_cache_misses"):
+        if name not in cols:
+            op.add_column("transcriptions", sa.Column(name, sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "ai_cache_misses")
+    op.drop_column("transcriptions", "ai_cache_hits")
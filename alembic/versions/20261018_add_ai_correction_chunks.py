@@ -0,0 +1,45 @@
+"""add ai_correction_chunks table and ai_failed_chunks column
+
+Revision ID: e7b4c2d9f156
+Revises: d5a1f7c3e842
+Create Date: 2026-10-18 16:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "e7b4c2d9f156"
+down_revision = "d5a1f7c3e842"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ai_correction_chunks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("transcription_id", sa.Integer(), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("source_hash", sa.String(length=64), nullable=False),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("tokens", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["transcription_id"], ["transcriptions.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("transcription_id", "chunk_index"),
+    )
+    op.create_index("ix_ai_correction_chunks_id", "ai_correction_chunks", ["id"])
+    op.create_index("ix_ai_correction_chunks_transcription_id", "ai_correction_chunks", ["transcription_id"])
+
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "ai_failed_chunks" not in cols:
+        op.add_column("transcriptions", sa.Column("ai_failed_chunks", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "ai_failed_chunks")
+    op.drop_index("ix_ai_correction_chunks_transcription_id", table_name="ai_correction_chunks")
+    op.drop_index("ix_ai_correction_chunks_id", table_name="ai_correction_chunks")
+    op.drop_table("ai_correction_chunks")
@@ -0,0 +1,28 @@
+"""add failed flag to transcription_chunks
+
+Revision ID: b4d6f8a2c913
+Revises: a9c3e5f71d24
+Create Date: 2026-10-18 21:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b4d6f8a2c913"
+down_revision = "a9c3e5f71d24"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcription_chunks)")]
+    if "failed" not in cols:
+        op.add_column(
+            "transcription_chunks",
+            sa.Column("failed", sa.Boolean(), nullable=True, server_default="0"),
+        )
+
+
+def downgrade():
+    op.drop_column("transcription_chunks", "failed")
@@ -0,0 +1,28 @@
+"""add completed_chunks counter to transcriptions
+
+Revision ID: b8f3a2c61e47
+Revises: a4c7e1b95d23
+Create Date: 2026-10-18 13:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b8f3a2c61e47"
+down_revision = "a4c7e1b95d23"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "completed_chunks" not in cols:
+        op.add_column(
+            "transcriptions",
+            sa.Column("completed_chunks", sa.Integer(), nullable=True, server_default="0"),
+        )
+
+
+def downgrade():
+    op.drop_column("transcriptions", "completed_chunks")
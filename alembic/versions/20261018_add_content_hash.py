@@ -0,0 +1,27 @@
+"""add content_hash column to transcriptions
+
+Revision ID: 8a1d3c6e2f01
+Revises: 7f37ef01ef87
+Create Date: 2026-10-18 10:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "8a1d3c6e2f01"
+down_revision = "7f37ef01ef87"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "content_hash" not in cols:
+        op.add_column("transcriptions", sa.Column("content_hash", sa.String(length=64), nullable=True))
+        op.create_index("ix_transcriptions_content_hash", "transcriptions", ["content_hash"])
+
+
+def downgrade():
+    op.drop_index("ix_transcriptions_content_hash", table_name="transcriptions")
+    op.drop_column("transcriptions", "content_hash")
@@ -0,0 +1,25 @@
+"""add duration_seconds to transcriptions
+
+Revision ID: c2d9e4a7b130
+Revises: b8f3a2c61e47
+Create Date: 2026-10-18 14:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c2d9e4a7b130"
+down_revision = "b8f3a2c61e47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "duration_seconds" not in cols:
+        op.add_column("transcriptions", sa.Column("duration_seconds", sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "duration_seconds")
@@ -0,0 +1,25 @@
+"""add estimated_cost to transcriptions
+
+Revision ID: d2f6b8c4e719
+Revises: c7e9a1b3d508
+Create Date: 2026-10-18 23:10:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d2f6b8c4e719"
+down_revision = "c7e9a1b3d508"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "estimated_cost" not in cols:
+        op.add_column("transcriptions", sa.Column("estimated_cost", sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "estimated_cost")
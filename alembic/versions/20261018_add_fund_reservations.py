@@ -0,0 +1,30 @@
+"""add reserved_balance to users and reserved_amount to transcriptions
+
+Revision ID: f3a8d1b6c592
+Revises: e7b4c2d9f156
+Create Date: 2026-10-18 18:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "f3a8d1b6c592"
+down_revision = "e7b4c2d9f156"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    user_cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(users)")]
+    if "reserved_balance" not in user_cols:
+        op.add_column("users", sa.Column("reserved_balance", sa.Float(), nullable=True, server_default="0"))
+
+    job_cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "reserved_amount" not in job_cols:
+        op.add_column("transcriptions", sa.Column("reserved_amount", sa.Float(), nullable=True, server_default="0"))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "reserved_amount")
+    op.drop_column("users", "reserved_balance")
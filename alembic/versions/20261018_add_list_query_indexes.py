@@ -0,0 +1,36 @@
+"""add composite indexes for dashboard and admin list queries
+
+Revision ID: a9c3e5f71d24
+Revises: f3a8d1b6c592
+Create Date: 2026-10-18 20:00:00
+"""
+
+from alembic import op
+
+revision = "a9c3e5f71d24"
+down_revision = "f3a8d1b6c592"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_transcriptions_user_id_timestamp", "transcriptions", ["user_id", "timestamp"]),
+    ("ix_transcriptions_timestamp", "transcriptions", ["timestamp"]),
+    ("ix_transcriptions_status", "transcriptions", ["status"]),
+    ("ix_transactions_user_id_timestamp", "transactions", ["user_id", "timestamp"]),
+    ("ix_transactions_timestamp", "transactions", ["timestamp"]),
+]
+
+
+def upgrade():
+    conn = op.get_bind()
+    for name, table, columns in INDEXES:
+        existing = [row[1] for row in conn.exec_driver_sql(f"PRAGMA index_list({table})")]
+        if name not in existing:
+            op.create_index(name, table, columns)
+    # آمار تازه برای انتخاب درست ایندکس‌ها توسط برنامه‌ریز SQLite
+    conn.exec_driver_sql("ANALYZE")
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,25 @@
+"""add progress_at to transcriptions
+
+Revision ID: c7e9a1b3d508
+Revises: b4d6f8a2c913
+Create Date: 2026-10-18 21:30:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c7e9a1b3d508"
+down_revision = "b4d6f8a2c913"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "progress_at" not in cols:
+        op.add_column("transcriptions", sa.Column("progress_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "progress_at")
@@ -0,0 +1,25 @@
+"""add total_chunks column to transcriptions
+
+Revision ID: a4c7e1b95d23
+Revises: 9b2e4d7f3a12
+Create Date: 2026-10-18 12:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "a4c7e1b95d23"
+down_revision = "9b2e4d7f3a12"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    cols = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transcriptions)")]
+    if "total_chunks" not in cols:
+        op.add_column("transcriptions", sa.Column("total_chunks", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transcriptions", "total_chunks")
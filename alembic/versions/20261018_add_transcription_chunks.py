@@ -0,0 +1,39 @@
+"""add transcription_chunks table for chunk-level checkpoints
+
+Revision ID: 9b2e4d7f3a12
+Revises: 8a1d3c6e2f01
+Create Date: 2026-10-18 11:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "9b2e4d7f3a12"
+down_revision = "8a1d3c6e2f01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "transcription_chunks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("transcription_id", sa.Integer(), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("start_sec", sa.Float(), nullable=False),
+        sa.Column("end_sec", sa.Float(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["transcription_id"], ["transcriptions.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("transcription_id", "chunk_index"),
+    )
+    op.create_index("ix_transcription_chunks_id", "transcription_chunks", ["id"])
+    op.create_index("ix_transcription_chunks_transcription_id", "transcription_chunks", ["transcription_id"])
+
+
+def downgrade():
+    op.drop_index("ix_transcription_chunks_transcription_id", table_name="transcription_chunks")
+    op.drop_index("ix_transcription_chunks_id", table_name="transcription_chunks")
+    op.drop_table("transcription_chunks")
@@ -1,7 +1,9 @@
 # app/celery_app.py
 
 import os
+import socket
 from celery import Celery
+from celery.signals import celeryd_after_setup
 from dotenv import load_dotenv
 from app.core.config import settings
 
@@ -17,6 +19,7 @@ celery_app = Celery(
     backend=settings.CELERY_RESULT_BACKEND,
     include=[
         "app.tasks.audio",
+        "app.tasks.parallel_audio",
         "app.tasks.text_tasks",
         "app.tasks.external_tasks",
         "app.tasks.maintenance",       # برای Beat schedule
@@ -52,6 +55,18 @@ celery_app.conf.task_routes = {
     "app.tasks.maintenance.*": {"queue": "maintenance"},
 }
 
+# صف اختصاصی هر میزبان: وقتی پوشهٔ کاری محلی است (tmpfs یا دیسک غیرمشترک)، فایل قطعه‌ها فقط روی
+# میزبان سازنده وجود دارد و تسک‌های قطعه و مرحلهٔ نهایی به workerهای همین میزبان سپرده می‌شوند؛
+# در این حالت یک کار فقط از workerهای یک میزبان استفاده می‌کند (WORKSPACE_SHARED این محدودیت را برمی‌دارد)
+HOST_QUEUE = f"host.{socket.gethostname()}"
+
+
+@celeryd_after_setup.connect
+def _consume_host_queue(sender, instance, **kwargs):
+    """هر worker علاوه بر صف‌های تعیین‌شده، صف میزبان خود را هم مصرف می‌کند"""
+    instance.app.amqp.queues.select_add(HOST_QUEUE)
+
+
 # تنظیمات خاص برای تسک‌ها
 celery_app.conf.task_annotations = {
     "app.tasks.audio.parallel_audio_job": {
@@ -77,6 +92,16 @@ celery_app.conf.beat_schedule = {
         "schedule": 3600,  # هر ساعت
         "options": {"queue": "maintenance"}
     },
+    "cleanup_workspaces": {
+        "task": "app.tasks.maintenance.cleanup_workspaces",
+        "schedule": 3600,  # هر ساعت
+        "options": {"queue": "maintenance"}
+    },
+    "sweep_stale_jobs": {
+        "task": "app.tasks.maintenance.sweep_stale_jobs",
+        "schedule": 600,  # هر ده دقیقه
+        "options": {"queue": "maintenance"}
+    },
     "update_daily_limits": {
         "task": "app.tasks.maintenance.reset_daily_limits",
         "schedule": 86400,  # روزانه
@@ -29,15 +29,136 @@ class Settings(BaseSettings):
     RAW_PREFIX: str = "(RAW)"
     TEXT_PREFIX: str = "(اصلاح متنی)"
 
+    # تنظیمات سرویس هوش مصنوعی
+    AI_API_URL: str = "https://api.gapgpt.app/v1/chat/completions"
+    AI_MODEL_NAME: str = "gpt-4"
+    AI_SYSTEM_PROMPT: str = "متن را ویرایش کن..."
+    AI_TEMPERATURE: float = 0.2
+    AI_API_TIMEOUT: int = 120  # ثانیه
+
+    # کلاینت HTTP مشترک هر پروسه برای سرویس هوش مصنوعی (اتصال‌های keep-alive)
+    AI_HTTP_POOL_SIZE: int = 16  # حداکثر اتصال باز هم‌زمان به سرویس
+    AI_HTTP2: bool = False  # نیازمند نصب httpx[http2]؛ در نبود آن requests استفاده می‌شود
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # ثانیه (فقط httpx)
+
     # حداکثر دفعات تلاش مجدد برای پردازش‌های مختلف
     AI_MAX_RETRIES: int = 3
     AUDIO_MAX_RETRIES: int = 3
 
+    # اصلاح خط لوله‌ای: گروه قطعه‌های پیاده‌شده با رسیدن به این تعداد توکن برای اصلاح ارسال می‌شوند
+    AI_PIPELINE_ENABLED: bool = True
+    AI_PIPELINE_CHUNK_TOKENS: int = 1500
+
+    # تقسیم متن برای اصلاح: بسته‌بندی جمله‌های کامل تا سقف توکن، با زمینهٔ اختیاری از قطعهٔ قبل
+    AI_CHUNK_MAX_TOKENS: int = 1500
+    AI_CHUNK_OVERLAP_TOKENS: int = 0
+    AI_TOKENIZER_ENCODING: str = "cl100k_base"  # فقط در صورت نصب بودن tiktoken
+
+    # موتور ناهمگام اصلاح متن: سقف درخواست‌های هم‌زمان هر worker و کل خوشه، و مهلت هر درخواست
+    AI_WORKER_CONCURRENCY: int = 8
+    AI_GLOBAL_CONCURRENCY: int = 32
+    AI_REQUEST_DEADLINE: float = 180.0  # ثانیه، شامل تلاش‌های مجدد
+
+    # برآورد پیش از اجرا: پاسخ حدود AI_COMPLETION_RATIO برابر ورودی؛ شروع کار نیازمند موجودی
+    # برآورد × AI_ESTIMATE_MARGIN است
+    AI_COMPLETION_RATIO: float = 1.1
+    AI_MESSAGE_OVERHEAD_TOKENS: int = 4
+    AI_ESTIMATE_MARGIN: float = 1.2
+
+    # تلاش مجدد تطبیقی و قطع‌کنندهٔ مدار مشترک سرویس هوش مصنوعی
+    AI_RETRY_MAX_WAIT: float = 30.0  # بیشترین انتظار درون یک تسک؛ Retry-After طولانی‌تر مدار را باز می‌کند
+    AI_CIRCUIT_FAILURE_THRESHOLD: int = 10  # خطای قابل تکرار در هر پنجره تا باز شدن مدار
+    AI_CIRCUIT_WINDOW: int = 60  # ثانیه
+    AI_CIRCUIT_OPEN_SECONDS: int = 60
+    AI_DEFER_MAX_RETRIES: int = 20  # دفعات به تعویق انداختن یک کار هنگام باز بودن مدار
+
+    # تلاش مجدد فقط برای قطعه‌های ناموفق؛ پس از آن کار با متن خام همان قطعه‌ها تکمیل می‌شود
+    AI_CHUNK_RETRY_ROUNDS: int = 2
+    AI_CHUNK_RETRY_BACKOFF: float = 5.0  # ثانیه، دو برابر در هر دور
+    AI_ALLOW_DEGRADED: bool = True  # False: کار ناموفق می‌شود ولی قطعه‌های موفق برای اجرای مجدد می‌مانند
+
+    # تنظیمات تقسیم فایل صوتی
+    AUDIO_CHUNK_SIZE: int = 50  # طول هر قطعه (ثانیه)
+    DEFAULT_AUDIO_LANG: str = "fa-IR"
+    FFMPEG_BINARY: str = "ffmpeg"
+    AUDIO_SAMPLE_RATE: int = 16000  # قالب مطلوب تشخیص‌دهنده: تک‌کاناله با این نرخ نمونه‌برداری
+
+    # بررسی سریع فایل هنگام آپلود (فقط خواندن هدر، بدون رمزگشایی)
+    FFPROBE_BINARY: str = "ffprobe"
+    AUDIO_PROBE_TIMEOUT: int = 20  # ثانیه
+    AUDIO_MAX_DURATION: int = 0  # حداکثر طول مجاز فایل (ثانیه)؛ صفر یعنی بدون محدودیت
+    AUDIO_TOKENS_PER_MINUTE: int = 350  # برآورد توکن متن پیاده‌شدهٔ هر دقیقه گفتار
+
+    # برش قطعات در مکث‌ها (VAD) به‌جای برش کور هر AUDIO_CHUNK_SIZE ثانیه
+    AUDIO_VAD_ENABLED: bool = True
+    AUDIO_MIN_CHUNK_SIZE: int = 20  # حداقل طول قطعه پیش از جستجوی مکث (ثانیه)
+    AUDIO_VAD_THRESHOLD_DB: float = -40.0  # فریم‌های آرام‌تر از این مقدار سکوت حساب می‌شوند
+    AUDIO_VAD_MIN_SILENCE_MS: int = 300
+
+    # تحویل قطعات: "memory" (بافر در حافظه یا یک فایل مشترک با offset در مسیر موازی) | "files"
+    AUDIO_CHUNK_HANDOFF: str = "memory"
+
+    # کش نتایج قطعه‌ها: "sqlite" | "redis" | "none"
+    RESULT_CACHE_BACKEND: str = "sqlite"
+    RESULT_CACHE_PATH: str = "cache/results.db"
+    RESULT_CACHE_MAX_ENTRIES: int = 200_000  # حذف LRU پس از این تعداد (فقط sqlite)
+    RESULT_CACHE_TTL: int = 30 * 24 * 3600  # ثانیه (فقط redis)
+    RESULT_CACHE_REDIS_URL: str = "redis://localhost:6379/2"
+    # خواندن‌ها (زمان آخرین استفاده و شمارندهٔ hit/miss) دسته‌ای نوشته می‌شوند: هر N خواندن یا هر چند ثانیه
+    RESULT_CACHE_FLUSH_EVERY: int = 64
+    RESULT_CACHE_FLUSH_INTERVAL: float = 5.0
+
+    # کش اصلاح متن با هوش مصنوعی: "sqlite" | "redis" | "tiered" (SQLite محلی جلوی Redis) | "none"
+    AI_CACHE_BACKEND: str = "sqlite"
+    AI_CACHE_MAX_BYTES: int = 512 * 1024 ** 2  # حذف LRU پس از این حجم (لایهٔ sqlite)
+
+    # محدودیت نرخ مشترک فراخوانی تشخیص‌دهنده در همهٔ workerها (درخواست در ثانیه)
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/2"
+    RATE_LIMIT_MAX_WAIT: float = 300.0  # حداکثر انتظار برای مجوز (ثانیه)
+    RATE_LIMIT_INCREASE_STEP: float = 0.05  # افزایش نرخ پس از هر پاسخ موفق
+    RECOGNIZER_RATE_LIMIT: float = 5.0  # نرخ اولیه
+    RECOGNIZER_RATE_BURST: int = 10
+    RECOGNIZER_RATE_MIN: float = 0.5
+    RECOGNIZER_RATE_MAX: float = 20.0
+    RECOGNIZER_LATENCY_TARGET: float = 8.0  # پاسخ کندتر از این (ثانیه) نرخ را کمی کم می‌کند
+
+    # استفادهٔ مجدد از نتیجهٔ فایل‌های تکراری (هش SHA-256 محتوا + زبان)
+    DEDUP_ENABLED: bool = True
+    DEDUP_SCOPE: str = "user"  # "user": فقط فایل‌های همان کاربر | "global"
+    DEDUP_BILLING: str = "charge"  # "charge": کسر هزینهٔ AI مانند اجرای جدید | "free"
+
+    # دیتابیس و پروفایل تولید SQLite (وب و همهٔ workerها روی یک فایل می‌نویسند)
+    DATABASE_URL: str = "sqlite:///./transcriber.db"
+    ASYNC_DATABASE_URL: str = ""  # خالی: همان DATABASE_URL با درایور aiosqlite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # در WAL فقط هنگام checkpoint همگام‌سازی کامل می‌شود
+    SQLITE_BUSY_TIMEOUT_MS: int = 30_000  # انتظار برای قفل نوشتن پیش از خطای «database is locked»
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE: int = 256 * 1024 ** 2
+    SQLITE_WRITE_RETRIES: int = 5  # تکرار تراکنش‌های نوشتنی کوتاه پس از پایان busy_timeout
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+
     # مسیر دایرکتوری‌های پروژه برای فایل‌های ایستا، قالب‌ها و آپلودها
     STATIC_DIR: str = "static"
     TEMPLATES_DIR: str = "templates"
     UPLOADS_DIR: str = "uploads"
 
+    # پوشه‌های کاری موقت هر کار؛ در صورت تنظیم WORKSPACE_TMPFS_DIR (مثلاً /dev/shm/transcriber) روی tmpfs
+    WORKSPACE_DIR: str = "uploads/work"
+    WORKSPACE_TMPFS_DIR: str = ""
+    # WORKSPACE_DIR روی ذخیره‌ساز مشترک همهٔ میزبان‌هاست (مثلاً NFS)؛ در این صورت (و بدون tmpfs) قطعه‌های
+    # یک کار به صف میزبان سازنده محدود نمی‌شوند و بین workerهای همهٔ میزبان‌ها پخش می‌شوند
+    WORKSPACE_SHARED: bool = False
+    WORKSPACE_MAX_BYTES: int = 5 * 1024 ** 3  # سقف حجم کل پوشه‌های کاری
+    WORKSPACE_ORPHAN_MAX_AGE: int = 6 * 3600  # پوشه‌های کارهای پایان‌یافته یا قدیمی‌تر از این (ثانیه) حذف می‌شوند
+    WORKSPACE_RETRY_DELAY: int = 60  # کار جدید وقتی سقف پر از کارهای در حال اجراست پس از این مدت (ثانیه) دوباره تلاش می‌کند
+    WORKSPACE_MAX_WAIT_RETRIES: int = 60
+
+    # کار قطعه‌ای که شمارنده‌اش این مدت (ثانیه) جلو نرفته گیرکرده است (worker از کار افتاده، پیام گم‌شده)
+    STALE_JOB_TIMEOUT: int = 3600
+
     # تنظیمات پایه برای بارگذاری فایل .env و محدود کردن مقادیر اضافی
     model_config = SettingsConfigDict(
         env_file=".env",
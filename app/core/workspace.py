@@ -0,0 +1,141 @@
+# app/core/workspace.py
+# پوشهٔ کاری موقت هر کار (قطعه‌های صوتی، فایل‌های دانلودشده و ...) با سقف حجم کل
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# وضعیت‌هایی که پوشهٔ کاری‌شان دیگر لازم نیست
+FINISHED_STATUSES = ("completed", "failed", "canceled")
+
+
+class WorkspaceBudgetExceeded(RuntimeError):
+    """حجم پوشه‌های کارهای در حال اجرا به سقف رسیده است؛ کار جدید باید بعداً دوباره تلاش کند"""
+
+
+class WorkspaceManager:
+    """
+    برای هر کار یک پوشهٔ job_<id> می‌سازد؛ اگر WORKSPACE_TMPFS_DIR تنظیم و قابل نوشتن باشد
+    پوشه‌ها روی tmpfs (حافظه) ساخته می‌شوند. با ساخت هر پوشه، اگر حجم کل از
+    WORKSPACE_MAX_BYTES بیشتر شود قدیمی‌ترین پوشه‌های کارهای پایان‌یافته حذف می‌شوند؛
+    پوشهٔ کارهای در حال اجرا هرگز حذف نمی‌شود و اگر جا باز نشود کار جدید رد می‌شود.
+    """
+
+    def __init__(
+        self,
+        tmpfs_dir: Optional[str] = None,
+        disk_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        shared: Optional[bool] = None,
+    ):
+        self.tmpfs_dir = tmpfs_dir if tmpfs_dir is not None else settings.WORKSPACE_TMPFS_DIR
+        self.disk_dir = disk_dir or settings.WORKSPACE_DIR
+        self.max_bytes = max_bytes or settings.WORKSPACE_MAX_BYTES
+        self.shared = shared if shared is not None else settings.WORKSPACE_SHARED
+
+    @property
+    def root(self) -> Path:
+        if self.tmpfs_dir and os.path.isdir(self.tmpfs_dir) and os.access(self.tmpfs_dir, os.W_OK):
+            return Path(self.tmpfs_dir)
+        return Path(self.disk_dir)
+
+    @property
+    def host_local(self) -> bool:
+        """پوشه‌های کاری فقط روی همین میزبان در دسترس‌اند (tmpfs، یا دیسکی که مشترک اعلام نشده)"""
+        return self.root != Path(self.disk_dir) or not self.shared
+
+    def path_for(self, job_id: int) -> Path:
+        return self.root / f"job_{job_id}"
+
+    def acquire(self, job_id: int) -> Path:
+        """
+        ساخت (یا بازگرداندن) پوشهٔ کار و اعمال سقف حجم. اگر پس از حذف پوشه‌های
+        کارهای پایان‌یافته هنوز جایی نماند، برای کار جدید WorkspaceBudgetExceeded
+        برانگیخته می‌شود (اجرای مجدد کاری که پوشه‌اش موجود است رد نمی‌شود).
+        """
+        path = self.path_for(job_id)
+        _, total = self._evict(keep=path)
+        if total >= self.max_bytes and not path.exists():
+            raise WorkspaceBudgetExceeded(
+                f"Workspace budget exhausted by running jobs ({total} >= {self.max_bytes} bytes)"
+            )
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def release(self, job_id: int):
+        """حذف کامل پوشهٔ کار؛ در پایان موفق، شکست یا لغو فراخوانی می‌شود"""
+        for root in {Path(self.disk_dir), self.root}:
+            shutil.rmtree(root / f"job_{job_id}", ignore_errors=True)
+
+    def workspaces(self) -> List[Path]:
+        """همهٔ پوشه‌های کار، از قدیمی به جدید"""
+        found = []
+        for root in {Path(self.disk_dir), self.root}:
+            if root.is_dir():
+                found.extend(p for p in root.iterdir() if p.is_dir() and p.name.startswith("job_"))
+        return sorted(found, key=lambda p: p.stat().st_mtime)
+
+    @staticmethod
+    def size_of(path: Path) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        return total
+
+    @staticmethod
+    def job_id_of(path: Path) -> Optional[int]:
+        suffix = path.name.removeprefix("job_")
+        return int(suffix) if suffix.isdigit() else None
+
+    def active_job_ids(self, job_ids: List[int]) -> Set[int]:
+        """شناسهٔ کارهایی از این فهرست که هنوز پایان نیافته‌اند (پوشه‌شان قابل حذف نیست)"""
+        if not job_ids:
+            return set()
+        from app import models
+        from app.database import SessionLocal
+
+        job = models.TranscriptionFile
+        db = SessionLocal()
+        try:
+            rows = db.query(job.id).filter(job.id.in_(job_ids), job.status.notin_(FINISHED_STATUSES)).all()
+        finally:
+            db.close()
+        return {row[0] for row in rows}
+
+    def _evict(self, keep: Optional[Path] = None) -> Tuple[int, int]:
+        spaces = self.workspaces()
+        sizes = {p: self.size_of(p) for p in spaces}
+        total = sum(sizes.values())
+        evicted = 0
+        if total <= self.max_bytes:
+            return evicted, total
+
+        active = self.active_job_ids([i for i in map(self.job_id_of, spaces) if i is not None])
+        for path in spaces:
+            if total <= self.max_bytes:
+                break
+            if path == keep or self.job_id_of(path) in active:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+            evicted += 1
+            logger.warning(f"Workspace evicted (budget exceeded): {path}")
+        return evicted, total
+
+    def enforce_budget(self, keep: Optional[Path] = None) -> int:
+        """حذف قدیمی‌ترین پوشه‌های کارهای پایان‌یافته تا حجم کل زیر سقف برود؛ تعداد حذف‌شده برگردانده می‌شود"""
+        return self._evict(keep)[0]
+
+
+workspace_manager = WorkspaceManager()
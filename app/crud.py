@@ -11,6 +11,7 @@ from datetime import date, datetime, timezone, timedelta
 from typing import List, Optional
 
 import docx
+from sqlalchemy import update
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session
 
@@ -105,21 +106,28 @@ def create_transaction(
 def adjust_user_balance(db: Session, user: models.User, amount: float, description: str):
     if amount == 0:
         return
-    user.wallet_balance += amount
+    # UPDATE نسبی اتمیک؛ ثبت دفتر در همان تراکنش
+    db.execute(
+        update(models.User)
+        .where(models.User.id == user.id)
+        .values(wallet_balance=models.User.wallet_balance + amount)
+    )
     create_transaction(db, user.id, amount, description, user.token_price)
     db.commit()
-    db.refresh(user)
     logger.info(f"Balance adjusted for {user.username}: {amount}")
 
 def debit_from_wallet(db: Session, user: models.User, cost: float, description: str):
-    db.refresh(user)
-    if user.wallet_balance < cost:
+    # بررسی موجودی و کسر در یک دستور شرطی؛ بدون refresh و بدون رقابت بین کارهای هم‌زمان
+    result = db.execute(
+        update(models.User)
+        .where(models.User.id == user.id, models.User.wallet_balance >= cost)
+        .values(wallet_balance=models.User.wallet_balance - cost)
+    )
+    if result.rowcount != 1:
         logger.warning(f"Insufficient balance for user {user.username}")
         raise ValueError("موجودی ناکافی برای این عملیات")
-    user.wallet_balance -= cost
     create_transaction(db, user.id, -cost, description, user.token_price)
     db.commit()
-    db.refresh(user)
     logger.info(f"Debited {cost} from {user.username}")
 
 # =============================================================================
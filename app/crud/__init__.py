@@ -2,6 +2,7 @@
 from .users import (
     get_user,
     get_user_by_username,
+    get_user_by_username_async,
     get_users,
     create_user,
     update_user_password,
@@ -12,18 +13,44 @@ from .users import (
 from .transactions import (
     create_transaction,
     adjust_user_balance,
-    debit_from_wallet
+    debit_from_wallet,
+    get_user_transactions,
+    get_user_transactions_count,
+    get_all_transactions,
+    get_all_transactions_count,
+    available_balance,
+    reserve_funds,
+    settle_reserved_funds,
+    release_reserved_funds
 )
 
 # Import transcriptions functions
 from .transcriptions import (
     create_transcription_record,
     get_user_transcriptions,
+    get_user_transcriptions_async,
     get_user_transcriptions_count,
+    get_all_transcriptions,
+    get_all_transcriptions_count,
     set_task_id,
+    start_chunk_progress,
+    set_total_chunks,
     update_transcription_status,
     finalize_job,
-    get_job
+    get_job,
+    find_reusable_transcription,
+    clone_transcription_result
+)
+
+# Import chunk checkpoint functions
+from .chunks import (
+    get_job_chunks,
+    get_completed_chunk_indexes,
+    save_chunk_result,
+    reset_failed_chunks,
+    get_partial_transcript,
+    get_ai_chunk_results,
+    save_ai_chunk_result
 )
 
 # Import settings functions
@@ -42,6 +69,7 @@ __all__ = [
     # Users
     'get_user',
     'get_user_by_username',
+    'get_user_by_username_async',
     'get_users',
     'create_user',
     'update_user_password',
@@ -51,15 +79,39 @@ __all__ = [
     'create_transaction',
     'adjust_user_balance',
     'debit_from_wallet',
+    'get_user_transactions',
+    'get_user_transactions_count',
+    'get_all_transactions',
+    'get_all_transactions_count',
+    'available_balance',
+    'reserve_funds',
+    'settle_reserved_funds',
+    'release_reserved_funds',
 
     # Transcriptions
     'create_transcription_record',
     'get_user_transcriptions',
+    'get_user_transcriptions_async',
     'get_user_transcriptions_count',
+    'get_all_transcriptions',
+    'get_all_transcriptions_count',
     'set_task_id',
+    'start_chunk_progress',
+    'set_total_chunks',
     'update_transcription_status',
     'finalize_job',
     'get_job',
+    'find_reusable_transcription',
+    'clone_transcription_result',
+
+    # Chunks
+    'get_job_chunks',
+    'get_completed_chunk_indexes',
+    'save_chunk_result',
+    'reset_failed_chunks',
+    'get_partial_transcript',
+    'get_ai_chunk_results',
+    'save_ai_chunk_result',
 
     # Settings
     'get_setting',
@@ -0,0 +1,139 @@
+# app/crud/chunks.py
+# ذخیره و بازیابی نتایج قطعه‌های صوتی و قطعه‌های اصلاح متن هر کار (checkpoint)
+from datetime import datetime
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app import models
+from app.database import retry_on_locked
+
+def get_job_chunks(db: Session, record_id: int):
+    return (
+        db.query(models.TranscriptionChunk)
+        .filter(models.TranscriptionChunk.transcription_id == record_id)
+        .order_by(models.TranscriptionChunk.chunk_index)
+        .all()
+    )
+
+# اندیس قطعه‌هایی که متن نهایی دارند و نیازی به ارسال دوباره ندارند
+def get_completed_chunk_indexes(db: Session, record_id: int) -> set[int]:
+    rows = (
+        db.query(models.TranscriptionChunk.chunk_index)
+        .filter(
+            models.TranscriptionChunk.transcription_id == record_id,
+            models.TranscriptionChunk.text.isnot(None),
+        )
+        .all()
+    )
+    return {r[0] for r in rows}
+
+@retry_on_locked
+def save_chunk_result(
+    db: Session, record_id: int, chunk: dict, text: str | None, attempts: int
+) -> tuple[int, int, bool]:
+    """
+    ذخیرهٔ نتیجهٔ قطعه (متن، یا شکست پس از همهٔ تلاش‌ها) و به‌روزرسانی شمارندهٔ قطعه‌های
+    پایان‌یافتهٔ کار از روی شمار ردیف‌های پایان‌یافته (نه +۱)، تا تحویل تکراری یک قطعه دوبار
+    شمرده نشود. (پایان‌یافته، کل، جلو رفتن شمارنده با همین فراخوانی) برگردانده می‌شود؛
+    فقط فراخوانی‌ای که شمارنده را جلو برده و به کل رسانده مرحلهٔ نهایی را آغاز می‌کند.
+    کل تا پایان تقسیم فایل None است.
+    """
+    row = (
+        db.query(models.TranscriptionChunk)
+        .filter_by(transcription_id=record_id, chunk_index=chunk["index"])
+        .first()
+    )
+    if row is None:
+        row = models.TranscriptionChunk(transcription_id=record_id, chunk_index=chunk["index"], attempts=0)
+        db.add(row)
+    row.start_sec = chunk["start"]
+    row.end_sec = chunk["end"]
+    row.attempts = (row.attempts or 0) + attempts
+    if text is not None:
+        row.text = text
+        row.failed = False
+    elif row.text is None:
+        # شکست تحویل تکراری، متن موفق تحویل قبلی همین قطعه را پاک نمی‌کند
+        row.failed = True
+    db.flush()
+
+    part = models.TranscriptionChunk
+    finished = (
+        db.query(func.count(part.id))
+        .filter(part.transcription_id == record_id, or_(part.text.isnot(None), part.failed.is_(True)))
+        .scalar()
+    )
+    # UPDATE شرطی: فقط وقتی شمارنده واقعاً جلو می‌رود یک ردیف تغییر می‌کند
+    job = models.TranscriptionFile
+    advanced = (
+        db.query(job)
+        .filter(job.id == record_id, func.coalesce(job.completed_chunks, 0) < finished)
+        .update({job.completed_chunks: finished, job.progress_at: datetime.utcnow()}, synchronize_session=False)
+    ) == 1
+    total = db.query(job.total_chunks).filter(job.id == record_id).scalar()
+    db.commit()
+    return finished, total, advanced
+
+# پاک کردن علامت شکست قطعه‌ها در آغاز اجرای دوباره؛ این قطعه‌ها دوباره ارسال و شمرده می‌شوند
+@retry_on_locked
+def reset_failed_chunks(db: Session, record_id: int):
+    db.query(models.TranscriptionChunk).filter(
+        models.TranscriptionChunk.transcription_id == record_id,
+        models.TranscriptionChunk.failed.is_(True),
+    ).update({models.TranscriptionChunk.failed: False}, synchronize_session=False)
+    db.commit()
+
+# متن جزئی (قطعه‌های تکمیل‌شده به ترتیب) و درصد پیشرفت یک کار در حال اجرا
+def get_partial_transcript(db: Session, record: models.TranscriptionFile) -> dict:
+    chunks = get_job_chunks(db, record.id)
+    done = [c for c in chunks if c.text is not None]
+    total = record.total_chunks or 0
+
+    if record.status == "completed":
+        progress = 100
+    elif total:
+        progress = min(99, int(len(done) * 100 / total))
+    else:
+        progress = 0
+
+    return {
+        "job_id": record.id,
+        "status": record.status,
+        "progress": progress,
+        "completed_chunks": len(done),
+        "total_chunks": total,
+        "text": "\n".join(c.text.strip() for c in done if c.text.strip()),
+    }
+
+# نتایج اصلاح قطعه‌های متن یک کار، بر اساس اندیس قطعه
+def get_ai_chunk_results(db: Session, record_id: int) -> dict[int, models.AICorrectionChunk]:
+    rows = (
+        db.query(models.AICorrectionChunk)
+        .filter(models.AICorrectionChunk.transcription_id == record_id)
+        .all()
+    )
+    return {r.chunk_index: r for r in rows}
+
+@retry_on_locked
+def save_ai_chunk_result(
+    db: Session,
+    record_id: int,
+    chunk_index: int,
+    source_hash: str,
+    text: str | None,
+    tokens: int = 0,
+):
+    """ثبت نتیجهٔ یک تلاش اصلاح؛ text=None یعنی این تلاش ناموفق بود"""
+    row = (
+        db.query(models.AICorrectionChunk)
+        .filter_by(transcription_id=record_id, chunk_index=chunk_index)
+        .first()
+    )
+    if row is None:
+        row = models.AICorrectionChunk(transcription_id=record_id, chunk_index=chunk_index, attempts=0)
+        db.add(row)
+    row.source_hash = source_hash
+    row.text = text
+    row.tokens = tokens
+    row.attempts = (row.attempts or 0) + 1
+    db.commit()
@@ -1,6 +1,8 @@
 # app/crud/transactions.py
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app import models
+from app.database import retry_on_locked
 from app.utils.time import now_tehran  # تغییر اینجا
 
 def create_transaction(db: Session, user_id: int, amount: float, description: str, token_price: float | None = None):
@@ -14,19 +16,154 @@ def create_transaction(db: Session, user_id: int, amount: float, description: st
     db.add(tx)
     return tx
 
+# تغییر موجودی با یک UPDATE نسبی در پایگاه داده (نه خواندن، تغییر در پایتون و نوشتن)
+# تا کارهای هم‌زمان یک کاربر به‌روزرسانی یکدیگر را از بین نبرند؛ ثبت دفتر در همان تراکنش است
 def adjust_user_balance(db: Session, user: models.User, amount: float, description: str):
     if amount == 0:
         return
-    user.wallet_balance += amount
+    db.execute(
+        update(models.User)
+        .where(models.User.id == user.id)
+        .values(wallet_balance=models.User.wallet_balance + amount)
+    )
     create_transaction(db, user.id, amount, description, user.token_price)
     db.commit()
-    db.refresh(user)
+
+def available_balance(user: models.User) -> float:
+    # موجودی قابل خرج: موجودی کیف پول منهای مبالغ رزروشدهٔ کارهای در حال اجرا
+    return (user.wallet_balance or 0.0) - (user.reserved_balance or 0.0)
 
 def debit_from_wallet(db: Session, user: models.User, cost: float, description: str):
-    db.refresh(user)
-    if user.wallet_balance < cost:
+    # بررسی موجودی و کسر در یک دستور شرطی؛ اگر ردیفی تغییر نکند موجودی کافی نبوده است.
+    # مبالغ رزروشدهٔ کارهای دیگر قابل خرج نیستند.
+    result = db.execute(
+        update(models.User)
+        .where(
+            models.User.id == user.id,
+            models.User.wallet_balance - models.User.reserved_balance >= cost,
+        )
+        .values(wallet_balance=models.User.wallet_balance - cost)
+    )
+    if result.rowcount != 1:
         raise ValueError("موجودی ناکافی برای این عملیات")
-    user.wallet_balance -= cost
     create_transaction(db, user.id, -cost, description, user.token_price)
     db.commit()
-    db.refresh(user)
\ No newline at end of file
+
+# ─── گزارش تراکنش‌ها ────────────────────────────────────────────────────────
+# مرتب‌سازی زمانی از ایندکس‌های (user_id, timestamp) و (timestamp) خوانده می‌شود
+
+def get_user_transactions(db: Session, user_id: int, skip: int = 0, limit: int = 15):
+    return (
+        db.query(models.Transaction)
+        .filter(models.Transaction.user_id == user_id)
+        .order_by(models.Transaction.timestamp.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+def get_user_transactions_count(db: Session, user_id: int) -> int:
+    return db.query(models.Transaction).filter(models.Transaction.user_id == user_id).count()
+
+def get_all_transactions(db: Session, username_filter: str | None = None, skip: int = 0, limit: int = 15):
+    q = db.query(models.Transaction).join(models.User)
+    if username_filter:
+        q = q.filter(models.User.username.contains(username_filter))
+    return q.order_by(models.Transaction.timestamp.desc()).offset(skip).limit(limit).all()
+
+def get_all_transactions_count(db: Session, username_filter: str | None = None) -> int:
+    q = db.query(models.Transaction).join(models.User)
+    if username_filter:
+        q = q.filter(models.User.username.contains(username_filter))
+    return q.count()
+
+# ─── رزرو هزینهٔ کارها ───────────────────────────────────────────────────────
+# هر کار پیش از شروع کار پرهزینه مبلغ برآوردی‌اش را رزرو می‌کند (reserved_amount
+# روی خود کار و مجموع آن در users.reserved_balance)، در پایان به هزینهٔ واقعی تسویه
+# می‌شود و در شکست یا لغو آزاد می‌شود؛ کارهای هم‌زمان نمی‌توانند موجودی رزروشده را خرج کنند.
+
+@retry_on_locked
+def reserve_funds(db: Session, user: models.User, record: models.TranscriptionFile, amount: float):
+    # در اجرای دوباره (تعویق یا تلاش مجدد) فقط اختلاف با رزرو قبلی همین کار اعمال می‌شود
+    delta = amount - (record.reserved_amount or 0.0)
+    if delta > 0:
+        result = db.execute(
+            update(models.User)
+            .where(
+                models.User.id == user.id,
+                models.User.wallet_balance - models.User.reserved_balance >= delta,
+            )
+            .values(reserved_balance=models.User.reserved_balance + delta)
+        )
+        if result.rowcount != 1:
+            raise ValueError("موجودی در دسترس برای رزرو هزینهٔ این کار کافی نیست")
+    elif delta < 0:
+        db.execute(
+            update(models.User)
+            .where(models.User.id == user.id)
+            .values(reserved_balance=models.User.reserved_balance + delta)
+        )
+    record.reserved_amount = amount
+    db.commit()
+
+@retry_on_locked
+def settle_reserved_funds(
+    db: Session, user: models.User, record: models.TranscriptionFile, cost: float, description: str
+) -> float:
+    # آزادسازی رزرو با همان شرط release_reserved_funds (رزروی که لغو یا شکست هم‌زمان آزاد کرده
+    # دوباره کم نمی‌شود) و کسر هزینهٔ واقعی در همان تراکنش. کار انجام و توکن‌ها مصرف شده‌اند،
+    # پس کمبود موجودی کار را ناموفق نمی‌کند: کسر تا سقف موجودی آزاد و کسری در دفتر ثبت می‌شود.
+    # مقدار بازگشتی همان کسری پرداخت‌نشده است.
+    held = record.reserved_amount or 0.0
+    if held > 0:
+        result = db.execute(
+            update(models.TranscriptionFile)
+            .where(models.TranscriptionFile.id == record.id, models.TranscriptionFile.reserved_amount == held)
+            .values(reserved_amount=0.0)
+        )
+        if result.rowcount == 1:
+            db.execute(
+                update(models.User)
+                .where(models.User.id == user.id)
+                .values(reserved_balance=models.User.reserved_balance - held)
+            )
+    record.reserved_amount = 0.0
+
+    # قفل نوشتن SQLite از نخستین UPDATE تا commit نگه داشته می‌شود؛ موجودی خوانده‌شده تغییر نمی‌کند
+    free = (
+        db.query(models.User.wallet_balance - models.User.reserved_balance)
+        .filter(models.User.id == user.id)
+        .scalar()
+    ) or 0.0
+    charge = max(0.0, min(cost, free))
+    if charge:
+        db.execute(
+            update(models.User)
+            .where(models.User.id == user.id)
+            .values(wallet_balance=models.User.wallet_balance - charge)
+        )
+    shortfall = cost - charge
+    if shortfall > 0:
+        description = f"{description} (کسری پرداخت‌نشده: {shortfall:g})"
+    create_transaction(db, user.id, -charge, description, user.token_price)
+    db.commit()
+    return shortfall
+
+@retry_on_locked
+def release_reserved_funds(db: Session, record: models.TranscriptionFile):
+    # آزادسازی رزرو کار؛ شرط روی reserved_amount مانع آزادسازی دوباره (مثلاً لغو هم‌زمان با شکست) است
+    held = record.reserved_amount or 0.0
+    if held <= 0:
+        return
+    result = db.execute(
+        update(models.TranscriptionFile)
+        .where(models.TranscriptionFile.id == record.id, models.TranscriptionFile.reserved_amount == held)
+        .values(reserved_amount=0.0)
+    )
+    if result.rowcount == 1:
+        db.execute(
+            update(models.User)
+            .where(models.User.id == record.user_id)
+            .values(reserved_balance=models.User.reserved_balance - held)
+        )
+    db.commit()
@@ -1,16 +1,30 @@
 # app/crud/transcriptions.py
 import os
+from datetime import datetime
+
 import docx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app import models
+from app.database import retry_on_locked
 from sqlalchemy.orm import Session
 from app import models
 from app.utils.time import now_tehran  # تغییر اینجا
+from .transactions import release_reserved_funds
 from sqlalchemy.orm import Session
 from .. import models
 UPLOAD_DIR = "uploads"
 
-def create_transcription_record(db: Session, filename: str, user_id: int, lang: str, original_filename: str | None = None):
+def create_transcription_record(
+    db: Session,
+    filename: str,
+    user_id: int,
+    lang: str,
+    original_filename: str | None = None,
+    content_hash: str | None = None,
+    duration_seconds: float | None = None,
+):
     rec = models.TranscriptionFile(
         user_id=user_id,
         original_filename=original_filename or filename,
@@ -18,6 +32,8 @@ def create_transcription_record(db: Session, filename: str, user_id: int, lang:
         language=lang,
         status="queued",
         timestamp=now_tehran(),  # تغییر اینجا
+        content_hash=content_hash,
+        duration_seconds=duration_seconds,
     )
     db.add(rec)
     db.commit()
@@ -34,15 +50,51 @@ def get_user_transcriptions(db: Session, user_id: int, skip: int = 0, limit: int
         .all()
     )
 
+async def get_user_transcriptions_async(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 15):
+    result = await db.execute(
+        select(models.TranscriptionFile)
+        .where(models.TranscriptionFile.user_id == user_id)
+        .order_by(models.TranscriptionFile.timestamp.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
 def get_user_transcriptions_count(db: Session, user_id: int) -> int:
     return db.query(models.TranscriptionFile).filter(models.TranscriptionFile.user_id == user_id).count()
 
+@retry_on_locked
 def set_task_id(db: Session, record_id: int, task_id: str):
     rec = db.query(models.TranscriptionFile).get(record_id)
     if rec:
         rec.celery_task_id = task_id
         db.commit()
 
+# آغاز شمارش قطعه‌ها؛ تا پایان تقسیم فایل کل نامعلوم است و هیچ قطعه‌ای مرحلهٔ نهایی را آغاز نمی‌کند
+@retry_on_locked
+def start_chunk_progress(db: Session, record_id: int, completed: int = 0):
+    rec = db.query(models.TranscriptionFile).get(record_id)
+    if rec:
+        rec.total_chunks = None
+        rec.completed_chunks = completed
+        rec.progress_at = datetime.utcnow()
+        db.commit()
+
+@retry_on_locked
+def set_total_chunks(db: Session, record_id: int, total: int) -> bool:
+    """
+    ثبت تعداد کل قطعه‌ها پس از تقسیم، بدون دست زدن به شمارندهٔ قطعه‌های پایان‌یافته.
+    True یعنی همهٔ قطعه‌ها پیش از ثبت کل تمام شده‌اند و فراخواننده باید مرحلهٔ نهایی را آغاز کند.
+    """
+    job = models.TranscriptionFile
+    db.query(job).filter(job.id == record_id).update(
+        {job.total_chunks: total, job.progress_at: datetime.utcnow()}, synchronize_session=False
+    )
+    completed = db.query(job.completed_chunks).filter(job.id == record_id).scalar()
+    db.commit()
+    return (completed or 0) >= total
+
+@retry_on_locked
 def update_transcription_status(db: Session, record_id: int, status: str):
     rec = db.query(models.TranscriptionFile).get(record_id)
     if rec:
@@ -50,6 +102,9 @@ def update_transcription_status(db: Session, record_id: int, status: str):
         if status in ("completed", "failed", "canceled"):
             rec.finished_at = now_tehran()  # تغییر اینجا
         db.commit()
+        if status in ("failed", "canceled"):
+            # کار ناتمام هزینه‌ای ندارد؛ موجودی رزروشده‌اش به کاربر برمی‌گردد
+            release_reserved_funds(db, rec)
 
 def finalize_job(db: Session, record: models.TranscriptionFile, final_text: str, duration: int):
     record.status = "completed"
@@ -70,9 +125,52 @@ def finalize_job(db: Session, record: models.TranscriptionFile, final_text: str,
 
     db.commit()
 
+# یافتن نتیجهٔ کامل‌شدهٔ قبلی برای فایلی با همان محتوا و زبان
+def find_reusable_transcription(
+    db: Session,
+    content_hash: str,
+    lang: str,
+    user_id: int | None = None,
+    need_ai: bool = False,
+):
+    q = db.query(models.TranscriptionFile).filter(
+        models.TranscriptionFile.content_hash == content_hash,
+        models.TranscriptionFile.language == lang,
+        models.TranscriptionFile.status == "completed",
+        models.TranscriptionFile.raw_result_text.isnot(None),
+    )
+    if user_id is not None:
+        q = q.filter(models.TranscriptionFile.user_id == user_id)
+    if need_ai:
+        q = q.filter(models.TranscriptionFile.ai_result_text.isnot(None))
+    return q.order_by(models.TranscriptionFile.timestamp.desc()).first()
+
+# تکمیل فوری یک کار با کپی نتایج یک رکورد قبلی (بدون تقسیم، پیاده‌سازی یا AI)
+def clone_transcription_result(
+    db: Session,
+    record: models.TranscriptionFile,
+    source: models.TranscriptionFile,
+    use_ai: bool,
+):
+    record.raw_result_text = source.raw_result_text
+    final_text = source.raw_result_text
+    if use_ai:
+        record.ai_result_text = source.ai_result_text
+        record.ai_token_usage = source.ai_token_usage
+        final_text = source.ai_result_text
+    finalize_job(db, record, final_text, 0)
 
 def get_all_transcriptions(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Transcription).order_by(models.Transcription.created_at.desc()).offset(skip).limit(limit).all()
+    return (
+        db.query(models.TranscriptionFile)
+        .order_by(models.TranscriptionFile.timestamp.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+def get_all_transcriptions_count(db: Session) -> int:
+    return db.query(models.TranscriptionFile).count()
 
 def get_job(db: Session, job_id: int, owner: models.User):
     q = db.query(models.TranscriptionFile).filter_by(id=job_id)
@@ -1,5 +1,7 @@
 # app/crud/users.py
 # مدیریت عملیات CRUD کاربران
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app import models, auth, schemas
 
@@ -11,6 +13,11 @@ def get_user(db: Session, user_id: int) -> models.User | None:
 def get_user_by_username(db: Session, username: str) -> models.User | None:
     return db.query(models.User).filter(models.User.username == username).first()
 
+# نسخهٔ ناهمگام برای مسیرهای async وب (احراز هویت با کوکی)
+async def get_user_by_username_async(db: AsyncSession, username: str) -> models.User | None:
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
 # دریافت لیستی از کاربران با قابلیت جستجو و صفحه‌بندی
 def get_users(db: Session, username_filter: str | None = None, skip: int = 0, limit: int = 100):
     q = db.query(models.User)
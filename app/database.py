@@ -1,21 +1,121 @@
 # app/database.py
 
-from sqlalchemy import create_engine
+import asyncio
+import functools
+import random
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
 
 # --- بازگشت به استفاده از دیتابیس محلی SQLite ---
 # این آدرس به برنامه می‌گوید که یک فایل به نام transcriber.db در ریشه پروژه ایجاد کند.
-SQLALCHEMY_DATABASE_URL = "sqlite:///./transcriber.db"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
 # ساخت موتور SQLAlchemy برای اتصال به دیتابیس
-# آرگومان connect_args برای سازگاری با SQLite ضروری است
+# آرگومان connect_args برای سازگاری با SQLite ضروری است؛ اتصال‌ها در pool نگه داشته
+# می‌شوند تا PRAGMAها فقط یک بار برای هر اتصال اجرا شوند
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+    poolclass=QueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    پروفایل تولید SQLite برای نوشتن هم‌زمان وب و workerهای Celery: در حالت WAL
+    خواننده‌ها نویسنده را متوقف نمی‌کنند و busy_timeout به‌جای خطای فوری
+    «database is locked» تا آزاد شدن قفل صبر می‌کند.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
 # ساخت یک کلاس Session برای ارتباط با دیتابیس در هر درخواست
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- موتور ناهمگام (aiosqlite) برای مسیرهای async وب ---
+# همان فایل و همان PRAGMAها؛ پرس‌وجوها event loop را مسدود نمی‌کنند
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or SQLALCHEMY_DATABASE_URL.replace(
+    "sqlite://", "sqlite+aiosqlite://", 1
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# expire_on_commit=False: بارگذاری تنبل پس از commit در AsyncSession ممکن نیست
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # ساخت یک کلاس پایه برای تمام مدل‌های دیتابیس
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def _is_locked_error(exc: OperationalError) -> bool:
+    message = str(exc.orig).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def retry_on_locked(func):
+    """
+    تکرار یک تراکنش نوشتنی کوتاه در صورت «database is locked» (پس از پایان
+    busy_timeout)، با rollback و انتظار نمایی تصادفی. فقط برای توابعی که اولین
+    آرگومانشان Session است و خودشان commit می‌کنند؛ تغییرات commit‌نشدهٔ
+    فراخواننده با rollback از بین می‌روند. انتظار با time.sleep است؛ در handlerهای
+    async به‌جای db.run_sync از run_sync_retrying استفاده شود.
+    """
+
+    @functools.wraps(func)
+    def wrapper(db, *args, **kwargs):
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            try:
+                return func(db, *args, **kwargs)
+            except OperationalError as e:
+                if attempt == settings.SQLITE_WRITE_RETRIES or not _is_locked_error(e):
+                    raise
+                db.rollback()
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    return wrapper
+
+
+async def run_sync_retrying(db: AsyncSession, func, *args, **kwargs):
+    """
+    اجرای یک تابع CRUD همگامِ مجهز به retry_on_locked روی AsyncSession. run_sync روی
+    خود event loop اجرا می‌شود، پس به‌جای time.sleep داخل تابع، تکرار همین‌جا با
+    asyncio.sleep انجام می‌شود و loop در مدت انتظار آزاد می‌ماند.
+    """
+    func = getattr(func, "__wrapped__", func)
+    for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+        try:
+            return await db.run_sync(func, *args, **kwargs)
+        except OperationalError as e:
+            if attempt == settings.SQLITE_WRITE_RETRIES or not _is_locked_error(e):
+                raise
+            await db.rollback()
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
@@ -5,6 +5,7 @@
 """
 from fastapi import Request, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from . import crud, models, auth, database
@@ -23,13 +24,15 @@ def get_db():
     finally:
         db.close()
 
+# نسخهٔ ناهمگام برای handlerهای async؛ پرس‌وجوها event loop را مسدود نمی‌کنند
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
 # --------------------------------------------------
 #  استخراج کاربر از «کوکی» (برای صفحات وب)
 # --------------------------------------------------
-async def get_current_user_from_cookie(
-    request: Request,
-    db: Session = Depends(get_db),
-):
+def _username_from_cookie(request: Request) -> str:
     token_cookie: str | None = request.cookies.get("access_token")
 
     cred_exc = HTTPException(
@@ -52,10 +55,27 @@ async def get_current_user_from_cookie(
             raise cred_exc
     except (JWTError, IndexError):
         raise cred_exc
+    return username
 
-    user = crud.get_user_by_username(db, username=username)
+# نسخهٔ همگام برای handlerهایی که با get_db کار می‌کنند؛ کاربر به همان Session درخواست
+# تعلق دارد و چون def است FastAPI آن را در threadpool اجرا می‌کند
+def get_current_user_from_cookie(
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    user = crud.get_user_by_username(db, username=_username_from_cookie(request))
     if user is None:
-        raise cred_exc
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return user
+
+# نسخهٔ ناهمگام برای handlerهای async با get_async_db؛ کاربر به همان AsyncSession تعلق دارد
+async def get_current_user_from_cookie_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await crud.get_user_by_username_async(db, username=_username_from_cookie(request))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     return user
 
 # --------------------------------------------------
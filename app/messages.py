@@ -4,4 +4,5 @@ PASSWORD_CHANGE_SUCCESS = "رمز عبور با موفقیت تغییر کرد"
 PASSWORD_CHANGE_ERROR = "رمز عبور فعلی اشتباه است"
 FILE_LIMIT_EXCEEDED = "محدودیت روزانه شما کافی نیست"
 DAILY_LIMIT_EXCEEDED = "محدودیت روزانه شما تکمیل شده است"  # این خط را اضافه کنید
-INVALID_FILE_TYPE = "فقط فایل‌های txt یا docx مجازند"
\ No newline at end of file
+INVALID_FILE_TYPE = "فقط فایل‌های txt یا docx مجازند"
+INVALID_MEDIA_FILE = "فایل صوتی قابل خواندن نیست"
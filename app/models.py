@@ -13,10 +13,12 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     Boolean,
+    UniqueConstraint,
 )
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
@@ -44,6 +46,7 @@ class User(Base):
     last_transcription_date = Column(Date, nullable=True)
 
     wallet_balance = Column(Float, default=0.0)
+    reserved_balance = Column(Float, default=0.0, server_default="0")  # مجموع رزرو کارهای در حال اجرا
     token_price = Column(Float, default=10.0)
     is_active = Column(Boolean, default=True)
 
@@ -54,6 +57,12 @@ class User(Base):
 
 class TranscriptionFile(Base):
     __tablename__ = "transcriptions"
+    # داشبورد کاربر (user_id + مرتب‌سازی زمانی)، فهرست مدیر (زمانی) و جستجوی وضعیت بدون مرتب‌سازی کل جدول
+    __table_args__ = (
+        Index("ix_transcriptions_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_transcriptions_timestamp", "timestamp"),
+        Index("ix_transcriptions_status", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -66,6 +75,12 @@ class TranscriptionFile(Base):
     status = Column(String, default="pending")  # pending | queued | processing | completed | failed | canceled
 
     celery_task_id = Column(String(50), nullable=True, index=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 فایل آپلودشده
+    total_chunks = Column(Integer, nullable=True)  # تعداد قطعه‌های صوتی برای نمایش پیشرفت
+    completed_chunks = Column(Integer, default=0, server_default="0")  # شمارندهٔ اتمیک قطعه‌های پایان‌یافته
+    progress_at = Column(DateTime, nullable=True)  # آخرین جلو رفتن شمارنده (UTC)؛ برای یافتن کارهای گیرکرده
+    duration_seconds = Column(Float, nullable=True)  # طول فایل صوتی از هدر (ffprobe) هنگام آپلود
+    estimated_cost = Column(Float, nullable=True)  # برآورد هزینه پیش از اجرا، برای بازبینی در کنار هزینهٔ واقعی
 
     raw_result_text = Column(Text, nullable=True)
     ai_result_text = Column(Text, nullable=True)
@@ -73,11 +88,21 @@ class TranscriptionFile(Base):
 
     processing_duration_seconds = Column(Integer, nullable=True)
     ai_token_usage = Column(Integer, nullable=True)
+    ai_cache_hits = Column(Integer, nullable=True)  # قطعه‌هایی که اصلاحشان از کش آمد
+    ai_cache_misses = Column(Integer, nullable=True)
+    ai_failed_chunks = Column(Integer, nullable=True)  # قطعه‌هایی که پس از همهٔ تلاش‌ها با متن خام ماندند
+    reserved_amount = Column(Float, default=0.0, server_default="0")  # مبلغ رزروشدهٔ این کار تا تسویه یا آزادسازی
 
     output_filename_txt = Column(String, nullable=True)
     output_filename_docx = Column(String, nullable=True)
 
     owner = relationship("User", back_populates="transcriptions")
+    chunks = relationship(
+        "TranscriptionChunk",
+        back_populates="transcription",
+        cascade="all, delete-orphan",
+        order_by="TranscriptionChunk.chunk_index",
+    )
 
     @hybrid_property
     def timestamp_local(self):
@@ -90,8 +115,47 @@ class TranscriptionFile(Base):
         return self.owner
 
 
+class TranscriptionChunk(Base):
+    """نتیجهٔ ذخیره‌شدهٔ هر قطعهٔ صوتی برای ادامهٔ کار پس از خرابی یا تلاش مجدد"""
+    __tablename__ = "transcription_chunks"
+    __table_args__ = (UniqueConstraint("transcription_id", "chunk_index"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    start_sec = Column(Float, nullable=False)
+    end_sec = Column(Float, nullable=False)
+
+    text = Column(Text, nullable=True)  # None یعنی هنوز متنی ندارد
+    failed = Column(Boolean, default=False, server_default="0")  # همهٔ تلاش‌های اجرای جاری ناموفق بوده است
+    attempts = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    transcription = relationship("TranscriptionFile", back_populates="chunks")
+
+
+class AICorrectionChunk(Base):
+    """نتیجهٔ اصلاح هر قطعهٔ متن؛ در اجرای مجدد فقط قطعه‌های ناموفق یا تغییرکرده دوباره ارسال می‌شوند"""
+    __tablename__ = "ai_correction_chunks"
+    __table_args__ = (UniqueConstraint("transcription_id", "chunk_index"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    source_hash = Column(String(64), nullable=False)  # SHA-256 متن ورودی قطعه
+
+    text = Column(Text, nullable=True)  # None یعنی اصلاح این قطعه ناموفق بوده است
+    tokens = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_transactions_timestamp", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
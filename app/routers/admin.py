@@ -16,6 +16,7 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app import dependencies, models, schemas, crud
 from app.templating import templates
+from app.services.result_cache import ai_correction_cache, chunk_transcript_cache
 
 router = APIRouter(
     prefix="/admin",
@@ -185,6 +186,15 @@ async def admin_all_transactions_page(
     return templates.TemplateResponse(tpl, ctx)
 
 
+# ────────────────────────── CACHE STATS
+@router.get("/cache-stats")
+async def admin_cache_stats(
+    current_admin: models.User = Depends(dependencies.get_current_active_admin),
+):
+    """شمارندهٔ hit/miss کش‌ها؛ هر hit یک فراخوانی تشخیص‌دهنده یا سرویس هوش مصنوعی کمتر است"""
+    return {"asr": chunk_transcript_cache.stats(), "ai": ai_correction_cache.stats()}
+
+
 # ────────────────────────── CONTENT MANAGEMENT
 @router.get("/content", response_class=HTMLResponse)
 async def content_management_page(
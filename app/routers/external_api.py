@@ -1,5 +1,9 @@
+import ipaddress
+import socket
+from urllib.parse import urlparse
+
 from fastapi import APIRouter, Depends, HTTPException
-from starlette.status import HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND
+from starlette.status import HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
 from sqlalchemy.orm import Session
 from app.crud import get_transcription_by_external_id
 from ..dependencies import get_db
@@ -9,12 +13,33 @@ from ..tasks import enqueue_external_job
 
 router = APIRouter(prefix="/v1", tags=["external-api"])
 
+def _ensure_public_url(url: str):
+    """
+    فقط http(s) به میزبان‌های عمومی؛ دانلود در worker انجام می‌شود و نباید به
+    شبکهٔ داخلی (loopback، آدرس‌های خصوصی و link-local) دسترسی بدهد.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail="file_url must be http(s)")
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, parsed.port or 443, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        raise HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail="file_url host not found")
+    for info in infos:
+        ip = ipaddress.ip_address(info[4][0])
+        if not ip.is_global:
+            raise HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail="file_url host is not public")
+
 @router.post("/jobs", response_model=JobQueuedResp, status_code=HTTP_202_ACCEPTED)
 def create_job(
     payload: ExternalJobCreate,
     db: Session = Depends(get_db),
     service_user=Depends(get_current_service_user),
 ):
+    # بررسی هدر فایل و برآورد هزینه پس از دانلود در enqueue_external_job انجام می‌شود
+    # و روی کار ذخیره می‌شود (در وضعیت کار قابل مشاهده است)
+    _ensure_public_url(str(payload.file_url))
+
     job = create_external_job(db, service_user, payload)
     
     # بررسی وجود تابع enqueue_external_job
@@ -31,11 +56,7 @@ def create_job(
         mode=payload.mode,
         callback_url=payload.callback_url,
     )
-    return JobQueuedResp(
-        job_id=job.external_id,
-        status="queued",
-        estimated_cost=job.estimated_cost,
-    )
+    return JobQueuedResp(job_id=job.external_id, status="queued")
 
 @router.get("/jobs/{external_id}", response_model=JobStatusResp)
 def job_status(
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import hashlib
 import os
 from pathlib import Path
 from datetime import date
@@ -15,72 +16,140 @@ from fastapi import (
     UploadFile,
 )
 from fastapi.responses import RedirectResponse, FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from werkzeug.utils import secure_filename
 
 from app.core.config import settings
 from app.messages import (
     FILE_LIMIT_EXCEEDED,
     INVALID_FILE_TYPE,
+    INVALID_MEDIA_FILE,
     DAILY_LIMIT_EXCEEDED
 )
 from .. import dependencies, models
-from ..dependencies import get_db
-from ..crud import transcriptions, users
+from ..dependencies import get_async_db, get_db
+from ..database import run_sync_retrying
+from ..crud import chunks, transcriptions, transactions, users
 from ..tasks.text_tasks import background_text_correction_task
 from ..tasks.parallel_audio import parallel_audio_job
+from ..services.media_probe import MediaProbeError, probe_media
 from app.celery_app import celery_app
+from app.core.workspace import workspace_manager
 
+# احراز هویت در هر مسیر اعلام می‌شود (نسخهٔ async برای handlerهای async، نسخهٔ همگام برای بقیه)
+# تا وابستگی فقط یک بار برای هر درخواست اجرا شود
 router = APIRouter(
     tags=["Jobs & Invoicing"],
-    dependencies=[Depends(dependencies.get_current_user_from_cookie)],
 )
 
+UPLOAD_READ_SIZE = 1024 * 1024  # 1 MB
+
 # ──────────────────────────────────────────────────────────────────────────────
 #                               AUDIO JOB
 # ──────────────────────────────────────────────────────────────────────────────
+def _charge_reused_result(
+    db: Session,
+    user: models.User,
+    source: models.TranscriptionFile,
+    use_ai: bool,
+    original_name: str,
+) -> bool:
+    """
+    اعمال سیاست هزینهٔ نتایج تکراری؛ در صورت کمبود موجودی False برمی‌گرداند
+    تا کار مثل یک فایل جدید در صف قرار گیرد.
+    """
+    if not use_ai or settings.DEDUP_BILLING != "charge" or not source.ai_token_usage:
+        return True
+    try:
+        transactions.debit_from_wallet(
+            db, user=user,
+            cost=source.ai_token_usage * user.token_price,
+            description=f"هزینه اصلاح فایل: {original_name}",
+        )
+    except ValueError:
+        return False
+    return True
+
 @router.post("/transcribe/", summary="Create Audio Transcription Job")
 async def create_audio_job(
-    current_user: models.User = Depends(dependencies.get_current_user_from_cookie),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_user_from_cookie_async),
+    db: AsyncSession = Depends(get_async_db),
     files: List[UploadFile] = File(...),
     language: str = Form(...),
     use_ai_correction: bool = Form(False),
 ):
+    # current_user از همین AsyncSession (وابستگی کش‌شدهٔ درخواست) خوانده شده است؛
+    # توابع CRUD همگام با run_sync روی همان اتصال ناهمگام اجرا می‌شوند؛ توابع دارای
+    # retry_on_locked با run_sync_retrying تا انتظار تکرار event loop را مسدود نکند
     today = date.today()
     if current_user.last_transcription_date != today:
         current_user.daily_transcription_count = 0
-        db.commit()
-    db.refresh(current_user)
+        await db.commit()
+    await db.refresh(current_user)
 
     if len(files) > (current_user.file_limit - current_user.daily_transcription_count):
         raise HTTPException(status_code=403, detail=FILE_LIMIT_EXCEEDED)
 
+    # ذخیره و بررسی هدر همهٔ فایل‌ها پیش از ثبت هر کاری؛ فایل خراب همان لحظه رد می‌شود
+    uploads = []
     for file in files:
         original_name = file.filename
-        safe_name = secure_filename(original_name)
-        stored_path = Path(settings.UPLOADS_DIR) / safe_name
+        stored_path = Path(settings.UPLOADS_DIR) / secure_filename(original_name)
 
+        # محاسبهٔ SHA-256 هم‌زمان با ذخیرهٔ جریانی فایل
+        hasher = hashlib.sha256()
         with stored_path.open("wb") as f:
-            f.write(await file.read())
-
+            while chunk := await file.read(UPLOAD_READ_SIZE):
+                hasher.update(chunk)
+                f.write(chunk)
+        uploads.append((original_name, stored_path, hasher.hexdigest()))
+
+        try:
+            media = await run_in_threadpool(probe_media, str(stored_path))
+        except MediaProbeError as e:
+            for _, path, _ in uploads:
+                path.unlink(missing_ok=True)
+            raise HTTPException(status_code=400, detail=f"{INVALID_MEDIA_FILE} ({original_name}): {e}")
+        uploads[-1] += (media["duration"],)
+
+    for original_name, stored_path, content_hash, duration in uploads:
         prefix = settings.AI_PREFIX if use_ai_correction else settings.RAW_PREFIX
         display = f"{prefix} {original_name}"
 
-        rec = transcriptions.create_transcription_record(
-            db,
+        rec = await db.run_sync(
+            transcriptions.create_transcription_record,
             filename=display,
             user_id=current_user.id,
             lang=language,
             original_filename=original_name,
+            content_hash=content_hash,
+            duration_seconds=duration,
         )
 
-        async_res = parallel_audio_job.delay(rec.id, str(stored_path), language)
-        transcriptions.set_task_id(db, rec.id, async_res.id)
+        source = None
+        if settings.DEDUP_ENABLED:
+            source = await db.run_sync(
+                transcriptions.find_reusable_transcription,
+                content_hash,
+                language,
+                user_id=current_user.id if settings.DEDUP_SCOPE == "user" else None,
+                need_ai=use_ai_correction,
+            )
+
+        if source and await db.run_sync(
+            _charge_reused_result, current_user, source, use_ai_correction, original_name
+        ):
+            # فایل تکراری: تکمیل فوری با نتایج قبلی، بدون ارسال به صف
+            await db.run_sync(transcriptions.clone_transcription_result, rec, source, use_ai_correction)
+        else:
+            async_res = await run_in_threadpool(parallel_audio_job.delay, rec.id, str(stored_path), language)
+            await run_sync_retrying(db, transcriptions.set_task_id, rec.id, async_res.id)
 
         current_user.daily_transcription_count += 1
         current_user.last_transcription_date = today
-        db.commit()
+        await db.commit()
 
     return RedirectResponse("/dashboard?msg=transcribe-queued", status_code=303)
 
@@ -89,15 +158,15 @@ async def create_audio_job(
 # ──────────────────────────────────────────────────────────────────────────────
 @router.post("/correct-text/", summary="Create Text Correction Job")
 async def create_text_job(
-    current_user: models.User = Depends(dependencies.get_current_user_from_cookie),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_user_from_cookie_async),
+    db: AsyncSession = Depends(get_async_db),
     files: List[UploadFile] = File(...),
 ):
     today = date.today()
     if current_user.last_transcription_date != today:
         current_user.daily_transcription_count = 0
-        db.commit()
-    db.refresh(current_user)
+        await db.commit()
+    await db.refresh(current_user)
 
     if len(files) > (current_user.file_limit - current_user.daily_transcription_count):
         raise HTTPException(status_code=403, detail=DAILY_LIMIT_EXCEEDED)
@@ -111,20 +180,20 @@ async def create_text_job(
         with stored_path.open("wb") as f:
             f.write(await file.read())
 
-        rec = transcriptions.create_transcription_record(
-            db,
+        rec = await db.run_sync(
+            transcriptions.create_transcription_record,
             filename=f"(اصلاح متنی) {original_name}",
             user_id=current_user.id,
             lang="text",
             original_filename=original_name,
         )
 
-        async_res = background_text_correction_task.delay(rec.id, str(stored_path))
-        transcriptions.set_task_id(db, rec.id, async_res.id)
+        async_res = await run_in_threadpool(background_text_correction_task.delay, rec.id, str(stored_path))
+        await run_sync_retrying(db, transcriptions.set_task_id, rec.id, async_res.id)
 
         current_user.daily_transcription_count += 1
         current_user.last_transcription_date = today
-        db.commit()
+        await db.commit()
 
     return RedirectResponse("/dashboard?msg=transcribe-canceled", status_code=303)
 
@@ -149,9 +218,53 @@ def cancel_job(
         celery_app.control.revoke(task_id, terminate=True, signal='SIGTERM')
 
     transcriptions.update_transcription_status(db, job_id, "canceled")
+    workspace_manager.release(job_id)
 
     return RedirectResponse("/my-dashboard?msg=transcribe-canceled", status_code=303)
 
+# ──────────────────────────────────────────────────────────────────────────────
+#                               RETRY FAILED JOB
+# ──────────────────────────────────────────────────────────────────────────────
+@router.post("/transcribe/{job_id}/retry", summary="Re-run a failed job (only missing chunks)")
+def retry_job(
+    job_id: int,
+    current_user: models.User = Depends(dependencies.get_current_user_from_cookie),
+    db: Session = Depends(get_db),
+):
+    rec = transcriptions.get_job(db, job_id, current_user)
+    if not rec:
+        raise HTTPException(404, "Job not found")
+    if rec.status != "failed":
+        raise HTTPException(400, "Only failed jobs can be retried")
+
+    stored_path = Path(settings.UPLOADS_DIR) / secure_filename(rec.original_filename)
+    if not stored_path.exists():
+        raise HTTPException(400, "فایل اصلی دیگر در دسترس نیست")
+
+    # نتایج قطعه‌های موفق اجرای قبلی ذخیره شده‌اند؛ تسک فقط قطعه‌های باقی‌مانده را پردازش می‌کند
+    transcriptions.update_transcription_status(db, job_id, "queued")
+    if rec.language == "text":
+        async_res = background_text_correction_task.delay(rec.id, str(stored_path))
+    else:
+        async_res = parallel_audio_job.delay(rec.id, str(stored_path), rec.language)
+    transcriptions.set_task_id(db, rec.id, async_res.id)
+
+    return RedirectResponse("/my-dashboard?msg=transcribe-queued", status_code=303)
+
+# ──────────────────────────────────────────────────────────────────────────────
+#                               PARTIAL TRANSCRIPT
+# ──────────────────────────────────────────────────────────────────────────────
+@router.get("/transcribe/{job_id}/partial", summary="Partial transcript and progress of a running job")
+def partial_transcript(
+    job_id: int,
+    current_user: models.User = Depends(dependencies.get_current_user_from_cookie),
+    db: Session = Depends(get_db),
+):
+    rec = transcriptions.get_job(db, job_id, current_user)
+    if not rec:
+        raise HTTPException(404, "Job not found")
+    return chunks.get_partial_transcript(db, rec)
+
 # ──────────────────────────────────────────────────────────────────────────────
 #                               DOWNLOAD
 # ──────────────────────────────────────────────────────────────────────────────
@@ -3,6 +3,7 @@
 import math
 from fastapi import APIRouter, Depends, Request, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.messages import (
@@ -13,19 +14,20 @@ from app.messages import (
 from .. import crud, models, dependencies, auth
 from ..templating import templates
 
+# احراز هویت در هر مسیر اعلام می‌شود (نسخهٔ async برای handlerهای async، نسخهٔ همگام برای بقیه)
+# تا وابستگی فقط یک بار برای هر درخواست اجرا شود
 router = APIRouter(
     tags=["User Pages & Dashboard"],
-    dependencies=[Depends(dependencies.get_current_user_from_cookie)]
 )
 
 @router.get("/dashboard", response_class=HTMLResponse)
 async def dashboard_page(
     request: Request,
-    current_user: models.User = Depends(dependencies.get_current_user_from_cookie),
-    db: Session = Depends(dependencies.get_db)
+    current_user: models.User = Depends(dependencies.get_current_user_from_cookie_async),
+    db: AsyncSession = Depends(dependencies.get_async_db)
 ):
     """صفحه داشبورد اصلی کاربران"""
-    transcriptions = crud.get_user_transcriptions(db, user_id=current_user.id, skip=0, limit=10)
+    transcriptions = await crud.get_user_transcriptions_async(db, user_id=current_user.id, skip=0, limit=10)
     return templates.TemplateResponse(
         "user_dashboard.html",
         {
@@ -38,8 +40,8 @@ async def dashboard_page(
 @router.get("/my-dashboard", response_class=HTMLResponse)
 async def my_dashboard_router(
     request: Request,
-    db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(dependencies.get_current_user_from_cookie),
+    db: AsyncSession = Depends(dependencies.get_async_db),
+    current_user: models.User = Depends(dependencies.get_current_user_from_cookie_async),
 ):
     """
     مسیر مشترک برای بازگشت از عملیات‌هایی مانند لغو فایل یا ایجاد تغییر.
@@ -50,7 +52,7 @@ async def my_dashboard_router(
         return RedirectResponse(url="/admin/hub", status_code=303)
 
     # نمایش داشبورد کاربر عادی
-    transcriptions = crud.get_user_transcriptions(db, user_id=current_user.id, skip=0, limit=10)
+    transcriptions = await crud.get_user_transcriptions_async(db, user_id=current_user.id, skip=0, limit=10)
     return templates.TemplateResponse(
         "user_dashboard.html",
         {
@@ -12,7 +12,7 @@ class ExternalJobCreate(BaseModel):
 class JobQueuedResp(BaseModel):
     job_id: str
     status: Literal["queued"]
-    estimated_cost: float
+    estimated_cost: Optional[float] = None  # پس از دانلود و بررسی فایل در وضعیت کار می‌آید
 
 
 class JobStatusResp(BaseModel):
@@ -22,6 +22,7 @@ class JobStatusResp(BaseModel):
     raw_text: Optional[str]
     ai_text: Optional[str]
     charged: Optional[float]
+    estimated_cost: Optional[float] = None
 
     class Config:
         orm_mode = True
@@ -0,0 +1,126 @@
+# app/services/ai_engine.py
+# موتور ناهمگام اصلاح متن: همهٔ درخواست‌های یک کار روی یک event loop با سقف هم‌زمانی و مهلت
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ai_services import AIService
+from app.services.circuit_breaker import CircuitOpenError, ai_circuit
+from app.services.rate_limiter import ai_concurrency
+from app.services.result_cache import get_cached_correction, store_correction
+
+
+class AICorrectionEngine:
+    """
+    یک event loop در thread جداگانه که درخواست‌های اصلاح را با یک httpx.AsyncClient
+    مشترک ارسال می‌کند. هم‌زمانی با دو سقف محدود می‌شود: semaphore محلی
+    (AI_WORKER_CONCURRENCY) و جایگاه مشترک کل خوشه (AI_GLOBAL_CONCURRENCY).
+    هر درخواست (با تلاش‌های مجددش) حداکثر AI_REQUEST_DEADLINE ثانیه فرصت دارد.
+
+    استفاده:
+        with AICorrectionEngine() as engine:
+            future = engine.submit(text)          # از هر thread، بدون انتظار
+            results = engine.correct_many(texts)  # به ترتیب ورودی
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, deadline: Optional[float] = None):
+        self.concurrency = concurrency or settings.AI_WORKER_CONCURRENCY
+        self.deadline = deadline or settings.AI_REQUEST_DEADLINE
+        self.service = AIService()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # آمار کش همین کار (برای گزارش نرخ hit هر کار)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # ---------------------------------------------------------------- چرخهٔ عمر
+    def __enter__(self) -> "AICorrectionEngine":
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ai-engine", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _setup(self):
+        import httpx
+
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            http2=settings.AI_HTTP2,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+                keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def _shutdown(self):
+        # درخواست‌های باقی‌مانده (مثلاً پس از خطای یک قطعه) لغو می‌شوند تا جایگاه‌ها آزاد شوند
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await self._client.aclose()
+
+    # ---------------------------------------------------------------- اجرا
+    async def _global_slot(self) -> str:
+        token = uuid.uuid4().hex
+        delay = 0.05
+        while not await asyncio.to_thread(ai_concurrency.try_acquire, token):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        return token
+
+    async def _correct(self, text: str, context: str = "") -> Tuple[str, int]:
+        if not self.service._validate_api_key():
+            return f"[AI Service Unavailable] {text}", 0
+
+        # hit کش جایگاهی از سقف‌های هم‌زمانی نمی‌گیرد
+        cached = await asyncio.to_thread(get_cached_correction, text, context)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        # با مدار باز، بدون گرفتن جایگاه و بدون انتظار شکست می‌خورد تا کار به تعویق بیفتد
+        remaining = await asyncio.to_thread(ai_circuit.retry_after)
+        if remaining > 0:
+            raise CircuitOpenError(remaining)
+
+        async with self._semaphore:
+            token = await self._global_slot()
+            try:
+                result = await asyncio.wait_for(
+                    self.service.request_correction_async(self._client, text, context), timeout=self.deadline
+                )
+            finally:
+                await asyncio.to_thread(ai_concurrency.release, token)
+        await asyncio.to_thread(store_correction, text, context, *result)
+        return result
+
+    def submit(self, text: str, context: str = "") -> concurrent.futures.Future:
+        """ارسال یک متن (و زمینهٔ اختیاری قبلی) برای اصلاح؛ نتیجه (متن، توکن) در future قرار می‌گیرد"""
+        return asyncio.run_coroutine_threadsafe(self._correct(text, context), self._loop)
+
+    def cache_stats(self) -> dict:
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
+
+    def correct_many(self, texts: Iterable[str], contexts: Optional[Iterable[str]] = None) -> List[Tuple[str, int]]:
+        """اصلاح هم‌زمان چند متن؛ خروجی به ترتیب ورودی است"""
+        texts = list(texts)
+        contexts = list(contexts) if contexts is not None else [""] * len(texts)
+        futures = [self.submit(t, c) for t, c in zip(texts, contexts)]
+        return [f.result() for f in futures]
@@ -1,8 +1,11 @@
+import asyncio
 import os
 from typing import Tuple
-import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt
 from app.core.config import settings
+from app.services.circuit_breaker import ai_circuit, is_retryable, retry_after_of, wait_for_retry
+from app.services.http_client import get_ai_http_client
+from app.services.result_cache import get_cached_correction, store_correction
 
 class AIService:
     def __init__(self):
@@ -10,46 +13,110 @@ class AIService:
         self.base_url = settings.AI_API_URL
         self.timeout = settings.AI_API_TIMEOUT
 
-    @retry(
-        stop=stop_after_attempt(settings.AI_MAX_RETRIES),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        reraise=True
-    )
-    def correct_text(self, text: str) -> Tuple[str, int]:
-        if not self._validate_api_key():
-            return f"[AI Service Unavailable] {text}", 0
-
+    def _build_request(self, text: str, context: str = "") -> Tuple[dict, dict]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
+        messages = [{"role": "system", "content": settings.AI_SYSTEM_PROMPT}]
+        if context:
+            # ادامهٔ متن قبلی فقط برای حفظ پیوستگی؛ نباید در پاسخ تکرار شود
+            messages.append({
+                "role": "system",
+                "content": f"متن زیر فقط زمینهٔ قبلی است؛ آن را اصلاح نکن و در پاسخ نیاور:\n{context}"
+            })
+        messages.append({"role": "user", "content": text})
+
         payload = {
             "model": settings.AI_MODEL_NAME,
-            "messages": [
-                {"role": "system", "content": settings.AI_SYSTEM_PROMPT},
-                {"role": "user", "content": text}
-            ],
+            "messages": messages,
             "temperature": settings.AI_TEMPERATURE
         }
+        return headers, payload
+
+    @staticmethod
+    def _parse_response(data: dict) -> Tuple[str, int]:
+        return (
+            data["choices"][0]["message"]["content"].strip(),
+            data["usage"]["total_tokens"]
+        )
+
+    def correct_text(self, text: str, context: str = "") -> Tuple[str, int]:
+        if not self._validate_api_key():
+            return f"[AI Service Unavailable] {text}", 0
+
+        # نتیجهٔ قبلی همین متن با همین مدل/دستور/دما، بدون فراخوانی دوباره
+        cached = get_cached_correction(text, context)
+        if cached is not None:
+            return cached
+
+        result = self.request_correction(text, context)
+        store_correction(text, context, *result)
+        return result
+
+    @staticmethod
+    def _record_outcome(exc: Exception | None):
+        """گزارش نتیجه به مدار مشترک؛ فقط خطاهای قابل تکرار (شبکه، 429، 5xx) شمرده می‌شوند"""
+        if exc is None:
+            ai_circuit.record_success()
+        elif is_retryable(exc):
+            ai_circuit.record_failure(retry_after_of(exc))
+
+    @retry(
+        stop=stop_after_attempt(settings.AI_MAX_RETRIES),
+        wait=wait_for_retry,
+        retry=retry_if_exception(is_retryable),
+        reraise=True
+    )
+    def request_correction(self, text: str, context: str = "") -> Tuple[str, int]:
+        """فراخوانی مستقیم سرویس (بدون کش)؛ با مدار باز بی‌درنگ CircuitOpenError می‌دهد"""
+        ai_circuit.check()
+        headers, payload = self._build_request(text, context)
 
         try:
-            response = requests.post(
+            # اتصال از pool مشترک پروسه گرفته می‌شود (بدون DNS/TCP/TLS تازه برای هر قطعه)
+            response = get_ai_http_client().post(
                 self.base_url,
                 headers=headers,
                 json=payload,
                 timeout=self.timeout
             )
             response.raise_for_status()
-            data = response.json()
-            
-            return (
-                data["choices"][0]["message"]["content"].strip(),
-                data["usage"]["total_tokens"]
-            )
+            result = self._parse_response(response.json())
         except Exception as e:
             print(f"AI API Error: {e}")
+            self._record_outcome(e)
             raise  # برای مدیریت توسط retry
+        self._record_outcome(None)
+        return result
+
+    @retry(
+        stop=stop_after_attempt(settings.AI_MAX_RETRIES),
+        wait=wait_for_retry,
+        retry=retry_if_exception(is_retryable),
+        reraise=True
+    )
+    async def request_correction_async(self, client, text: str, context: str = "") -> Tuple[str, int]:
+        """نسخهٔ ناهمگام request_correction با یک httpx.AsyncClient مشترک (بدون کش)"""
+        await asyncio.to_thread(ai_circuit.check)
+        headers, payload = self._build_request(text, context)
+
+        try:
+            response = await client.post(
+                self.base_url,
+                headers=headers,
+                json=payload,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            result = self._parse_response(response.json())
+        except Exception as e:
+            print(f"AI API Error: {e}")
+            await asyncio.to_thread(self._record_outcome, e)
+            raise
+        await asyncio.to_thread(self._record_outcome, None)
+        return result
 
     def _validate_api_key(self) -> bool:
         if not self.api_key or "YourActual" in self.api_key:
@@ -57,6 +124,11 @@ class AIService:
             return False
         return True
 
-# تابع اصلی برای سازگاری با کد قدیمی
+_service = None
+
+# تابع اصلی برای سازگاری با کد قدیمی؛ یک نمونهٔ AIService برای همهٔ فراخوانی‌ها
 def correct_text_with_ai(text: str, user_price: float = 0) -> Tuple[str, int]:
-    return AIService().correct_text(text)
\ No newline at end of file
+    global _service
+    if _service is None:
+        _service = AIService()
+    return _service.correct_text(text)
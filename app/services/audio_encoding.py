@@ -0,0 +1,53 @@
+# app/services/audio_encoding.py
+# کدگذاری قطعات صوتی در قالب مطلوب تشخیص‌دهندهٔ گفتار (۱۶ کیلوهرتز، تک‌کاناله، FLAC)
+from __future__ import annotations
+
+import io
+import mmap
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import soundfile as sf
+import speech_recognition as sr
+
+from app.core.config import settings
+
+
+def encode_flac(samples: np.ndarray, sample_rate: int) -> bytes:
+    """کدگذاری نمونه‌های int16 تک‌کاناله به FLAC در همین پروسه (بدون اجرای باینری flac)"""
+    buf = io.BytesIO()
+    sf.write(buf, samples, sample_rate, format="FLAC", subtype="PCM_16")
+    return buf.getvalue()
+
+
+class FlacAudioData(sr.AudioData):
+    """
+    AudioData با محتوای FLAC از پیش کدگذاری‌شده؛ recognize_google به‌جای
+    کدگذاری مجدد با باینری flac همین بایت‌ها را مستقیماً ارسال می‌کند.
+    """
+
+    def __init__(self, flac_data: bytes, sample_rate: int):
+        super().__init__(b"", sample_rate, 2)
+        self.flac_data = flac_data
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        return self.flac_data
+
+
+def read_chunk_bytes(chunk: Dict) -> bytes:
+    """
+    بایت‌های FLAC یک قطعه: از حافظه (data)، از بازهٔ offset/length فایل مشترک
+    با mmap، یا از فایل جداگانهٔ قطعه.
+    """
+    if "data" in chunk:
+        return chunk["data"]
+    if "offset" in chunk:
+        with open(chunk["path"], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[chunk["offset"]: chunk["offset"] + chunk["length"]]
+    return Path(chunk["path"]).read_bytes()
+
+
+def load_chunk_audio(chunk: Dict) -> FlacAudioData:
+    """آماده‌سازی یک قطعه برای ارسال مستقیم به تشخیص‌دهنده"""
+    return FlacAudioData(read_chunk_bytes(chunk), settings.AUDIO_SAMPLE_RATE)
@@ -1,12 +1,18 @@
 from __future__ import annotations
+import hashlib
 import os
+import subprocess
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 import speech_recognition as sr
-from pydub import AudioSegment
 from app.core.config import settings
-from tenacity import retry, stop_after_attempt, wait_exponential
+from app.services.audio_encoding import encode_flac, load_chunk_audio
+from app.services.rate_limiter import recognizer_limiter
+from app.services.result_cache import chunk_cache_key, chunk_transcript_cache
+from app.services.vad import iter_speech_chunks
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 class AudioProcessor:
     def __init__(self):
@@ -29,74 +35,249 @@ class AudioProcessor:
                 print(f"Error deleting temp file {file}: {e}")
 
     @staticmethod
-    def split_audio(file_path: Path) -> List[Path]:
-        """تقسیم فایل صوتی به قطعات کوچکتر"""
-        audio = AudioSegment.from_file(file_path)
-        chunk_length_ms = 50 * 1000  # 50 ثانیه
-        chunks = []
-    
-        for i, start in enumerate(range(0, len(audio), chunk_length_ms)):
-            end = start + chunk_length_ms
-            chunk = audio[start:end]
-            chunk_path = file_path.with_suffix(f".part{i}.wav")
-            chunk.export(chunk_path, format="wav")
-            chunks.append(chunk_path)
-    
-        return chunks
+    def _remove_stale_parts(file_path: Path):
+        """حذف قطعات باقی‌مانده از اجرای قبلی همین فایل"""
+        for stale in file_path.parent.glob(f"{file_path.stem}.part*.flac"):
+            stale.unlink()
+        file_path.with_suffix(".chunks").unlink(missing_ok=True)
+
+    @staticmethod
+    def split_audio(
+        file_path: Path,
+        chunk_sec: Optional[int] = None,
+        streaming: Optional[bool] = None,
+    ) -> List[Path]:
+        """
+        تقسیم فایل صوتی به فایل‌های partN.flac (پوشش نازک روی prepare_chunks برای فراخوان‌های قدیمی)؛
+        تقسیم همیشه جریانی است و streaming فقط برای سازگاری امضا پذیرفته می‌شود.
+        """
+        return [
+            Path(chunk["path"])
+            for chunk in AudioProcessor.prepare_chunks(Path(file_path), handoff="files", chunk_sec=chunk_sec)
+        ]
+
+    @staticmethod
+    def prepare_chunks(
+        file_path: Path,
+        shared: bool = False,
+        workdir: Optional[Path] = None,
+        attempt: Optional[str] = None,
+        handoff: Optional[str] = None,
+        chunk_sec: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        تولید تدریجی قطعات آمادهٔ پیاده‌سازی به‌همراه زمان شروع/پایان واقعی هر قطعه؛
+        هر قطعه همان لحظهٔ برش تحویل داده می‌شود و حافظه به اندازهٔ یک قطعه محدود است.
+        در حالت VAD برش در مکث‌ها انجام می‌شود و بازه‌های ساکت کنار گذاشته می‌شوند.
+
+        نحوهٔ تحویل قطعه‌ها با handoff (پیش‌فرض AUDIO_CHUNK_HANDOFF) و بیشینهٔ طول قطعه با
+        chunk_sec (پیش‌فرض AUDIO_CHUNK_SIZE) تعیین می‌شود:
+        - "memory": بدون نوشتن فایل قطعه؛ در مسیر ترتیبی بایت‌ها در حافظه (data) می‌مانند
+          و در مسیر موازی (shared=True) همه در یک فایل مشترک کنار هم نوشته می‌شوند
+          و هر قطعه فقط offset/length خود را دارد.
+        - "files": هر قطعه در یک فایل partN.flac جداگانه.
+
+        فایل‌های قطعه در workdir (پوشهٔ کاری همان کار) ساخته می‌شوند، وگرنه کنار فایل ورودی.
+        با attempt، نام فایل‌ها شناسهٔ همان اجرا را دارد و فایل‌های اجراهای دیگر دست نمی‌خورند
+        (تسک‌های قطعهٔ در صف اجرای قبلی هنوز فایل خودشان را می‌خوانند)؛ بدون آن، باقی‌ماندهٔ
+        اجرای قبلی همین فایل حذف می‌شود.
+        """
+        base = Path(workdir) / file_path.name if workdir else file_path
+        if attempt:
+            base = base.with_name(f"{base.stem}.{attempt}{base.suffix}")
+        else:
+            AudioProcessor._remove_stale_parts(base)
+        handoff = handoff or settings.AUDIO_CHUNK_HANDOFF
+        pack = None
+        if handoff == "memory" and shared:
+            pack_path = base.with_suffix(".chunks")
+            pack = pack_path.open("wb")
+
+        try:
+            pieces = AudioProcessor._iter_encoded_chunks(file_path, chunk_sec)
+            for index, (start, end, data, pcm_hash) in enumerate(pieces):
+                chunk = {
+                    "index": index,
+                    "start": round(start, 2),
+                    "end": round(end, 2),
+                    "pcm_hash": pcm_hash,
+                }
+                if handoff == "files":
+                    chunk_path = base.with_suffix(f".part{index}.flac")
+                    chunk_path.write_bytes(data)
+                    chunk["path"] = str(chunk_path)
+                elif pack is not None:
+                    chunk.update(path=str(pack_path), offset=pack.tell(), length=len(data))
+                    pack.write(data)
+                    pack.flush()  # قطعه پیش از تحویل برای خوانندهٔ دیگر قابل خواندن باشد
+                else:
+                    chunk["data"] = data
+                yield chunk
+        finally:
+            if pack is not None:
+                pack.close()
+
+    @staticmethod
+    def _iter_encoded_chunks(
+        file_path: Path, chunk_sec: Optional[int] = None
+    ) -> Iterator[Tuple[float, float, bytes, str]]:
+        """
+        رمزگشایی جریانی، برش (در مکث‌ها یا با طول ثابت) و کدگذاری FLAC هر قطعه؛
+        هش SHA-256 نمونه‌های PCM نرمال‌شده هم برای کلید کش برگردانده می‌شود.
+        """
+        rate = settings.AUDIO_SAMPLE_RATE
+        chunk_sec = chunk_sec or settings.AUDIO_CHUNK_SIZE
+        windows = AudioProcessor._iter_pcm_windows(file_path)
+        if settings.AUDIO_VAD_ENABLED:
+            pieces = iter_speech_chunks(
+                windows,
+                sample_rate=rate,
+                max_sec=chunk_sec,
+                min_sec=settings.AUDIO_MIN_CHUNK_SIZE,
+                threshold_db=settings.AUDIO_VAD_THRESHOLD_DB,
+                min_silence_ms=settings.AUDIO_VAD_MIN_SILENCE_MS,
+            )
+        else:
+            pieces = AudioProcessor._iter_fixed_chunks(windows, rate, chunk_sec)
+
+        for start, end, samples in pieces:
+            yield start, end, encode_flac(samples, rate), hashlib.sha256(samples.tobytes()).hexdigest()
+
+    @staticmethod
+    def _iter_fixed_chunks(
+        windows: Iterator[np.ndarray], rate: int, chunk_sec: int
+    ) -> Iterator[Tuple[float, float, np.ndarray]]:
+        """برش کور با طول ثابت روی جریان نمونه‌ها"""
+        size = chunk_sec * rate
+        buf = np.empty(0, dtype=np.int16)
+        offset = 0
+        for window in windows:
+            buf = np.concatenate((buf, window))
+            while len(buf) >= size:
+                yield offset / rate, (offset + size) / rate, buf[:size]
+                offset += size
+                buf = buf[size:]
+        if len(buf):
+            yield offset / rate, (offset + len(buf)) / rate, buf
+
+    @staticmethod
+    def _iter_pcm_windows(file_path: Path, window_sec: int = 10) -> Iterator[np.ndarray]:
+        """خواندن تدریجی صوت تک‌کاناله ۱۶ بیتی از خروجی ffmpeg در پنجره‌های ثابت"""
+        rate = settings.AUDIO_SAMPLE_RATE
+        cmd = [
+            settings.FFMPEG_BINARY,
+            "-hide_banner", "-loglevel", "error", "-nostdin",
+            "-i", str(file_path),
+            "-vn", "-ac", "1", "-ar", str(rate),
+            "-f", "s16le", "pipe:1",
+        ]
+        window_bytes = window_sec * rate * 2
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            while data := proc.stdout.read(window_bytes):
+                yield np.frombuffer(data[: len(data) - len(data) % 2], dtype=np.int16)
+            stderr = proc.stderr.read()
+            if proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg decode failed: {stderr.decode(errors='ignore').strip()}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
 
     @retry(
         stop=stop_after_attempt(settings.AUDIO_MAX_RETRIES),
         wait=wait_exponential(multiplier=1, min=1, max=10),
+        retry=retry_if_exception_type(sr.RequestError),
         reraise=True
     )
-    def _transcribe_chunk(self, chunk_path: Path, language: str) -> str:
-        """تبدیل یک قطعه صوتی به متن"""
-        with sr.AudioFile(str(chunk_path)) as src:
-            audio_data = self.recognizer.record(src)
-            return self.recognizer.recognize_google(audio_data, language=language)
+    def _transcribe_chunk(self, chunk: Dict, language: str) -> str:
+        """تبدیل یک قطعه صوتی به متن (ابتدا از کش نتایج)"""
+        cache_key = chunk_cache_key(chunk, language)
+        cached = chunk_transcript_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            if not cached:
+                raise sr.UnknownValueError()
+            return cached
 
-    def transcribe_audio(
+        audio_data = load_chunk_audio(chunk)
+        try:
+            transcript = recognize_google_limited(self.recognizer, audio_data, language)
+        except sr.UnknownValueError:
+            if cache_key:
+                chunk_transcript_cache.set(cache_key, "")
+            raise
+        if cache_key:
+            chunk_transcript_cache.set(cache_key, transcript)
+        return transcript
+
+    def iter_transcribe_audio(
         self,
         file_path: str | Path,
         language: Optional[str] = None,
-    ) -> List[Dict]:
-        """تبدیل فایل صوتی به متن"""
+    ) -> Iterator[Dict]:
+        """تبدیل فایل صوتی به متن، قطعه به قطعه؛ هر قطعه به محض پیاده‌شدن تحویل داده می‌شود"""
         file_path = Path(file_path).expanduser().resolve()
-        segments: List[Dict] = []
         language = language or self.default_lang
 
         try:
-            parts = self.split_audio(file_path)
-            
-            for idx, part_path in enumerate(parts):
-                start_sec = idx * self.chunk_sec
-                end_sec = start_sec + self.chunk_sec
+            for idx, chunk in enumerate(self.prepare_chunks(file_path)):
+                if "path" in chunk:
+                    self.temp_files.append(Path(chunk["path"]))
+                start_sec, end_sec = chunk["start"], chunk["end"]
                 transcript = ""
 
                 try:
-                    transcript = self._transcribe_chunk(part_path, language)
+                    transcript = self._transcribe_chunk(chunk, language)
                 except sr.UnknownValueError:
                     transcript = f"({self.sec_to_mmss(start_sec)}-{self.sec_to_mmss(end_sec)})"
                 except sr.RequestError as e:
                     print(f"API Error for chunk {idx}: {e}")
                     raise
 
-                segments.append({
+                yield {
                     "start": start_sec,
                     "end": end_sec,
                     "text": transcript
-                })
-
-            return segments
+                }
         finally:
             self.cleanup()
 
+    def transcribe_audio(
+        self,
+        file_path: str | Path,
+        language: Optional[str] = None,
+    ) -> List[Dict]:
+        """تبدیل فایل صوتی به متن"""
+        return list(self.iter_transcribe_audio(file_path, language))
+
     @staticmethod
-    def sec_to_mmss(seconds: int) -> str:
+    def sec_to_mmss(seconds: float) -> str:
         """تبدیل ثانیه به فرمت MM:SS"""
-        minutes, seconds = divmod(seconds, 60)
+        minutes, seconds = divmod(int(seconds), 60)
         return f"{minutes:02d}:{seconds:02d}"
 
+def recognize_google_limited(recognizer: sr.Recognizer, audio_data: sr.AudioData, language: str) -> str:
+    """
+    فراخوانی recognize_google پس از گرفتن مجوز از محدودکنندهٔ نرخ مشترک؛
+    نتیجه (خطا یا تأخیر) برای تنظیم نرخ کل خوشه گزارش می‌شود. اگر مجوز در مهلت
+    RATE_LIMIT_MAX_WAIT نرسد، بدون فراخوانی سرویس sr.RequestError (قابل تکرار) برانگیخته می‌شود.
+    """
+    if not recognizer_limiter.acquire():
+        raise sr.RequestError("rate limiter: no permit within RATE_LIMIT_MAX_WAIT")
+    started = time.monotonic()
+    try:
+        transcript = recognizer.recognize_google(audio_data, language=language)
+    except sr.UnknownValueError:
+        recognizer_limiter.report(latency=time.monotonic() - started)
+        raise
+    except sr.RequestError:
+        recognizer_limiter.report(error=True)
+        raise
+    recognizer_limiter.report(latency=time.monotonic() - started)
+    return transcript
+
 # سازگاری با کد قدیمی
 def transcribe_audio_google(*args, **kwargs):
     return AudioProcessor().transcribe_audio(*args, **kwargs)
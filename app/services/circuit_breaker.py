@@ -0,0 +1,159 @@
+# app/services/circuit_breaker.py
+# قطع‌کنندهٔ مدار مشترک بین همهٔ workerها (روی Redis) و دسته‌بندی خطاهای سرویس هوش مصنوعی
+from __future__ import annotations
+
+import os
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from app.core.config import settings
+
+# خطاهایی که تکرار درخواست ممکن است نتیجه بدهد
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """سرویس موقتاً در دسترس نیست؛ کار باید پس از retry_after ثانیه دوباره اجرا شود"""
+
+    def __init__(self, retry_after: float, message: str = "AI provider circuit is open"):
+        super().__init__(f"{message} (retry after {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+
+def response_of(exc: BaseException):
+    """پاسخ HTTP متصل به خطای requests یا httpx (در صورت وجود)"""
+    return getattr(exc, "response", None)
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    """مقدار سرآیند Retry-After بر حسب ثانیه (قالب عددی یا تاریخ HTTP) یا None"""
+    response = response_of(exc)
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    خطاهای شبکه/timeout و وضعیت‌های 408، 429 و 5xx قابل تکرارند؛ سایر 4xx
+    (کلید نامعتبر، درخواست نادرست و ...) هرگز با تکرار درست نمی‌شوند.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    response = response_of(exc)
+    if response is None:
+        return True
+    return response.status_code in RETRYABLE_STATUS
+
+
+def wait_for_retry(retry_state) -> float:
+    """زمان انتظار tenacity: Retry-After سرویس در صورت وجود، وگرنه نمایی با jitter"""
+    exc = retry_state.outcome.exception()
+    hinted = retry_after_of(exc) if exc is not None else None
+    if hinted is not None:
+        return min(hinted, settings.AI_RETRY_MAX_WAIT)
+    backoff = min(settings.AI_RETRY_MAX_WAIT, 2 ** retry_state.attempt_number)
+    return random.uniform(backoff / 2, backoff)
+
+
+class CircuitBreaker:
+    """
+    با رسیدن تعداد خطاهای قابل تکرار در یک پنجرهٔ زمانی به آستانه، یا دریافت
+    Retry-After طولانی‌تر از حد انتظار، مدار برای همهٔ workerها باز می‌شود و
+    درخواست‌ها بی‌درنگ CircuitOpenError می‌گیرند. پس از پایان مهلت، درخواست‌ها
+    دوباره آزاد می‌شوند. در نبود Redis مدار همیشه بسته فرض می‌شود.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, window: int, open_seconds: int):
+        self.open_key = f"circuit:{name}:open"
+        self.failures_key = f"circuit:{name}:failures"
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.open_seconds = open_seconds
+        self._redis = None
+        self._pid = None
+
+    def _client(self):
+        if self._redis is None or self._pid != os.getpid():
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+            self._pid = os.getpid()
+        return self._redis
+
+    def retry_after(self) -> float:
+        """ثانیه‌های باقی‌مانده تا بسته شدن مدار؛ صفر یعنی مدار بسته است"""
+        try:
+            ttl_ms = self._client().pttl(self.open_key)
+        except Exception as e:
+            print(f"[CircuitBreaker:{self.open_key}] unavailable: {e}")
+            return 0.0
+        return ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else 0.0
+
+    def check(self):
+        remaining = self.retry_after()
+        if remaining > 0:
+            raise CircuitOpenError(remaining)
+
+    def open(self, seconds: float):
+        try:
+            client = self._client()
+            client.set(self.open_key, 1, px=int(seconds * 1000))
+            client.delete(self.failures_key)
+            print(f"[CircuitBreaker:{self.open_key}] opened for {seconds:.0f}s")
+        except Exception as e:
+            print(f"[CircuitBreaker:{self.open_key}] open failed: {e}")
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        if retry_after is not None and retry_after > settings.AI_RETRY_MAX_WAIT:
+            # سرویس صریحاً مهلتی طولانی‌تر از حد انتظار خواسته است
+            self.open(retry_after)
+            return
+        try:
+            client = self._client()
+            pipe = client.pipeline()
+            pipe.incr(self.failures_key)
+            pipe.expire(self.failures_key, self.window)
+            failures, _ = pipe.execute()
+        except Exception as e:
+            print(f"[CircuitBreaker:{self.open_key}] record failed: {e}")
+            return
+        if failures >= self.failure_threshold:
+            self.open(max(self.open_seconds, retry_after or 0))
+
+    def record_success(self):
+        try:
+            self._client().delete(self.failures_key)
+        except Exception:
+            pass
+
+    def reset(self):
+        """بستن مدار و پاک کردن شمارندهٔ خطاها"""
+        try:
+            self._client().delete(self.open_key, self.failures_key)
+        except Exception:
+            pass
+
+
+# مدار مشترک سرویس هوش مصنوعی
+ai_circuit = CircuitBreaker(
+    "ai",
+    failure_threshold=settings.AI_CIRCUIT_FAILURE_THRESHOLD,
+    window=settings.AI_CIRCUIT_WINDOW,
+    open_seconds=settings.AI_CIRCUIT_OPEN_SECONDS,
+)
@@ -0,0 +1,53 @@
+# app/services/cost_estimator.py
+# برآورد محلی توکن و هزینهٔ اصلاح با هوش مصنوعی پیش از هر فراخوانی سرویس
+from __future__ import annotations
+
+from typing import Iterable, Tuple
+
+from app.core.config import settings
+from app.services.text_processing import estimate_tokens, iter_text_chunks
+
+
+def estimate_request_tokens(body: str, context: str = "") -> int:
+    """
+    توکن‌های یک درخواست اصلاح: دستور سیستم، زمینه و متن ورودی، به‌علاوهٔ پاسخی
+    تقریباً هم‌اندازهٔ ورودی (AI_COMPLETION_RATIO برابر).
+    """
+    body_tokens = estimate_tokens(body)
+    prompt = estimate_tokens(settings.AI_SYSTEM_PROMPT) + body_tokens + settings.AI_MESSAGE_OVERHEAD_TOKENS * 2
+    if context:
+        prompt += estimate_tokens(context) + settings.AI_MESSAGE_OVERHEAD_TOKENS
+    return prompt + int(body_tokens * settings.AI_COMPLETION_RATIO)
+
+
+def estimate_chunks_tokens(chunks: Iterable[Tuple[str, str]]) -> int:
+    return sum(estimate_request_tokens(body, context) for context, body in chunks)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """برآورد توکن اصلاح یک متن با همان تقسیم‌بندی‌ای که کار واقعی استفاده می‌کند"""
+    return estimate_chunks_tokens(iter_text_chunks(text))
+
+
+def estimate_audio_tokens(duration: float) -> int:
+    """برآورد توکن اصلاح متن پیاده‌شدهٔ یک فایل صوتی از روی طول آن"""
+    transcript_tokens = duration / 60 * settings.AUDIO_TOKENS_PER_MINUTE
+    requests = max(1, -(-int(transcript_tokens) // settings.AI_PIPELINE_CHUNK_TOKENS))
+    overhead = estimate_tokens(settings.AI_SYSTEM_PROMPT) + settings.AI_MESSAGE_OVERHEAD_TOKENS * 2
+    return int(transcript_tokens * (1 + settings.AI_COMPLETION_RATIO)) + requests * overhead
+
+
+def estimate_cost(tokens: int, token_price: float) -> float:
+    return round(tokens * token_price, 2)
+
+
+def required_balance(tokens: int, token_price: float) -> float:
+    """موجودی لازم برای شروع کار، با حاشیهٔ اطمینان AI_ESTIMATE_MARGIN"""
+    return tokens * token_price * settings.AI_ESTIMATE_MARGIN
+
+
+def estimate_audio_cost(duration: float, use_ai: bool, token_price: float) -> float:
+    """برآورد هزینهٔ یک کار صوتی؛ فقط اصلاح هوش مصنوعی هزینه دارد"""
+    if not use_ai:
+        return 0.0
+    return estimate_cost(estimate_audio_tokens(duration), token_price)
@@ -0,0 +1,53 @@
+# app/services/http_client.py
+# کلاینت HTTP مشترک با اتصال‌های keep-alive؛ یک نمونه برای هر پروسه (پس از fork دوباره ساخته می‌شود)
+from __future__ import annotations
+
+import os
+import threading
+
+from app.core.config import settings
+
+_client = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _build_client():
+    if settings.AI_HTTP2:
+        try:
+            import httpx
+
+            return httpx.Client(
+                http2=True,
+                timeout=settings.AI_API_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.AI_HTTP_POOL_SIZE,
+                    max_keepalive_connections=settings.AI_HTTP_POOL_SIZE,
+                    keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+        except ImportError:
+            print("[HTTPClient] httpx[http2] نصب نیست؛ از requests استفاده می‌شود")
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    # pool_block باعث می‌شود thread اضافه منتظر اتصال آزاد بماند، نه اینکه اتصال یک‌بارمصرف باز کند
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.AI_HTTP_POOL_SIZE, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_ai_http_client():
+    """
+    کلاینت مشترک فراخوانی‌های سرویس هوش مصنوعی. هر دو نوع کلاینت (requests.Session
+    و httpx.Client) متد post با آرگومان‌های headers/json/timeout دارند.
+    """
+    global _client, _pid
+    if _client is None or _pid != os.getpid():
+        with _lock:
+            if _client is None or _pid != os.getpid():
+                _client, _pid = _build_client(), os.getpid()
+    return _client
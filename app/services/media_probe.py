@@ -0,0 +1,59 @@
+# app/services/media_probe.py
+# بررسی فایل صوتی/تصویری با ffprobe فقط از روی هدر container (بدون رمزگشایی)
+from __future__ import annotations
+
+import json
+import subprocess
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+
+class MediaProbeError(ValueError):
+    """فایل قابل خواندن نیست، جریان صوتی ندارد یا از حد مجاز طولانی‌تر است"""
+
+
+def probe_media(source: str, timeout: Optional[int] = None) -> Dict:
+    """
+    خواندن مشخصات اولین جریان صوتی یک فایل محلی یا URL: duration (ثانیه)، format_name،
+    codec، channels و sample_rate. ffprobe بدون -count_frames فقط هدرها را می‌خواند،
+    پس زمان اجرا به طول فایل وابسته نیست.
+    """
+    cmd = [
+        settings.FFPROBE_BINARY, "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration,format_name:stream=codec_name,channels,sample_rate",
+        "-of", "json",
+        str(source),
+    ]
+    try:
+        proc = subprocess.run(
+            cmd, capture_output=True, timeout=timeout or settings.AUDIO_PROBE_TIMEOUT, check=False
+        )
+    except subprocess.TimeoutExpired:
+        raise MediaProbeError("بررسی فایل بیش از حد طول کشید")
+    if proc.returncode != 0:
+        raise MediaProbeError(proc.stderr.decode(errors="ignore").strip() or "فایل قابل خواندن نیست")
+
+    data = json.loads(proc.stdout or b"{}")
+    streams = data.get("streams") or []
+    fmt = data.get("format") or {}
+    if not streams:
+        raise MediaProbeError("فایل جریان صوتی ندارد")
+    try:
+        duration = float(fmt.get("duration") or 0)
+    except ValueError:
+        duration = 0.0
+    if duration <= 0:
+        raise MediaProbeError("طول فایل قابل تشخیص نیست")
+    if settings.AUDIO_MAX_DURATION and duration > settings.AUDIO_MAX_DURATION:
+        raise MediaProbeError(f"طول فایل بیش از {settings.AUDIO_MAX_DURATION // 60} دقیقهٔ مجاز است")
+
+    stream = streams[0]
+    return {
+        "duration": duration,
+        "format_name": fmt.get("format_name", ""),
+        "codec": stream.get("codec_name", ""),
+        "channels": int(stream.get("channels") or 0),
+        "sample_rate": int(stream.get("sample_rate") or 0),
+    }
@@ -0,0 +1,183 @@
+# app/services/rate_limiter.py
+# محدودکنندهٔ نرخ مشترک بین همهٔ workerها (token bucket روی Redis) با نرخ تطبیقی
+from __future__ import annotations
+
+import os
+import time
+
+from app.core.config import settings
+
+# برداشت یک توکن؛ اگر توکن نباشد زمان انتظار لازم (ثانیه) برگردانده می‌شود.
+# زمان از خود Redis خوانده می‌شود تا اختلاف ساعت ماشین‌ها اثری نداشته باشد.
+_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local default_rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate')
+local rate = tonumber(data[3]) or default_rate
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'rate', rate)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# تغییر نرخ: ضرب در factor و سپس افزودن step، محدود به [min, max]
+_ADJUST_LUA = """
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[1])
+rate = rate * tonumber(ARGV[2]) + tonumber(ARGV[3])
+rate = math.max(tonumber(ARGV[4]), math.min(tonumber(ARGV[5]), rate))
+redis.call('HSET', KEYS[1], 'rate', rate)
+return tostring(rate)
+"""
+
+
+class AdaptiveRateLimiter:
+    """
+    token bucket مشترک با تنظیم AIMD: هر پاسخ موفق نرخ را کمی بالا می‌برد،
+    هر خطای سرویس (throttle) نرخ را نصف می‌کند و تأخیر بیش از حد هدف آن را کمی کم می‌کند.
+    در نبود Redis محدودیتی اعمال نمی‌شود تا پردازش متوقف نشود.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        min_rate: float,
+        max_rate: float,
+        latency_target: float,
+    ):
+        self.key = f"ratelimit:{name}"
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.latency_target = latency_target
+        self._redis = None
+        self._pid = None
+        self._acquire = None
+        self._adjust = None
+
+    def _client(self):
+        if self._redis is None or self._pid != os.getpid():
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+            self._acquire = self._redis.register_script(_ACQUIRE_LUA)
+            self._adjust = self._redis.register_script(_ADJUST_LUA)
+            self._pid = os.getpid()
+        return self._redis
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """انتظار تا دریافت مجوز؛ اگر مجوز تا timeout نرسد False برمی‌گرداند و فراخواننده نباید ادامه دهد"""
+        deadline = time.monotonic() + (timeout or settings.RATE_LIMIT_MAX_WAIT)
+        while True:
+            try:
+                self._client()
+                wait = float(self._acquire(keys=[self.key], args=[self.rate, self.burst]))
+            except Exception as e:
+                print(f"[RateLimiter:{self.key}] unavailable: {e}")
+                return True
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def report(self, error: bool = False, latency: float | None = None):
+        """ثبت نتیجهٔ یک فراخوانی برای تنظیم نرخ در کل خوشه"""
+        if error:
+            factor, step = 0.5, 0.0
+        elif latency is not None and latency > self.latency_target:
+            factor, step = 0.9, 0.0
+        else:
+            factor, step = 1.0, settings.RATE_LIMIT_INCREASE_STEP
+        try:
+            self._client()
+            self._adjust(
+                keys=[self.key],
+                args=[self.rate, factor, step, self.min_rate, self.max_rate],
+            )
+        except Exception as e:
+            print(f"[RateLimiter:{self.key}] adjust failed: {e}")
+
+
+# محدودکنندهٔ فراخوانی‌های recognize_google در همهٔ workerها
+recognizer_limiter = AdaptiveRateLimiter(
+    "recognizer",
+    rate=settings.RECOGNIZER_RATE_LIMIT,
+    burst=settings.RECOGNIZER_RATE_BURST,
+    min_rate=settings.RECOGNIZER_RATE_MIN,
+    max_rate=settings.RECOGNIZER_RATE_MAX,
+    latency_target=settings.RECOGNIZER_LATENCY_TARGET,
+)
+
+
+# گرفتن یک جایگاه از سقف هم‌زمانی مشترک؛ جایگاه‌های منقضی (worker از کار افتاده) آزاد می‌شوند
+_SLOT_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+  redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+  redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2])) + 60)
+  return 1
+end
+return 0
+"""
+
+
+class ConcurrencyLimiter:
+    """
+    سقف تعداد درخواست‌های هم‌زمان در کل خوشه (semaphore روی Redis). هر جایگاه
+    مهلت lease دارد تا جایگاه workerی که از کار افتاده برای همیشه اشغال نماند.
+    در نبود Redis محدودیتی اعمال نمی‌شود.
+    """
+
+    def __init__(self, name: str, limit: int, lease: float):
+        self.key = f"concurrency:{name}"
+        self.limit = limit
+        self.lease = lease
+        self._redis = None
+        self._pid = None
+        self._script = None
+
+    def _client(self):
+        if self._redis is None or self._pid != os.getpid():
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+            self._script = self._redis.register_script(_SLOT_ACQUIRE_LUA)
+            self._pid = os.getpid()
+        return self._redis
+
+    def try_acquire(self, token: str) -> bool:
+        try:
+            self._client()
+            return bool(self._script(keys=[self.key], args=[self.limit, self.lease, token]))
+        except Exception as e:
+            print(f"[ConcurrencyLimiter:{self.key}] unavailable: {e}")
+            return True
+
+    def release(self, token: str):
+        try:
+            self._client().zrem(self.key, token)
+        except Exception as e:
+            print(f"[ConcurrencyLimiter:{self.key}] release failed: {e}")
+
+
+# سقف درخواست‌های هم‌زمان به سرویس هوش مصنوعی در همهٔ workerها
+ai_concurrency = ConcurrencyLimiter(
+    "ai",
+    limit=settings.AI_GLOBAL_CONCURRENCY,
+    lease=settings.AI_REQUEST_DEADLINE + 30,
+)
@@ -0,0 +1,349 @@
+# app/services/result_cache.py
+# کش نتایج (پیاده‌سازی قطعه‌های صوتی، اصلاح متن و ...) روی SQLite محلی و/یا Redis، با شمارندهٔ hit/miss
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    کش کلید/مقدار متنی با فضای نام (namespace) مجزا.
+
+    - backend="sqlite": فایل محلی با حذف LRU وقتی تعداد ورودی‌ها از max_entries
+      یا حجم کل مقادیر از max_bytes (در صورت تنظیم) بیشتر شود.
+    - backend="redis": کلیدها با TTL ذخیره می‌شوند و با هر hit تمدید می‌شوند؛
+      حذف بر اساس حجم به سیاست maxmemory-policy=allkeys-lru خود Redis سپرده می‌شود.
+    - backend="tiered": SQLite محلی جلوی Redis مشترک؛ hit از Redis در SQLite هم نوشته می‌شود.
+    - backend="none": غیرفعال.
+
+    خواندن‌ها چیزی نمی‌نویسند: زمان آخرین استفاده و شمارنده‌های hit/miss در حافظه جمع
+    و هر flush_every خواندن یا flush_interval ثانیه یک‌جا در یک تراکنش نوشته می‌شوند
+    (پیش از هر set و stats هم). با پایان پروسه آخرین دستهٔ نانوشته از دست می‌رود.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        backend: Optional[str] = None,
+        path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.namespace = namespace
+        self.backend = backend or settings.RESULT_CACHE_BACKEND
+        self.path = Path(path or settings.RESULT_CACHE_PATH)
+        self.max_entries = max_entries or settings.RESULT_CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.RESULT_CACHE_TTL
+        self.max_bytes = max_bytes  # None یعنی بدون سقف حجم
+        self.flush_every = settings.RESULT_CACHE_FLUSH_EVERY
+        self.flush_interval = settings.RESULT_CACHE_FLUSH_INTERVAL
+        self._local = threading.local()
+        self._redis = None
+        self._pid = None
+        self._pending_lock = threading.Lock()
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._touched: Dict[str, float] = {}
+        self._counts = {"hits": 0, "misses": 0}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._pending_pid = os.getpid()
+
+    # ---------------------------------------------------------------- اتصال‌ها
+    def _sqlite(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " last_used REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            cols = [row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")]
+            if "size" not in cols:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_entries_lru ON cache_entries (namespace, last_used)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_counters ("
+                " namespace TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL,"
+                " PRIMARY KEY (namespace, name))"
+            )
+            # شمارندهٔ تعداد ورودی‌ها برای فایل‌های کش قدیمی‌تر یک بار از روی جدول ساخته می‌شود
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_counters (namespace, name, value)"
+                " SELECT ?, 'entries', COUNT(*) FROM cache_entries WHERE namespace = ?",
+                (self.namespace, self.namespace),
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _redis_client(self):
+        # اتصال Redis پس از fork در پروسه‌های Celery دوباره ساخته می‌شود
+        if self._redis is None or self._pid != os.getpid():
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.RESULT_CACHE_REDIS_URL, decode_responses=True)
+            self._pid = os.getpid()
+        return self._redis
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    @property
+    def _uses_sqlite(self) -> bool:
+        return self.backend in ("sqlite", "tiered")
+
+    @property
+    def _uses_redis(self) -> bool:
+        return self.backend in ("redis", "tiered")
+
+    def _record(self, key: str, hit: bool):
+        """ثبت یک خواندن در دستهٔ در حال انتظار و نوشتن دسته در صورت پر یا قدیمی شدن"""
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                # دستهٔ به ارث رسیده از پروسهٔ والد (fork) مال این پروسه نیست
+                self._reset_pending()
+            if hit and self._uses_sqlite:
+                self._touched[key] = time.time()
+            self._counts["hits" if hit else "misses"] += 1
+            self._pending += 1
+            due = (
+                self._pending >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def _take_pending(self) -> Tuple[Dict[str, float], Dict[str, int]]:
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                self._reset_pending()
+            touched, counts = self._touched, self._counts
+            self._reset_pending()
+        return touched, counts
+
+    def _write_pending(self, conn: sqlite3.Connection, touched: Dict[str, float], counts: Dict[str, int]):
+        """نوشتن دستهٔ خواندن‌ها داخل تراکنش جاری SQLite"""
+        conn.executemany(
+            "UPDATE cache_entries SET last_used = MAX(last_used, ?) WHERE namespace = ? AND key = ?",
+            [(ts, self.namespace, key) for key, ts in touched.items()],
+        )
+        for name, delta in counts.items():
+            if delta:
+                self._add_counter(conn, name, delta)
+
+    def flush(self):
+        """نوشتن زمان‌های استفاده و شمارنده‌های hit/miss جمع‌شده در یک تراکنش"""
+        touched, counts = self._take_pending()
+        if not touched and not any(counts.values()):
+            return
+        try:
+            if not self._uses_sqlite:
+                pipe = self._redis_client().pipeline(transaction=False)
+                for name, delta in counts.items():
+                    if delta:
+                        pipe.incrby(self._key(f"__{name}__"), delta)
+                pipe.execute()
+                return
+            conn = self._sqlite()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_pending(conn, touched, counts)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.warning(f"[ResultCache:{self.namespace}] flush failed: {e}")
+
+    # ---------------------------------------------------------------- API
+    def _sqlite_get(self, key: str) -> Optional[str]:
+        conn = self._sqlite()
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _redis_get(self, key: str) -> Optional[str]:
+        client = self._redis_client()
+        value = client.get(self._key(key))
+        if value is not None:
+            client.expire(self._key(key), self.ttl)
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        if self.backend == "none":
+            return None
+        try:
+            value = self._sqlite_get(key) if self._uses_sqlite else None
+            if value is None and self._uses_redis:
+                value = self._redis_get(key)
+                if value is not None and self._uses_sqlite:
+                    self._sqlite_set(key, value)
+            self._record(key, value is not None)
+            return value
+        except Exception as e:
+            # خطای کش نباید پردازش اصلی را متوقف کند
+            logger.warning(f"[ResultCache:{self.namespace}] get failed: {e}")
+            return None
+
+    def _sqlite_set(self, key: str, value: str):
+        conn = self._sqlite()
+        size = len(value.encode("utf-8"))
+        touched, counts = self._take_pending()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # خواندن‌های اخیر پیش از انتخاب قربانی‌های LRU ثبت می‌شوند
+            self._write_pending(conn, touched, counts)
+            old = conn.execute(
+                "SELECT size FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, last_used, size) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, time.time(), size),
+            )
+            total_bytes = self._add_counter(conn, "bytes", size - (old[0] if old else 0))
+            count = self._add_counter(conn, "entries", 0 if old else 1)
+            if count > self.max_entries:
+                freed = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM (SELECT size FROM cache_entries"
+                    " WHERE namespace = ? ORDER BY last_used LIMIT ?)",
+                    (self.namespace, count - self.max_entries),
+                ).fetchone()[0]
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM cache_entries WHERE namespace = ? ORDER BY last_used LIMIT ?)",
+                    (self.namespace, self.namespace, count - self.max_entries),
+                )
+                total_bytes = self._add_counter(conn, "bytes", -freed)
+                self._add_counter(conn, "entries", -(count - self.max_entries))
+            if self.max_bytes and total_bytes > self.max_bytes:
+                self._evict_bytes(conn, total_bytes - self.max_bytes)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _add_counter(self, conn: sqlite3.Connection, name: str, delta: int) -> int:
+        """افزودن delta به یک شمارندهٔ این فضای نام (bytes، entries، hits، misses) و بازگرداندن مقدار جدید"""
+        conn.execute(
+            "INSERT INTO cache_counters (namespace, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value",
+            (self.namespace, name, delta),
+        )
+        return conn.execute(
+            "SELECT value FROM cache_counters WHERE namespace = ? AND name = ?", (self.namespace, name)
+        ).fetchone()[0]
+
+    def _evict_bytes(self, conn: sqlite3.Connection, excess: int):
+        """حذف قدیمی‌ترین ورودی‌ها تا حجم کل دست‌کم excess بایت کم شود"""
+        freed = 0
+        victims = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY last_used",
+            (self.namespace,),
+        ):
+            if freed >= excess:
+                break
+            victims.append((self.namespace, key))
+            freed += size
+        conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", victims)
+        self._add_counter(conn, "bytes", -freed)
+        self._add_counter(conn, "entries", -len(victims))
+
+    def set(self, key: str, value: str):
+        if self.backend == "none":
+            return
+        try:
+            if self._uses_redis:
+                self._redis_client().set(self._key(key), value, ex=self.ttl)
+            if self._uses_sqlite:
+                self._sqlite_set(key, value)
+        except Exception as e:
+            logger.warning(f"[ResultCache:{self.namespace}] set failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """تعداد hit و miss (و در SQLite تعداد و حجم ورودی‌ها)؛ هر hit یعنی یک فراخوانی سرویس بیرونی که لازم نشد"""
+        if self.backend == "none":
+            return {"hits": 0, "misses": 0}
+        self.flush()
+        if not self._uses_sqlite:
+            client = self._redis_client()
+            return {
+                name: int(client.get(self._key(f"__{name}__")) or 0)
+                for name in ("hits", "misses")
+            }
+        rows = self._sqlite().execute(
+            "SELECT name, value FROM cache_counters WHERE namespace = ?", (self.namespace,)
+        ).fetchall()
+        counters = {"hits": 0, "misses": 0}
+        counters.update(dict(rows))
+        return counters
+
+
+# کش نتایج پیاده‌سازی قطعه‌های صوتی (کلید: هش PCM نرمال‌شده + زبان)
+chunk_transcript_cache = ResultCache("asr")
+
+
+def chunk_cache_key(chunk: Dict, language: str) -> Optional[str]:
+    pcm_hash = chunk.get("pcm_hash")
+    return f"{pcm_hash}:{language}" if pcm_hash else None
+
+
+# کش اصلاح متن با هوش مصنوعی (کلید: مدل، دستور سیستم، دما، زمینه و هش متن نرمال‌شده)
+ai_correction_cache = ResultCache(
+    "ai",
+    backend=settings.AI_CACHE_BACKEND,
+    max_bytes=settings.AI_CACHE_MAX_BYTES,
+)
+
+
+def _normalize_text(text: str) -> str:
+    # یکسان‌سازی نویسه‌های عربی/فارسی و فاصله‌ها تا تفاوت‌های ظاهری کلید را عوض نکنند
+    return " ".join(text.replace("ي", "ی").replace("ك", "ک").replace("\u200c", " ").split())
+
+
+def ai_cache_key(text: str, context: str = "") -> str:
+    parts = [
+        settings.AI_MODEL_NAME,
+        settings.AI_SYSTEM_PROMPT,
+        repr(settings.AI_TEMPERATURE),
+        _normalize_text(context),
+        _normalize_text(text),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_cached_correction(text: str, context: str = "") -> Optional[Tuple[str, int]]:
+    """متن اصلاح‌شده و تعداد توکن ذخیره‌شده، تا هزینهٔ hit مثل بار اول محاسبه شود"""
+    value = ai_correction_cache.get(ai_cache_key(text, context))
+    if value is None:
+        return None
+    data = json.loads(value)
+    return data["text"], data["tokens"]
+
+
+def store_correction(text: str, context: str, corrected: str, tokens: int):
+    ai_correction_cache.set(
+        ai_cache_key(text, context),
+        json.dumps({"text": corrected, "tokens": tokens}, ensure_ascii=False),
+    )
@@ -1,7 +1,48 @@
 # app/services/text_processing.py
 
+import re
+import warnings
+from typing import Iterator, List, Optional, Tuple
+
 import docx
 
+from app.core.config import settings
+
+# میانگین تقریبی نویسه به ازای هر توکن در tokenizerهای BPE رایج:
+# متن لاتین حدود ۴ نویسه، متن فارسی/عربی حدود ۲ نویسه
+_LATIN_CHARS_PER_TOKEN = 4.0
+_OTHER_CHARS_PER_TOKEN = 2.0
+
+_LINE_RE = re.compile(r"[^\n]*\n?")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?؟…])\s+")
+
+_encoder = None
+
+
+def _get_encoder():
+    """tokenizer مدل در صورت نصب بودن tiktoken؛ در غیر این صورت None"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+
+            _encoder = tiktoken.get_encoding(settings.AI_TOKENIZER_ENCODING)
+        except Exception:
+            _encoder = False
+    return _encoder or None
+
+
+def estimate_tokens(text: str) -> int:
+    """برآورد محلی تعداد توکن‌های یک متن بدون فراخوانی سرویس (با tiktoken اگر نصب باشد)"""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    latin = sum(1 for ch in text if ord(ch) < 128)
+    return int(latin / _LATIN_CHARS_PER_TOKEN + (len(text) - latin) / _OTHER_CHARS_PER_TOKEN) + 1
+
+
 def extract_text_from_docx(file_path: str) -> str:
     """متن را از یک فایل .docx استخراج می‌کند."""
     try:
@@ -11,7 +52,104 @@ def extract_text_from_docx(file_path: str) -> str:
         print(f"Error reading docx file {file_path}: {e}")
         return ""
 
-def split_text_into_chunks(text: str, chunk_size: int = 2500):
-    """یک متن طولانی را به قطعات کوچکتر با اندازه مشخص تقسیم می‌کند."""
-    for i in range(0, len(text), chunk_size):
-        yield text[i:i + chunk_size]
+
+def _iter_sentences(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    جمله‌های متن همراه با جداکنندهٔ پیش از هر جمله: "\\n\\n" برای شروع پاراگراف،
+    "\\n" برای شروع سطر و " " بین جمله‌های یک سطر. متن سطر به سطر پیمایش می‌شود.
+    """
+    blank = False
+    for match in _LINE_RE.finditer(text):
+        line = match.group().strip()
+        if not line:
+            blank = True
+            continue
+        sep = "\n\n" if blank else "\n"
+        blank = False
+        for sentence in _SENTENCE_END_RE.split(line):
+            if sentence:
+                yield sentence, sep
+                sep = " "
+
+
+def _fit_sentence(sentence: str, max_tokens: int) -> Iterator[str]:
+    """جملهٔ بلندتر از سقف در مرز کلمه‌ها شکسته می‌شود (هیچ کلمه‌ای نصف نمی‌شود)"""
+    if estimate_tokens(sentence) <= max_tokens:
+        yield sentence
+        return
+    words: List[str] = []
+    tokens = 0
+    for word in sentence.split():
+        t = estimate_tokens(word) + 1
+        if words and tokens + t > max_tokens:
+            yield " ".join(words)
+            words, tokens = [], 0
+        words.append(word)
+        tokens += t
+    if words:
+        yield " ".join(words)
+
+
+def _render(pieces: List[Tuple[str, str]]) -> str:
+    return "".join(piece if i == 0 else sep + piece for i, (piece, sep) in enumerate(pieces))
+
+
+def iter_text_chunks(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    بسته‌بندی جمله‌ها و پاراگراف‌های کامل در قطعه‌هایی تا سقف max_tokens توکن.
+    خروجی (زمینه، قطعه) است؛ زمینه آخرین جمله‌های قطعهٔ قبل تا overlap_tokens
+    توکن است که فقط برای حفظ پیوستگی همراه قطعه ارسال می‌شود.
+    """
+    max_tokens = max_tokens or settings.AI_CHUNK_MAX_TOKENS
+    overlap_tokens = settings.AI_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    pieces: List[Tuple[str, str, int]] = []
+    total = 0
+    context = ""
+
+    def flush() -> Tuple[str, str]:
+        nonlocal pieces, total, context
+        chunk = (context, _render([(p, s) for p, s, _ in pieces]))
+        tail, tail_tokens = [], 0
+        for piece, sep, t in reversed(pieces):
+            if tail_tokens + t > overlap_tokens:
+                break
+            tail.insert(0, (piece, sep))
+            tail_tokens += t
+        context = _render(tail)
+        pieces, total = [], 0
+        return chunk
+
+    for sentence, sep in _iter_sentences(text):
+        for piece in _fit_sentence(sentence, max_tokens):
+            t = estimate_tokens(piece)
+            if pieces and total + t > max_tokens:
+                yield flush()
+            pieces.append((piece, sep, t))
+            total += t
+            sep = " "
+    if pieces:
+        yield flush()
+
+
+def split_text_into_chunks(
+    text: str, chunk_size: Optional[int] = None, *, max_tokens: Optional[int] = None
+) -> Iterator[str]:
+    """
+    یک متن طولانی را در مرز جمله‌ها به قطعه‌هایی با حداکثر max_tokens توکن تقسیم می‌کند.
+    chunk_size (اندازه بر حسب نویسه، امضای قدیمی) منسوخ است و به توکن تبدیل می‌شود.
+    """
+    if chunk_size is not None:
+        warnings.warn(
+            "split_text_into_chunks(chunk_size=...) is deprecated; pass max_tokens=... instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        if max_tokens is None:
+            max_tokens = max(1, int(chunk_size / _OTHER_CHARS_PER_TOKEN))
+    for _, chunk in iter_text_chunks(text, max_tokens, overlap_tokens=0):
+        yield chunk
@@ -0,0 +1,95 @@
+# app/services/vad.py
+# تشخیص سکوت بر پایهٔ انرژی فریم‌ها (برداری با NumPy) برای تعیین نقاط برش صوت
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+_EPS = 1e-10
+
+
+def frame_energy_db(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """انرژی RMS هر فریم کامل بر حسب dBFS"""
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(rms + _EPS)
+
+
+def quietest_cut(energy_db: np.ndarray, lo: int, hi: int, width: int) -> int:
+    """
+    اندیس فریمی در بازهٔ [lo, hi) که وسط آرام‌ترین پنجرهٔ width فریمی است؛
+    میانگین لغزان با cumsum محاسبه می‌شود تا حلقهٔ پایتونی لازم نباشد.
+    """
+    width = max(1, min(width, hi - lo))
+    cs = np.concatenate(([0.0], np.cumsum(energy_db[lo:hi], dtype=np.float64)))
+    window_mean = (cs[width:] - cs[:-width]) / width
+    return lo + int(np.argmin(window_mean)) + width // 2
+
+
+def iter_speech_chunks(
+    windows: Iterable[np.ndarray],
+    sample_rate: int,
+    max_sec: float,
+    min_sec: float,
+    threshold_db: float,
+    frame_ms: int = 30,
+    min_silence_ms: int = 300,
+    pad_ms: int = 200,
+) -> Iterator[Tuple[float, float, np.ndarray]]:
+    """
+    قطعه‌های گفتار را از جریان نمونه‌های int16 تک‌کاناله تولید می‌کند.
+
+    هر قطعه حداکثر max_sec طول دارد و در آرام‌ترین نقطهٔ بازهٔ [min_sec, max_sec]
+    بریده می‌شود؛ بازه‌های کاملاً ساکت حذف می‌شوند. خروجی (شروع، پایان، نمونه‌ها)
+    با زمان‌های واقعی بر حسب ثانیه است. حافظه به اندازهٔ یک قطعه و یک پنجره محدود است.
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    max_frames = int(max_sec * 1000 / frame_ms)
+    min_frames = min(int(min_sec * 1000 / frame_ms), max_frames - 1)
+    silence_frames = max(1, int(min_silence_ms / frame_ms))
+    pad_frames = int(pad_ms / frame_ms)
+
+    buf = np.empty(0, dtype=np.int16)
+    offset = 0  # اندیس نمونهٔ buf[0] در کل فایل
+
+    def drain(final: bool):
+        nonlocal buf, offset
+        while True:
+            energy = frame_energy_db(buf, frame)
+            if final and len(buf) % frame:
+                # فریم ناقص انتهایی هم در تصمیم‌گیری لحاظ شود
+                tail = np.pad(buf[len(energy) * frame:], (0, frame - len(buf) % frame))
+                energy = np.concatenate((energy, frame_energy_db(tail, frame)))
+            voiced = energy > threshold_db
+            if not voiced.any():
+                keep = 0 if final else len(buf) % frame
+                offset += len(buf) - keep
+                buf = buf[len(buf) - keep:]
+                return
+
+            lead = max(int(np.argmax(voiced)) - pad_frames, 0)
+            if lead:
+                offset += lead * frame
+                buf, energy, voiced = buf[lead * frame:], energy[lead:], voiced[lead:]
+
+            if len(energy) <= max_frames:
+                if not final:
+                    return
+                last_voiced = len(voiced) - int(np.argmax(voiced[::-1]))
+                cut = min(last_voiced + pad_frames, len(energy))
+            else:
+                cut = max(quietest_cut(energy, min_frames, max_frames, silence_frames), 1)
+
+            end = min(cut * frame, len(buf))
+            yield offset / sample_rate, (offset + end) / sample_rate, buf[:end]
+            offset += end
+            buf = buf[end:]
+
+    for window in windows:
+        buf = np.concatenate((buf, window))
+        yield from drain(final=False)
+    yield from drain(final=True)
@@ -4,15 +4,21 @@ import time
 from sqlalchemy.orm import Session
 from app.celery_app import celery_app
 from app.database import SessionLocal
+from app.core.workspace import workspace_manager
 from app import models, crud
-from app.services.audio_processing import transcribe_audio_google
-from .helpers import to_clean_string
+from app.core.config import settings
+from app.services.audio_processing import AudioProcessor, transcribe_audio_google
+from .helpers import correct_segments_pipelined, to_clean_string
 from app.services.ai_services import correct_text_with_ai
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.cost_estimator import estimate_audio_tokens, required_balance
+from app.services.media_probe import probe_media
 
 @celery_app.task(bind=True, name="audio_transcribe_task")
 def background_audio_task(self, record_id: int, file_path: str, language: str, process_ai: bool, original_filename: str):
     db: Session = SessionLocal()
     start_time = time.time()
+    deferred = False
 
     try:
         record = db.query(models.TranscriptionFile).get(record_id)
@@ -20,36 +26,75 @@ def background_audio_task(self, record_id: int, file_path: str, language: str, p
             return
 
         user = record.owner
-        if process_ai and user.wallet_balance < (200 * user.token_price):
-            raise ValueError("موجودی برای اصلاح با هوش مصنوعی کافی نیست.")
+        if process_ai:
+            # برآورد هزینهٔ اصلاح از روی طول فایل و رزرو آن، پیش از هر پیاده‌سازی یا فراخوانی سرویس
+            duration = record.duration_seconds or probe_media(file_path)["duration"]
+            estimated_tokens = estimate_audio_tokens(duration)
+            try:
+                crud.transactions.reserve_funds(
+                    db, user, record, required_balance(estimated_tokens, user.token_price)
+                )
+            except ValueError:
+                raise ValueError(
+                    f"موجودی برای اصلاح با هوش مصنوعی کافی نیست (برآورد {estimated_tokens} توکن)."
+                )
 
         crud.transcriptions.update_transcription_status(db, record_id, "processing")
 
-        raw_segments = transcribe_audio_google(file_path, language)
-        raw_text_str = to_clean_string(raw_segments)
-        if not raw_text_str or "[خطا" in raw_text_str:
-            raise ValueError("پیاده‌سازی صوت ناموفق بود.")
+        if process_ai and settings.AI_PIPELINE_ENABLED:
+            # اصلاح هر گروه از قطعه‌ها هم‌زمان با پیاده‌سازی قطعه‌های بعدی
+            segments = AudioProcessor().iter_transcribe_audio(file_path, language)
+            raw_text_str, corrected_text, token_usage, cache_stats, failed_groups = correct_segments_pipelined(
+                segments, user.token_price
+            )
+            record.ai_cache_hits, record.ai_cache_misses = cache_stats["hits"], cache_stats["misses"]
+            print(f"[Celery-Audio] Record {record_id} AI cache: {cache_stats}")
+            if not raw_text_str or "[خطا" in raw_text_str:
+                raise ValueError("پیاده‌سازی صوت ناموفق بود.")
+            if failed_groups and not settings.AI_ALLOW_DEGRADED:
+                raise ValueError(f"خطای AI در {failed_groups} گروه از قطعه‌ها")
+            # حالت ناقص: گروه‌های ناموفق با متن خام خودشان در خروجی می‌مانند
+            record.ai_failed_chunks = failed_groups
+        else:
+            raw_segments = transcribe_audio_google(file_path, language)
+            raw_text_str = to_clean_string(raw_segments)
+            if not raw_text_str or "[خطا" in raw_text_str:
+                raise ValueError("پیاده‌سازی صوت ناموفق بود.")
+            if process_ai:
+                corrected_text, token_usage = correct_text_with_ai(raw_text_str, user.token_price)
+                if "[خطا" in corrected_text:
+                    raise ValueError("اصلاح با هوش مصنوعی ناموفق بود.")
 
         record.raw_result_text = raw_text_str
-        final_text, token_usage = raw_text_str, 0
+        final_text = raw_text_str
 
         if process_ai:
-            corrected_text, token_usage = correct_text_with_ai(raw_text_str, user.token_price)
-            if "[خطا" in corrected_text:
-                raise ValueError("اصلاح با هوش مصنوعی ناموفق بود.")
-
             final_text = corrected_text
             record.ai_result_text = corrected_text
             record.ai_token_usage = token_usage
 
-            crud.transactions.debit_from_wallet(
-                db, user=user,
+            # تغییرات رکورد پیش از تسویه ثبت می‌شوند؛ retry_on_locked در صورت قفل rollback می‌کند
+            db.commit()
+            shortfall = crud.transactions.settle_reserved_funds(
+                db, user, record,
                 cost=token_usage * user.token_price,
                 description=f"هزینه اصلاح فایل: {original_filename}"
             )
+            if shortfall:
+                print(f"[Celery-Audio] Record {record_id} billing shortfall: {shortfall}")
 
         crud.transcriptions.finalize_job(db, record, final_text, int(time.time() - start_time))
 
+    except CircuitOpenError as e:
+        db.rollback()
+        if self.request.retries >= settings.AI_DEFER_MAX_RETRIES:
+            crud.transcriptions.update_transcription_status(db, record_id, "failed")
+            raise
+        # فایل و پوشهٔ کاری برای اجرای بعدی نگه داشته می‌شوند؛ نتایج پیاده‌سازی در کش قطعه‌ها هست
+        deferred = True
+        print(f"[Celery-Audio] Record {record_id} deferred for {e.retry_after:.0f}s: {e}")
+        crud.transcriptions.update_transcription_status(db, record_id, "queued")
+        raise self.retry(exc=e, countdown=e.retry_after, max_retries=settings.AI_DEFER_MAX_RETRIES)
     except Exception as e:
         print(f"[Celery-Audio] Record {record_id} failed: {e}")
         db.rollback()
@@ -58,3 +103,5 @@ def background_audio_task(self, record_id: int, file_path: str, language: str, p
     finally:
         db.commit()
         db.close()
+        if not deferred:
+            workspace_manager.release(record_id)
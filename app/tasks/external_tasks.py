@@ -5,7 +5,11 @@ from pathlib import Path
 from sqlalchemy.orm import Session
 from app.celery_app import celery_app
 from app.database import SessionLocal
-from app import models
+from app.core.config import settings
+from app.core.workspace import WorkspaceBudgetExceeded, workspace_manager
+from app import models, crud
+from app.services.cost_estimator import estimate_audio_cost
+from app.services.media_probe import MediaProbeError, probe_media
 from .audio_tasks import background_audio_task
 
 @celery_app.task(bind=True, name="external_job_task")
@@ -16,19 +20,42 @@ def enqueue_external_job(self, job_id: int, file_url: str, language: str, mode:
         if not record:
             raise ValueError("Job not found")
 
-        local_path = Path("uploads") / f"ext_{job_id}_{Path(file_url).name}"
+        # فایل دانلودشده در پوشهٔ کاری همین کار قرار می‌گیرد و با پایان کار حذف می‌شود
+        local_path = workspace_manager.acquire(job_id) / f"ext_{job_id}_{Path(file_url).name}"
         with requests.get(file_url, stream=True, timeout=60) as r:
             r.raise_for_status()
             with open(local_path, "wb") as f:
                 shutil.copyfileobj(r.raw, f)
 
+        # بررسی هدر فایل دانلودشده (محلی، بدون دسترسی دوباره به شبکه) و ثبت برآورد هزینه روی کار
+        try:
+            media = probe_media(str(local_path))
+        except MediaProbeError as e:
+            print(f"[Celery-External] Job {job_id} rejected: {e}")
+            crud.transcriptions.update_transcription_status(db, job_id, "failed")
+            workspace_manager.release(job_id)
+            return
+        record.duration_seconds = media["duration"]
+        record.estimated_cost = estimate_audio_cost(
+            media["duration"], mode != "transcribe_only", record.owner.token_price
+        )
+        db.commit()
+
         background_audio_task.delay(job_id, str(local_path), language, mode != "transcribe_only", local_path.name)
 
         # ارسال به callback_url (اختیاری)
         # TODO: پیاده‌سازی webhook برای ارسال نتیجه
 
+    except WorkspaceBudgetExceeded as e:
+        # پوشه‌ای ساخته نشده؛ دانلود پس از آزاد شدن جا انجام می‌شود
+        if self.request.retries >= settings.WORKSPACE_MAX_WAIT_RETRIES:
+            crud.transcriptions.update_transcription_status(db, job_id, "failed")
+            raise
+        print(f"[Celery-External] Job {job_id} waiting for workspace: {e}")
+        raise self.retry(exc=e, countdown=settings.WORKSPACE_RETRY_DELAY, max_retries=settings.WORKSPACE_MAX_WAIT_RETRIES)
     except Exception as e:
         print(f"[Celery-External] Job {job_id} failed: {e}")
+        workspace_manager.release(job_id)
         raise
     finally:
         db.close()
@@ -1,7 +1,11 @@
 # app/tasks/helpers.py
 # توابع کمکی مشترک برای پردازش‌ها
-from typing import Any
+from typing import Any, Iterable
+from app.core.config import settings
+from app.services.ai_engine import AICorrectionEngine
 from app.services.ai_services import correct_text_with_ai
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.text_processing import estimate_tokens
 
 # تبدیل خروجی به متن تمیز
 def to_clean_string(raw: Any) -> str:
@@ -21,3 +25,54 @@ def correct_single_text_chunk(task_data: tuple[int, str, float]):
     idx, chunk, price = task_data
     corrected, used = correct_text_with_ai(chunk, price)
     return idx, corrected, used
+
+# پیاده‌سازی و اصلاح هم‌زمان: هر گروه از قطعه‌های پیاده‌شده که به سقف توکن برسد
+# بلافاصله به موتور ناهمگام اصلاح سپرده می‌شود و پیاده‌سازی قطعه‌های بعدی ادامه می‌یابد.
+# گروه ناموفق با متن خام خودش در خروجی می‌ماند و تعدادشان برگردانده می‌شود؛ توکن‌ها فقط از
+# گروه‌های موفق جمع می‌شوند. اگر هیچ گروهی اصلاح نشود ValueError برانگیخته می‌شود.
+def correct_segments_pipelined(segments: Iterable[dict], price: float) -> tuple[str, str, int, dict, int]:
+    budget = settings.AI_PIPELINE_CHUNK_TOKENS
+    raw_parts: list[str] = []
+    groups: list[str] = []
+    futures = []
+    group: list[str] = []
+    group_tokens = 0
+
+    with AICorrectionEngine() as engine:
+        for segment in segments:
+            text = to_clean_string(segment.get("text"))
+            if not text:
+                continue
+            raw_parts.append(text)
+            tokens = estimate_tokens(text)
+            if group and group_tokens + tokens > budget:
+                groups.append("\n".join(group))
+                futures.append(engine.submit(groups[-1]))
+                group, group_tokens = [], 0
+            group.append(text)
+            group_tokens += tokens
+        if group:
+            groups.append("\n".join(group))
+            futures.append(engine.submit(groups[-1]))
+
+        # نتایج به ترتیب گروه‌ها سرهم می‌شوند، نه به ترتیب پایان
+        corrected, total_tokens, failed = [], 0, 0
+        for idx, future in enumerate(futures):
+            try:
+                txt, used = future.result()
+                if "[خطا" in txt:
+                    raise ValueError(txt)
+            except CircuitOpenError:
+                # با مدار باز کل کار به تعویق می‌افتد
+                raise
+            except Exception as e:
+                print(f"[AI-Pipeline] group {idx} failed: {e}")
+                corrected.append(groups[idx])
+                failed += 1
+                continue
+            corrected.append(txt)
+            total_tokens += used
+
+    if futures and failed == len(futures):
+        raise ValueError("اصلاح با هوش مصنوعی برای هیچ قطعه‌ای موفق نبود.")
+    return "\n".join(raw_parts), "\n".join(corrected), total_tokens, engine.cache_stats(), failed
@@ -7,3 +7,74 @@ def cleanup_expired_sessions():
 @celery_app.task(name="app.tasks.maintenance.reset_daily_limits")
 def reset_daily_limits():
     print("🔄 Resetting daily limits...")
+
+@celery_app.task(name="app.tasks.maintenance.cleanup_workspaces")
+def cleanup_workspaces():
+    """حذف پوشه‌های کاری یتیم و قطعه‌های باقی‌ماندهٔ قدیمی در uploads، سپس اعمال سقف حجم"""
+    import shutil
+    import time
+    from pathlib import Path
+    from app import models
+    from app.core.config import settings
+    from app.core.workspace import FINISHED_STATUSES, workspace_manager
+    from app.database import SessionLocal
+
+    cutoff = time.time() - settings.WORKSPACE_ORPHAN_MAX_AGE
+    db = SessionLocal()
+    removed = 0
+    try:
+        for path in workspace_manager.workspaces():
+            job_id = workspace_manager.job_id_of(path)
+            record = db.query(models.TranscriptionFile).get(job_id) if job_id is not None else None
+            finished = record is None or record.status in FINISHED_STATUSES
+            if finished or path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+    finally:
+        db.close()
+
+    for pattern in ("*.part*.wav", "*.part*.flac", "*.chunks"):
+        for stale in Path(settings.UPLOADS_DIR).glob(pattern):
+            if stale.stat().st_mtime < cutoff:
+                stale.unlink(missing_ok=True)
+                removed += 1
+
+    removed += workspace_manager.enforce_budget()
+    print(f"🧹 Workspace cleanup removed {removed} item(s)")
+
+@celery_app.task(name="app.tasks.maintenance.sweep_stale_jobs")
+def sweep_stale_jobs():
+    """
+    کارهای قطعه‌ای در حال پردازش که شمارنده‌شان STALE_JOB_TIMEOUT ثانیه جلو نرفته:
+    با داشتن دست‌کم یک قطعهٔ موفق با همان قطعه‌ها نهایی می‌شوند، وگرنه ناموفق.
+    """
+    from datetime import datetime, timedelta
+    from app import crud, models
+    from app.core.config import settings
+    from app.core.workspace import workspace_manager
+    from app.database import SessionLocal
+    from app.tasks.parallel_audio import finalize_chunks
+
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.STALE_JOB_TIMEOUT)
+    job = models.TranscriptionFile
+    db = SessionLocal()
+    finalized = failed = 0
+    try:
+        stale = (
+            db.query(job)
+            .filter(job.status == "processing", job.progress_at < cutoff)
+            .all()
+        )
+        for record in stale:
+            if crud.chunks.get_completed_chunk_indexes(db, record.id):
+                # متن فقط از جدول قطعه‌ها سرهم می‌شود و به میزبان خاصی نیاز ندارد؛ پوشهٔ کاری
+                # باقی‌ماندهٔ کار پایان‌یافته روی میزبان اصلی را enforce_budget همان میزبان حذف می‌کند
+                finalize_chunks.delay(record.id)
+                finalized += 1
+            else:
+                crud.transcriptions.update_transcription_status(db, record.id, "failed")
+                workspace_manager.release(record.id)
+                failed += 1
+    finally:
+        db.close()
+    print(f"🧹 Stale job sweep: {finalized} finalized, {failed} failed")
@@ -2,62 +2,113 @@
 # پردازش یک فایل صوتی به‌صورت ترتیبی، اما با قطعات موازی
 
 import os
+import uuid
 from pathlib import Path
-from celery import group, chord
 from sqlalchemy.orm import Session
-from app.celery_app import celery_app
+from app.celery_app import HOST_QUEUE, celery_app
 from app.database import SessionLocal
+from app.core.config import settings
+from app.core.workspace import WorkspaceBudgetExceeded, workspace_manager
 from app import models, crud
-from app.services.audio_processing import AudioProcessor
+from app.services.audio_processing import AudioProcessor, recognize_google_limited
+from app.services.audio_encoding import load_chunk_audio
+from app.services.result_cache import chunk_cache_key, chunk_transcript_cache
 
 # بقیه کدها بدون تغییر
 from .helpers import to_clean_string
 
-# 🔹 تسک برای پیاده‌سازی یک قطعه از صوت
-@celery_app.task(name="transcribe_chunk")
-def transcribe_chunk(part_path: str, start_sec: int, end_sec: int, lang: str) -> dict:
+def _chunk_queue() -> str | None:
+    """
+    صف تسک‌های قطعه و مرحلهٔ نهایی: با پوشهٔ کاری محلی، صف میزبان سازنده (فایل قطعه‌ها فقط
+    همین‌جاست)؛ با پوشهٔ کاری مشترک، مسیریابی پیش‌فرض تا قطعه‌ها بین همهٔ میزبان‌ها پخش شوند.
+    """
+    return HOST_QUEUE if workspace_manager.host_local else None
+
+def _gap_label(start_sec: float, end_sec: float) -> str:
+    return f"({AudioProcessor.sec_to_mmss(start_sec)}-{AudioProcessor.sec_to_mmss(end_sec)})"
+
+def _recognize_chunk(chunk: dict, lang: str) -> tuple[str | None, int]:
+    """
+    متن قطعه و تعداد تلاش‌های انجام‌شده؛ متن "" یعنی گفتاری تشخیص داده نشد
+    و None یعنی همهٔ تلاش‌ها با خطای سرویس ناموفق بود.
+    """
     import speech_recognition as sr
 
+    cache_key = chunk_cache_key(chunk, lang)
+    cached = chunk_transcript_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return cached, 0
+
     recognizer = sr.Recognizer()
-    with sr.AudioFile(part_path) as src:
-        audio_data = recognizer.record(src)
+    audio_data = load_chunk_audio(chunk)
 
-    transcript = ""
+    # به‌جای خواب ثابت، هر تلاش منتظر مجوز محدودکنندهٔ نرخ مشترک می‌ماند که پس از خطا کند می‌شود
     for attempt in range(5):
         try:
-            transcript = recognizer.recognize_google(audio_data, language=lang)
-            break
+            transcript = recognize_google_limited(recognizer, audio_data, lang)
         except sr.UnknownValueError:
-            break
+            transcript = ""
         except sr.RequestError:
             if attempt < 4:
-                import time
-                time.sleep(1 + attempt)
                 continue
-            transcript = ""
+            return None, attempt + 1
+        if cache_key:
+            chunk_transcript_cache.set(cache_key, transcript)
+        return transcript, attempt + 1
+
+# 🔹 تسک برای پیاده‌سازی یک قطعه از صوت
+# نتیجه از backend سلری عبور نمی‌کند؛ در جدول قطعه‌ها ذخیره می‌شود و شمارندهٔ کار اتمیک بالا می‌رود
+@celery_app.task(name="transcribe_chunk", ignore_result=True)
+def transcribe_chunk(chunk: dict, lang: str, record_id: int | None = None) -> dict:
+    try:
+        transcript, attempts = _recognize_chunk(chunk, lang)
+    except Exception as e:
+        # فایل قطعه در دسترس نیست، خطای رمزگشایی و ...: قطعه ناموفق ثبت می‌شود تا کار منتظرش نماند
+        print(f"[Celery-ParallelAudio] Record {record_id} chunk {chunk.get('index')} failed: {e}")
+        transcript, attempts = None, 1
+
+    if record_id is not None:
+        db: Session = SessionLocal()
+        try:
+            completed, total, advanced = crud.chunks.save_chunk_result(db, record_id, chunk, transcript, attempts)
+        finally:
+            db.close()
 
-    if not transcript.strip():
-        transcript = f"({AudioProcessor.sec_to_mmss(start_sec)}-{AudioProcessor.sec_to_mmss(end_sec)})"
+        if "offset" not in chunk and "path" in chunk:
+            # فایل جداگانهٔ همین قطعه دیگر لازم نیست
+            Path(chunk["path"]).unlink(missing_ok=True)
+        if advanced and total is not None and completed == total:
+            # آخرین قطعهٔ پایان‌یافته مرحلهٔ نهایی را آغاز می‌کند (تحویل تکراری شمارنده را جلو نمی‌برد)؛
+            # پیش از ثبت کل، این کار با خود وظیفهٔ اصلی است
+            finalize_chunks.apply_async((record_id,), queue=_chunk_queue())
 
-    return {"start": start_sec, "end": end_sec, "text": transcript}
+    text = transcript if transcript and transcript.strip() else _gap_label(chunk["start"], chunk["end"])
+    return {"start": chunk["start"], "end": chunk["end"], "text": text}
 
-# 🔹 مرحله نهایی بعد از همه chunkها
+# 🔹 مرحله نهایی بعد از همه chunkها؛ متن از نتایج ذخیره‌شدهٔ قطعه‌ها سرهم می‌شود
+# پوشهٔ کاری کار (فایل مشترک قطعه‌ها) در هر حالت حذف می‌شود؛ با پوشهٔ محلی روی میزبان سازنده اجرا می‌شود
 @celery_app.task(name="finalize_chunks")
-def finalize_chunks(chunks_result: list[dict], record_id: int):
+def finalize_chunks(record_id: int):
     db: Session = SessionLocal()
     try:
-        final_text = "\n".join(to_clean_string(r["text"]) for r in sorted(chunks_result, key=lambda x: x["start"]))
         record = db.query(models.TranscriptionFile).get(record_id)
         if not record:
             raise ValueError("رکورد پیدا نشد")
+        if record.status in ("completed", "canceled"):
+            return
 
+        final_text = "\n".join(
+            to_clean_string(c.text) if c.text and c.text.strip() else _gap_label(c.start_sec, c.end_sec)
+            for c in crud.chunks.get_job_chunks(db, record_id)
+        )
         record.raw_result_text = final_text
         crud.transcriptions.finalize_job(db, record, final_text, 0)
     finally:
         db.commit()
         db.close()
+        workspace_manager.release(record_id)
 
-# 🔹 وظیفه اصلی که فقط یک‌بار در لحظه اجرا می‌شود
+# 🔹 وظیفه اصلی؛ در اجرای مجدد فقط قطعه‌هایی که نتیجهٔ ذخیره‌شده ندارند ارسال می‌شوند
 @celery_app.task(bind=True, name="parallel_audio_job")
 def parallel_audio_job(self, record_id: int, file_path: str, language: str):
     db: Session = SessionLocal()
@@ -66,18 +117,42 @@ def parallel_audio_job(self, record_id: int, file_path: str, language: str):
         if not record or record.status == "canceled":
             return
 
+        # پیش از شروع کار جای پوشهٔ کاری گرفته می‌شود؛ در نبود جا کار در صف می‌ماند
+        workdir = workspace_manager.acquire(record_id)
         crud.transcriptions.update_transcription_status(db, record_id, "processing")
 
-        # تقسیم فایل به قطعات
-        parts = AudioProcessor.split_audio(Path(file_path))
-        tasks = []
-        for idx, part in enumerate(parts):
-            start = idx * 50
-            end = start + 50
-            tasks.append(transcribe_chunk.s(str(part), start, end, language))
+        queue = _chunk_queue()
+        crud.chunks.reset_failed_chunks(db, record_id)
+        done = crud.chunks.get_completed_chunk_indexes(db, record_id)
+        # قطعه‌های قبلاً تکمیل‌شده شمرده شده‌اند؛ کل تا پایان تقسیم نامعلوم می‌ماند
+        crud.transcriptions.start_chunk_progress(db, record_id, completed=len(done))
+
+        # تقسیم فایل به قطعات (در صورت فعال بودن VAD، برش در مکث‌ها و حذف بازه‌های ساکت)؛
+        # هر قطعه به محض آماده شدن ارسال می‌شود تا رونویسی هم‌زمان با رمزگذاری بقیهٔ فایل پیش برود
+        # هر اجرا (retry_job، انتظار برای پوشهٔ کاری یا تحویل دوبارهٔ همین تسک) فایل قطعهٔ تازهٔ
+        # خودش را می‌نویسد؛ قطعه‌های در صف اجرای قبلی همچنان فایل دست‌نخوردهٔ خود را می‌خوانند
+        attempt = uuid.uuid4().hex[:12]
+        total = 0
+        for c in AudioProcessor.prepare_chunks(Path(file_path), shared=True, workdir=workdir, attempt=attempt):
+            total += 1
+            if c["index"] not in done:
+                transcribe_chunk.apply_async((c, language, record_id), queue=queue)
 
-        # اجرای موازی و سپس ذخیره نتیجه
-        chord(group(tasks), finalize_chunks.s(record_id)).delay()
+        # اگر همهٔ قطعه‌ها پیش از ثبت کل تمام شده باشند، هیچ‌کدام مرحلهٔ نهایی را آغاز نکرده است
+        if crud.transcriptions.set_total_chunks(db, record_id, total):
+            finalize_chunks.apply_async((record_id,), queue=queue)
 
+    except WorkspaceBudgetExceeded as e:
+        if self.request.retries >= settings.WORKSPACE_MAX_WAIT_RETRIES:
+            crud.transcriptions.update_transcription_status(db, record_id, "failed")
+            raise
+        print(f"[Celery-ParallelAudio] Record {record_id} waiting for workspace: {e}")
+        raise self.retry(exc=e, countdown=settings.WORKSPACE_RETRY_DELAY, max_retries=settings.WORKSPACE_MAX_WAIT_RETRIES)
+    except Exception as e:
+        print(f"[Celery-ParallelAudio] Record {record_id} failed: {e}")
+        db.rollback()
+        crud.transcriptions.update_transcription_status(db, record_id, "failed")
+        workspace_manager.release(record_id)
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
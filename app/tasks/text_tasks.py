@@ -1,16 +1,22 @@
 # app/tasks/text_tasks.py
 # وظایف Celery برای پردازش و اصلاح فایل‌های متنی
-import os, time, concurrent.futures
+import hashlib, os, time
 from sqlalchemy.orm import Session
 from pathlib import Path
+from celery.exceptions import Retry
 from app.celery_app import celery_app
 from app.database import SessionLocal
 from app import models, crud
-from app.services.text_processing import extract_text_from_docx, split_text_into_chunks
-from .helpers import correct_single_text_chunk
+from app.core.config import settings
+from app.services.text_processing import extract_text_from_docx, iter_text_chunks
+from app.services.ai_engine import AICorrectionEngine
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.cost_estimator import estimate_chunks_tokens, required_balance
 
+# هر اجرا یک دور ارسال قطعه‌های باقی‌مانده است؛ دور بعد (round_no) با self.retry و تأخیر
+# نمایی زمان‌بندی می‌شود تا worker در فاصلهٔ دورها آزاد بماند
 @celery_app.task(bind=True, name="text_correct_task")
-def background_text_correction_task(self, record_id: int, file_path: str):
+def background_text_correction_task(self, record_id: int, file_path: str, round_no: int = 0):
     db: Session = SessionLocal()
     start_time = time.time()
 
@@ -36,29 +42,99 @@ def background_text_correction_task(self, record_id: int, file_path: str):
         else:
             raise ValueError("نوع فایل نامعتبر است.")
 
-        chunks = list(split_text_into_chunks(original_text))
-        tasks = [(i, c, user.token_price) for i, c in enumerate(chunks)]
+        # جمله‌ها و پاراگراف‌های کامل تا سقف توکن (همراه با زمینهٔ اختیاری از قطعهٔ قبل)
+        chunks = list(iter_text_chunks(original_text))
+        hashes = [hashlib.sha256(body.encode("utf-8")).hexdigest() for _, body in chunks]
 
-        corrected = {}
-        total_tokens = 0
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            for idx, txt, used in executor.map(correct_single_text_chunk, tasks):
-                if "[خطا" in txt:
-                    raise ValueError(f"خطای AI در قطعه {idx}")
-                corrected[idx] = txt
-                total_tokens += used
+        # قطعه‌هایی که در اجرای قبلی با همین متن ورودی اصلاح شده‌اند دوباره ارسال نمی‌شوند
+        saved = crud.chunks.get_ai_chunk_results(db, record_id)
+        corrected = {
+            i: (row.text, row.tokens or 0)
+            for i, row in saved.items()
+            if i < len(chunks) and row.text is not None and row.source_hash == hashes[i]
+        }
+        pending = [i for i in range(len(chunks)) if i not in corrected]
 
-        final_text = "\n".join(corrected[i] for i in sorted(corrected))
+        # برآورد توکن کل کار و رزرو آن پیش از هر فراخوانی؛ کار بدون موجودی کافی همین‌جا رد می‌شود
+        estimated_tokens = estimate_chunks_tokens(chunks[i] for i in pending)
+        estimated_tokens += sum(used for _, used in corrected.values())
+        try:
+            crud.transactions.reserve_funds(
+                db, user, record, required_balance(estimated_tokens, user.token_price)
+            )
+        except ValueError:
+            raise ValueError(f"موجودی برای اصلاح متن کافی نیست (برآورد {estimated_tokens} توکن).")
 
-        crud.transactions.debit_from_wallet(
-            db, user=user,
+        with AICorrectionEngine() as engine:
+            futures = {i: engine.submit(chunks[i][1], chunks[i][0]) for i in pending}
+            failed = []
+            circuit_open = None
+            for idx, future in futures.items():
+                try:
+                    txt, used = future.result()
+                    if "[خطا" in txt:
+                        raise ValueError(txt)
+                except CircuitOpenError as e:
+                    circuit_open = e
+                    failed.append(idx)
+                    continue
+                except Exception as e:
+                    print(f"[Celery-Text] Record {record_id} chunk {idx} failed (round {round_no}): {e}")
+                    crud.chunks.save_ai_chunk_result(db, record_id, idx, hashes[idx], None)
+                    failed.append(idx)
+                    continue
+                crud.chunks.save_ai_chunk_result(db, record_id, idx, hashes[idx], txt, used)
+                corrected[idx] = (txt, used)
+            pending = failed
+            if circuit_open:
+                # قطعه‌های موفق ذخیره شده‌اند؛ به‌جای خواب، کل کار به تعویق می‌افتد
+                raise circuit_open
+            record.ai_cache_hits, record.ai_cache_misses = engine.cache_hits, engine.cache_misses
+            print(f"[Celery-Text] Record {record_id} AI cache: {engine.cache_stats()}")
+
+        if pending and round_no < settings.AI_CHUNK_RETRY_ROUNDS:
+            # قطعه‌های موفق ذخیره شده‌اند؛ اجرای بعدی فقط قطعه‌های ناموفق را دوباره می‌فرستد
+            crud.transcriptions.update_transcription_status(db, record_id, "queued")
+            raise self.retry(
+                countdown=settings.AI_CHUNK_RETRY_BACKOFF * 2 ** round_no,
+                kwargs={"round_no": round_no + 1},
+                max_retries=self.request.retries + 1,
+            )
+
+        if pending and (not corrected or not settings.AI_ALLOW_DEGRADED):
+            raise ValueError(f"خطای AI در قطعه‌های {pending}")
+
+        # حالت ناقص: قطعه‌های ناموفق با متن خام خودشان در خروجی می‌مانند
+        record.ai_failed_chunks = len(pending)
+        final_text = "\n".join(
+            corrected[i][0] if i in corrected else chunks[i][1] for i in range(len(chunks))
+        )
+        total_tokens = sum(used for _, used in corrected.values())
+
+        record.ai_token_usage = total_tokens
+        # تغییرات رکورد پیش از تسویه ثبت می‌شوند؛ retry_on_locked در صورت قفل rollback می‌کند
+        db.commit()
+        shortfall = crud.transactions.settle_reserved_funds(
+            db, user, record,
             cost=total_tokens * user.token_price,
             description=f"هزینه اصلاح فایل متنی: {record.original_filename}"
         )
-        record.ai_token_usage = total_tokens
+        if shortfall:
+            print(f"[Celery-Text] Record {record_id} billing shortfall: {shortfall}")
 
         crud.transcriptions.finalize_job(db, record, final_text, int(time.time() - start_time))
 
+    except Retry:
+        raise
+    except CircuitOpenError as e:
+        db.rollback()
+        # اجراهای دورهای تلاش مجدد قطعه‌ها از سهم تعویق‌ها کم نمی‌شوند
+        if self.request.retries - round_no >= settings.AI_DEFER_MAX_RETRIES:
+            crud.transcriptions.update_transcription_status(db, record_id, "failed")
+            raise
+        print(f"[Celery-Text] Record {record_id} deferred for {e.retry_after:.0f}s: {e}")
+        crud.transcriptions.update_transcription_status(db, record_id, "queued")
+        raise self.retry(exc=e, countdown=e.retry_after, max_retries=settings.AI_DEFER_MAX_RETRIES + round_no)
     except Exception as e:
         print(f"[Celery-Text] Record {record_id} failed: {e}")
         db.rollback()
@@ -0,0 +1,102 @@
+# benchmarks/bench_ai_http_client.py
+"""
+مقایسهٔ تأخیر هر فراخوانی سرویس هوش مصنوعی: اتصال تازه برای هر درخواست
+(requests.post) در برابر کلاینت مشترک keep-alive (get_ai_http_client).
+
+یک سرور محلی ساختگی پاسخی شبیه chat/completions برمی‌گرداند. برای شبیه‌سازی
+هزینهٔ DNS/TCP/TLS، سرور هنگام پذیرش هر اتصال جدید --connect-delay میلی‌ثانیه مکث می‌کند.
+
+روش اجرا:
+    python benchmarks/bench_ai_http_client.py [--calls 200] [--threads 1 8] [--connect-delay 40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# اطمینان از دسترسی به پکیج app
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+_RESPONSE = json.dumps({
+    "choices": [{"message": {"content": "متن اصلاح‌شده"}}],
+    "usage": {"total_tokens": 42},
+}).encode()
+
+
+def start_stub_server(connect_delay: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # لازم برای keep-alive
+
+        def setup(self):
+            time.sleep(connect_delay)  # هزینهٔ برقراری اتصال
+            super().setup()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(_RESPONSE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(post, url: str, calls: int, threads: int) -> list[float]:
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "سلام " * 200}]}
+
+    def one(_):
+        t0 = time.perf_counter()
+        resp = post(url, headers={"Content-Type": "application/json"}, json=payload, timeout=30)
+        resp.raise_for_status()
+        resp.json()
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(one, range(calls)))
+
+
+def main() -> None:
+    import requests
+    from app.services.http_client import get_ai_http_client
+
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-call AI HTTP connections.")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--connect-delay", type=float, default=40, help="میلی‌ثانیه")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.connect_delay / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    client = get_ai_http_client()
+
+    print(f"{'client':>10} {'threads':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'total (s)':>10}")
+    for threads in args.threads:
+        for name, post in (("per-call", requests.post), ("pooled", client.post)):
+            t0 = time.perf_counter()
+            latencies = sorted(run(post, url, args.calls, threads))
+            total = time.perf_counter() - t0
+            p50 = statistics.median(latencies) * 1000
+            p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+            print(f"{name:>10} {threads:>8} {p50:>9.1f} {p95:>9.1f} {total:>10.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_async_db.py
+"""
+تأخیر مسیر داشبورد (یافتن کاربر از کوکی + ۱۰ کار آخر) زیر بار هم‌زمان در یک event loop.
+
+نسخهٔ همگام (SessionLocal داخل handler از نوع async، مثل پیش از این تغییر) هر
+پرس‌وجو را روی خود event loop اجرا می‌کند و درخواست‌ها پشت هم می‌مانند؛ نسخهٔ
+ناهمگام (AsyncSession با aiosqlite) در انتظار پایگاه داده loop را آزاد می‌گذارد.
+برای هر سطح هم‌زمانی میانگین و صدک ۹۵ تأخیر هر درخواست و تأخیر یک تیک زمان‌سنج
+(پاسخ‌گویی loop به کارهای دیگر) گزارش می‌شود.
+
+روش اجرا:
+    python benchmarks/bench_async_db.py [--jobs 20000] [--levels 1,8,32,64]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# اطمینان از دسترسی به پکیج app
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+
+def seed(jobs: int, users: int = 50):
+    from app import models
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    owners = [models.User(username=f"user{i}", hashed_password="x") for i in range(users)]
+    db.add_all(owners)
+    db.commit()
+    db.bulk_save_objects(
+        models.TranscriptionFile(
+            user_id=owners[i % users].id,
+            original_filename=f"{i}.mp3",
+            display_filename=f"{i}.mp3",
+            language="fa-IR",
+            status="completed",
+        )
+        for i in range(jobs)
+    )
+    db.commit()
+    db.close()
+    return [f"user{i}" for i in range(users)]
+
+
+async def sync_request(username: str):
+    from app import crud
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_username(db, username)
+        return crud.get_user_transcriptions(db, user_id=user.id, limit=10)
+    finally:
+        db.close()
+
+
+async def async_request(username: str):
+    from app import crud
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        user = await crud.get_user_by_username_async(db, username)
+        return await crud.get_user_transcriptions_async(db, user_id=user.id, limit=10)
+
+
+async def _ticker(stop: asyncio.Event, lags: list):
+    # فاصلهٔ واقعی بین تیک‌های ۱۰ میلی‌ثانیه‌ای؛ هرچه بیشتر، loop مسدودتر
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - t0 - 0.01)
+
+
+async def run_level(handler, usernames, concurrency: int, requests: int) -> dict:
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await handler(usernames[i % len(usernames)])
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await ticker
+
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "rps": requests / elapsed,
+        "lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+async def run_all(usernames, levels, requests: int):
+    for name, handler in (("sync", sync_request), ("async", async_request)):
+        for level in levels:
+            res = await run_level(handler, usernames, level, requests)
+            print(
+                f"{name:>8} {level:>9} {res['mean_ms']:>8.2f} {res['p95_ms']:>8.2f} "
+                f"{res['rps']:>8.1f} {res['lag_ms']:>10.2f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async DB sessions on the event loop.")
+    parser.add_argument("--jobs", type=int, default=20_000)
+    parser.add_argument("--levels", default="1,8,32,64")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.database آدرس را از DATABASE_URL (متغیر محیطی) می‌خواند
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        usernames = seed(args.jobs)
+
+        print(f"{'session':>8} {'in-flight':>9} {'mean ms':>8} {'p95 ms':>8} {'req/s':>8} {'max lag ms':>10}")
+        levels = [int(x) for x in args.levels.split(",")]
+        # یک event loop برای همهٔ اجراها تا اتصال‌های pool ناهمگام معتبر بمانند
+        asyncio.run(run_all(usernames, levels, args.requests))
+
+
+if __name__ == "__main__":
+    main()
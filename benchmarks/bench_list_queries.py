@@ -0,0 +1,138 @@
+# benchmarks/bench_list_queries.py
+"""
+زمان پرس‌وجوهای فهرست داشبورد و پنل مدیر روی جدول‌های بزرگ، با و بدون ایندکس‌های ترکیبی.
+
+--rows ردیف در transcriptions و همین تعداد در transactions (پیش‌فرض یک میلیون)
+میان --users کاربر پخش می‌شوند. هر تابع CRUD فهرست ابتدا بدون ایندکس‌های
+(user_id, timestamp)، (timestamp) و (status) و سپس با آن‌ها اجرا می‌شود و
+میانهٔ زمان اجرا گزارش می‌شود.
+
+روش اجرا:
+    python benchmarks/bench_list_queries.py [--rows 1000000] [--users 1000] [--repeat 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# اطمینان از دسترسی به پکیج app
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+BATCH = 50_000
+
+
+def seed(engine, rows: int, users: int):
+    from app import models
+
+    start = datetime(2025, 1, 1)
+    statuses = ["completed"] * 8 + ["failed", "queued"]
+    with engine.begin() as conn:
+        conn.execute(
+            models.User.__table__.insert(),
+            [{"username": f"user{i}", "hashed_password": "x", "wallet_balance": 0.0} for i in range(users)],
+        )
+        for offset in range(0, rows, BATCH):
+            n = min(BATCH, rows - offset)
+            stamps = [start + timedelta(seconds=random.randrange(365 * 86400)) for _ in range(n)]
+            conn.execute(
+                models.TranscriptionFile.__table__.insert(),
+                [
+                    {
+                        "user_id": random.randint(1, users),
+                        "original_filename": "a.mp3",
+                        "display_filename": "a.mp3",
+                        "language": "fa-IR",
+                        "status": random.choice(statuses),
+                        "timestamp": ts,
+                    }
+                    for ts in stamps
+                ],
+            )
+            conn.execute(
+                models.Transaction.__table__.insert(),
+                [
+                    {"user_id": random.randint(1, users), "amount": -1.0, "description": "bench", "timestamp": ts}
+                    for ts in stamps
+                ],
+            )
+
+
+def set_indexes(engine, enabled: bool):
+    from app import models
+
+    indexes = [
+        ix
+        for table in (models.TranscriptionFile.__table__, models.Transaction.__table__)
+        for ix in table.indexes
+        if ix.name.endswith(("_timestamp", "_status"))
+    ]
+    with engine.begin() as conn:
+        for ix in indexes:
+            if enabled:
+                ix.create(conn, checkfirst=True)
+            else:
+                ix.drop(conn, checkfirst=True)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def measure(Session, run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        db = Session()
+        t0 = time.perf_counter()
+        run(db)
+        timings.append(time.perf_counter() - t0)
+        db.close()
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dashboard/admin list queries with and without indexes.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.database آدرس را از DATABASE_URL (متغیر محیطی) می‌خواند
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        from app import crud
+        from app.database import Base, SessionLocal, engine
+
+        Base.metadata.create_all(bind=engine)
+        t0 = time.perf_counter()
+        seed(engine, args.rows, args.users)
+        print(f"seeded {args.rows:,} transcriptions + {args.rows:,} transactions in {time.perf_counter() - t0:.1f}s")
+
+        uid = args.users // 2
+        queries = {
+            "user transcriptions": lambda db: crud.get_user_transcriptions(db, user_id=uid, limit=10),
+            "all transcriptions": lambda db: crud.get_all_transcriptions(db, skip=200, limit=100),
+            "user transactions": lambda db: crud.get_user_transactions(db, user_id=uid),
+            "all transactions": lambda db: crud.get_all_transactions(db, skip=200),
+            "user transcr. count": lambda db: crud.get_user_transcriptions_count(db, user_id=uid),
+        }
+
+        results = {}
+        for enabled in (False, True):
+            set_indexes(engine, enabled)
+            for name, run in queries.items():
+                results.setdefault(name, []).append(measure(SessionLocal, run, args.repeat))
+
+        print(f"{'query':>22} {'no index ms':>12} {'indexed ms':>11} {'speedup':>8}")
+        for name, (without, with_) in results.items():
+            print(f"{name:>22} {without:>12.2f} {with_:>11.2f} {without / with_:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_split_audio.py
+"""
+مقایسهٔ تقسیم جریانی AudioProcessor.prepare_chunks با رمزگشایی کامل فایل با pydub.
+
+برای هر طول ورودی یک فایل MP3 مصنوعی ساخته می‌شود و هر روش در یک پروسهٔ
+جداگانه اجرا می‌شود تا حداکثر RSS (خود پروسه و ffmpeg فرزند) و زمان تقسیم
+به‌طور مستقل اندازه‌گیری شود. روش "streaming" قطعه‌های prepare_chunks را با
+برش ثابت (بدون VAD) تدریجی مصرف می‌کند؛ --handoff نحوهٔ تحویل قطعه‌ها را تعیین
+می‌کند. روش "pydub" خط پایهٔ قدیمی (کل فایل در حافظه و برش با طول ثابت) است.
+
+روش اجرا:
+    python benchmarks/bench_split_audio.py [--durations 600 3600 10800] [--handoff memory|files]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# اطمینان از دسترسی به پکیج app
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+# کدی که در پروسهٔ فرزند اجرا می‌شود
+_WORKER = """
+import json, resource, sys, time
+from pathlib import Path
+sys.path.insert(0, sys.argv[3])
+from app.core.config import settings
+from app.services.audio_processing import AudioProcessor
+
+src, mode, handoff = Path(sys.argv[1]), sys.argv[2], sys.argv[4]
+t0 = time.perf_counter()
+parts = 0
+if mode == "pydub":
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(src).set_channels(1).set_frame_rate(settings.AUDIO_SAMPLE_RATE)
+    step = settings.AUDIO_CHUNK_SIZE * 1000
+    for start in range(0, len(audio), step):
+        audio[start:start + step].export(src.with_suffix(".part.flac"), format="flac")
+        parts += 1
+else:
+    settings.AUDIO_VAD_ENABLED = False
+    settings.AUDIO_CHUNK_HANDOFF = handoff
+    for chunk in AudioProcessor.prepare_chunks(src):
+        if "path" in chunk:
+            Path(chunk["path"]).unlink()
+        parts += 1
+elapsed = time.perf_counter() - t0
+src.with_suffix(".part.flac").unlink(missing_ok=True)
+self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+child_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+print(json.dumps({"parts": parts, "seconds": elapsed, "rss_kb": max(self_kb, child_kb)}))
+"""
+
+
+def make_input(directory: Path, duration: int) -> Path:
+    """ساخت یک فایل MP3 استریو ۴۴.۱ کیلوهرتز با طول مشخص"""
+    out = directory / f"bench_{duration}s.mp3"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+            "-ac", "2", "-b:a", "64k", str(out),
+        ],
+        check=True,
+    )
+    return out
+
+
+def run_mode(src: Path, mode: str, handoff: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", _WORKER, str(src), mode, str(BASE_DIR), handoff],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark audio splitting modes.")
+    parser.add_argument(
+        "--durations",
+        type=int,
+        nargs="+",
+        default=[600, 3600, 10800],
+        help="طول فایل‌های ورودی بر حسب ثانیه (پیش‌فرض: ۱۰ دقیقه، ۱ ساعت، ۳ ساعت)",
+    )
+    parser.add_argument("--modes", nargs="+", default=["pydub", "streaming"])
+    parser.add_argument("--handoff", choices=["memory", "files"], default="memory")
+    args = parser.parse_args()
+
+    print(f"{'input':>8} {'mode':>10} {'parts':>6} {'split (s)':>10} {'peak RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in args.durations:
+            src = make_input(Path(tmp), duration)
+            for mode in args.modes:
+                res = run_mode(src, mode, args.handoff)
+                print(
+                    f"{duration // 60:>6}m {mode:>10} {res['parts']:>6} "
+                    f"{res['seconds']:>10.2f} {res['rss_kb'] / 1024:>14.1f}"
+                )
+            src.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_sqlite_writes.py
+"""
+نوشتن هم‌زمان چند پروسه (مثل وب و workerهای Celery) روی یک فایل SQLite.
+
+هر پروسه --writes تراکنش کوتاه (تغییر موجودی + ردیف دفتر) انجام می‌دهد و
+هم‌زمان --readers پروسه مدام گزارش تراکنش‌ها را می‌خوانند. موتور ساده (حالت
+journal پیش‌فرض و timeout پنج‌ثانیه‌ای) با پروفایل تولید app.database (WAL،
+busy_timeout، synchronous=NORMAL، کش و mmap، pool و تکرار تراکنش‌های قفل‌شده)
+مقایسه می‌شود.
+
+روش اجرا:
+    python benchmarks/bench_sqlite_writes.py [--procs 8] [--writes 200] [--readers 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# اطمینان از دسترسی به پکیج app
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+
+def _session_factory(mode: str, db_url: str):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    if mode == "bare":
+        engine = create_engine(db_url, connect_args={"check_same_thread": False})
+        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # app.database آدرس را از DATABASE_URL (متغیر محیطی) می‌خواند
+    os.environ["DATABASE_URL"] = db_url
+    from app.database import SessionLocal
+
+    return SessionLocal
+
+
+def _writer(args) -> tuple[int, int, float]:
+    mode, db_url, user_id, writes, barrier = args
+    Session = _session_factory(mode, db_url)
+    from app import models
+    from app.crud.transactions import adjust_user_balance
+    from app.database import retry_on_locked
+
+    adjust = adjust_user_balance if mode == "bare" else retry_on_locked(adjust_user_balance)
+    ok = errors = 0
+    barrier.wait()
+    t0 = time.perf_counter()
+    for _ in range(writes):
+        db = Session()
+        try:
+            user = db.get(models.User, user_id)
+            adjust(db, user, 1.0, "bench")
+            ok += 1
+        except Exception:
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    return ok, errors, time.perf_counter() - t0
+
+
+def _reader(args) -> int:
+    mode, db_url, stop = args
+    Session = _session_factory(mode, db_url)
+    from sqlalchemy import func
+    from app import models
+
+    reads = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.query(func.sum(models.Transaction.amount)).scalar()
+            reads += 1
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+    return reads
+
+
+def run(mode: str, procs: int, writes: int, readers: int) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import models
+    from app.database import Base
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{tmp}/bench.db"
+        setup_engine = create_engine(db_url)
+        Base.metadata.create_all(bind=setup_engine)
+        db = sessionmaker(bind=setup_engine)()
+        user = models.User(username="bench", hashed_password="x", wallet_balance=0.0, token_price=1.0)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        db.close()
+        setup_engine.dispose()
+
+        # spawn: هر پروسه app.database را با DATABASE_URL همین اجرا از نو import می‌کند
+        ctx = mp.get_context("spawn")
+        manager = ctx.Manager()
+        barrier = manager.Barrier(procs)
+        stop = manager.Event()
+        with ctx.Pool(procs + readers) as pool:
+            read_results = [pool.apply_async(_reader, ((mode, db_url, stop),)) for _ in range(readers)]
+            t0 = time.perf_counter()
+            results = pool.map(_writer, [(mode, db_url, user_id, writes, barrier)] * procs)
+            elapsed = time.perf_counter() - t0
+            stop.set()
+            reads = sum(r.get() for r in read_results)
+
+    ok = sum(r[0] for r in results)
+    return {
+        "ok": ok,
+        "errors": sum(r[1] for r in results),
+        "elapsed": elapsed,
+        "throughput": ok / elapsed,
+        "reads": reads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark multi-process SQLite writes.")
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'profile':>10} {'ok':>6} {'locked':>7} {'seconds':>8} {'writes/s':>9} {'reads':>7}")
+    for mode in ("bare", "production"):
+        res = run(mode, args.procs, args.writes, args.readers)
+        print(
+            f"{mode:>10} {res['ok']:>6} {res['errors']:>7} {res['elapsed']:>8.2f} "
+            f"{res['throughput']:>9.1f} {res['reads']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_wallet_debits.py
+"""
+کسر هم‌زمان از کیف پول: N کار یک کاربر هم‌زمان نهایی می‌شوند و هرکدام در
+پروسهٔ جداگانه (مثل workerهای Celery) هزینهٔ خود را کسر می‌کنند.
+
+روش قدیمی (refresh، بررسی در پایتون، تغییر، commit) با روش اتمیک فعلی
+(UPDATE شرطی + ثبت دفتر در یک تراکنش) مقایسه می‌شود: موجودی نهایی باید
+دقیقاً برابر موجودی اولیه منهای مجموع ردیف‌های دفتر باشد.
+
+روش اجرا:
+    python benchmarks/bench_wallet_debits.py [--jobs 50] [--cost 10] [--balance 10000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# اطمینان از دسترسی به پکیج app
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+
+def _session(db_url: str):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(db_url, connect_args={"timeout": 60})
+    return sessionmaker(bind=engine)()
+
+
+def legacy_debit(db, user, cost: float, description: str):
+    """پیاده‌سازی پیشین debit_from_wallet (برای مقایسه)"""
+    from app.crud.transactions import create_transaction
+
+    db.refresh(user)
+    if user.wallet_balance < cost:
+        raise ValueError("موجودی ناکافی برای این عملیات")
+    time.sleep(0.001)  # فاصلهٔ طبیعی بین خواندن و نوشتن در کار واقعی
+    user.wallet_balance -= cost
+    create_transaction(db, user.id, -cost, description, user.token_price)
+    db.commit()
+    db.refresh(user)
+
+
+def _worker(args) -> tuple[bool, float]:
+    db_url, user_id, cost, mode, barrier = args
+    from app import models
+    from app.crud.transactions import debit_from_wallet
+
+    db = _session(db_url)
+    user = db.get(models.User, user_id)
+    barrier.wait()
+    t0 = time.perf_counter()
+    try:
+        debit = legacy_debit if mode == "legacy" else debit_from_wallet
+        debit(db, user=user, cost=cost, description="bench")
+        ok = True
+    except Exception:
+        db.rollback()
+        ok = False
+    finally:
+        db.close()
+    return ok, time.perf_counter() - t0
+
+
+def run(mode: str, jobs: int, cost: float, balance: float) -> dict:
+    from sqlalchemy import create_engine, func
+    from app import models
+    from app.database import Base
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{tmp}/bench.db"
+        Base.metadata.create_all(bind=create_engine(db_url))
+        db = _session(db_url)
+        user = models.User(username="bench", hashed_password="x", wallet_balance=balance, token_price=1.0)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+        manager = mp.Manager()
+        barrier = manager.Barrier(jobs)
+        t0 = time.perf_counter()
+        with mp.Pool(jobs) as pool:
+            results = pool.map(_worker, [(db_url, user_id, cost, mode, barrier)] * jobs)
+        elapsed = time.perf_counter() - t0
+
+        db.expire_all()
+        final = db.get(models.User, user_id).wallet_balance
+        ledger = db.query(func.coalesce(func.sum(models.Transaction.amount), 0)).scalar()
+        db.close()
+
+    return {
+        "succeeded": sum(ok for ok, _ in results),
+        "final": final,
+        "expected": balance + ledger,
+        "elapsed": elapsed,
+        "throughput": jobs / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent wallet debits.")
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--cost", type=float, default=10.0)
+    parser.add_argument("--balance", type=float, default=10_000.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'ok':>4} {'final':>10} {'ledger says':>12} {'lost':>8} {'debits/s':>9}")
+    for mode in ("legacy", "atomic"):
+        res = run(mode, args.jobs, args.cost, args.balance)
+        lost = res["final"] - res["expected"]
+        print(
+            f"{mode:>8} {res['succeeded']:>4} {res['final']:>10.2f} {res['expected']:>12.2f} "
+            f"{lost:>8.2f} {res['throughput']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
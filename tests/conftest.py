@@ -1,3 +1,6 @@
+import threading
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -32,4 +35,28 @@ def test_client(test_db):
     
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as client:
-        yield client
\ No newline at end of file
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_caches(tmp_path, monkeypatch):
+    # کش‌های مشترک نتایج در پوشهٔ موقت هر تست نوشته می‌شوند، نه در cache/results.db مخزن یا Redis
+    from app.services.result_cache import ai_correction_cache, chunk_transcript_cache
+
+    for cache in (chunk_transcript_cache, ai_correction_cache):
+        monkeypatch.setattr(cache, "backend", "sqlite")
+        monkeypatch.setattr(cache, "path", tmp_path / "results.db")
+        monkeypatch.setattr(cache, "_local", threading.local())
+        cache._reset_pending()
+
+@pytest.fixture
+def ai_circuit(monkeypatch):
+    # مدار هوش مصنوعی با کلیدهای مخصوص همین تست؛ در آغاز بسته است و وضعیتش به تست‌های دیگر نمی‌رسد
+    from app.services.circuit_breaker import ai_circuit
+
+    name = f"test-{uuid.uuid4().hex}"
+    monkeypatch.setattr(ai_circuit, "open_key", f"circuit:{name}:open")
+    monkeypatch.setattr(ai_circuit, "failures_key", f"circuit:{name}:failures")
+    ai_circuit.reset()
+    yield ai_circuit
+    ai_circuit.reset()
@@ -0,0 +1,257 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+
+
+@pytest.fixture
+def db():
+    # دیتابیس مستقل در حافظه برای هر تست
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    u = models.User(username="tester", hashed_password="x", wallet_balance=1000.0, token_price=1.0)
+    db.add(u)
+    db.commit()
+    return u
+
+
+def test_chunk_checkpoints_resume_only_missing(db, user):
+    rec = models.TranscriptionFile(
+        user_id=user.id, original_filename="a.mp3", display_filename="a.mp3", language="fa-IR"
+    )
+    db.add(rec)
+    db.commit()
+
+    crud.save_chunk_result(db, rec.id, {"index": 0, "start": 0.0, "end": 48.2}, "سلام", attempts=1)
+    crud.save_chunk_result(db, rec.id, {"index": 1, "start": 48.2, "end": 95.0}, None, attempts=5)
+    assert crud.get_completed_chunk_indexes(db, rec.id) == {0}
+
+    crud.save_chunk_result(db, rec.id, {"index": 1, "start": 48.2, "end": 95.0}, "دنیا", attempts=2)
+    chunks = crud.get_job_chunks(db, rec.id)
+    assert [(c.chunk_index, c.text, c.attempts) for c in chunks] == [(0, "سلام", 1), (1, "دنیا", 7)]
+
+
+def test_partial_transcript_progress(db, user):
+    rec = models.TranscriptionFile(
+        user_id=user.id, original_filename="a.mp3", display_filename="a.mp3",
+        language="fa-IR", status="processing", total_chunks=4,
+    )
+    db.add(rec)
+    db.commit()
+
+    crud.save_chunk_result(db, rec.id, {"index": 2, "start": 90.0, "end": 130.0}, "سوم", attempts=1)
+    crud.save_chunk_result(db, rec.id, {"index": 0, "start": 0.0, "end": 45.0}, "اول", attempts=1)
+
+    partial = crud.get_partial_transcript(db, rec)
+    assert partial["progress"] == 50
+    assert partial["text"] == "اول\nسوم"
+
+
+def test_chunk_completion_counter_triggers_once(db, user):
+    rec = models.TranscriptionFile(
+        user_id=user.id, original_filename="a.mp3", display_filename="a.mp3",
+        language="fa-IR", status="processing",
+    )
+    db.add(rec)
+    db.commit()
+    crud.set_total_chunks(db, rec.id, 2)
+
+    first = {"index": 0, "start": 0.0, "end": 40.0}
+    second = {"index": 1, "start": 40.0, "end": 80.0}
+    assert crud.save_chunk_result(db, rec.id, second, "دو", 1) == (1, 2, True)
+    # تحویل تکراری همان قطعه (موفق یا ناموفق) شمارنده را جلو نمی‌برد
+    assert crud.save_chunk_result(db, rec.id, second, "دو", 1) == (1, 2, False)
+    assert crud.save_chunk_result(db, rec.id, second, None, 5) == (1, 2, False)
+    # قطعهٔ ناموفق هم پایان‌یافته است؛ فقط همین فراخوانی کار را کامل می‌کند
+    assert crud.save_chunk_result(db, rec.id, first, None, 5) == (2, 2, True)
+    assert crud.save_chunk_result(db, rec.id, first, None, 5) == (2, 2, False)
+    assert crud.get_completed_chunk_indexes(db, rec.id) == {1}
+
+
+def test_chunks_finished_before_total_is_set(db, user):
+    rec = models.TranscriptionFile(
+        user_id=user.id, original_filename="a.mp3", display_filename="a.mp3",
+        language="fa-IR", status="processing",
+    )
+    db.add(rec)
+    db.commit()
+    crud.start_chunk_progress(db, rec.id)
+
+    # تا پایان تقسیم کل نامعلوم است و هیچ قطعه‌ای کار را کامل نمی‌کند
+    assert crud.save_chunk_result(db, rec.id, {"index": 0, "start": 0.0, "end": 40.0}, "یک", 1) == (1, None, True)
+    assert crud.save_chunk_result(db, rec.id, {"index": 1, "start": 40.0, "end": 80.0}, "دو", 1) == (2, None, True)
+    # ثبت کل شمارنده را صفر نمی‌کند و به وظیفهٔ اصلی می‌گوید مرحلهٔ نهایی با خودش است
+    assert crud.set_total_chunks(db, rec.id, 2) is True
+    db.refresh(rec)
+    assert (rec.completed_chunks, rec.total_chunks) == (2, 2)
+    assert crud.set_total_chunks(db, rec.id, 3) is False
+
+def test_ai_chunk_results_keep_only_successful_attempts(db, user):
+    rec = crud.create_transcription_record(db, filename="doc.txt", user_id=user.id, lang="text")
+
+    crud.save_ai_chunk_result(db, rec.id, 0, "h0", "متن اصلاح‌شده", 12)
+    crud.save_ai_chunk_result(db, rec.id, 1, "h1", None)
+    crud.save_ai_chunk_result(db, rec.id, 1, "h1", "دومی", 7)
+
+    results = crud.get_ai_chunk_results(db, rec.id)
+    assert results[0].text == "متن اصلاح‌شده" and results[0].tokens == 12
+    assert results[1].text == "دومی" and results[1].attempts == 2
+
+
+def test_debit_is_conditional_and_writes_ledger(db, user):
+    crud.debit_from_wallet(db, user=user, cost=400.0, description="هزینه")
+    with pytest.raises(ValueError):
+        crud.debit_from_wallet(db, user=user, cost=700.0, description="بیش از موجودی")
+
+    db.refresh(user)
+    assert user.wallet_balance == 600.0
+    assert [t.amount for t in db.query(models.Transaction).filter_by(user_id=user.id)] == [-400.0]
+
+
+def test_reservations_hold_settle_and_release(db, user):
+    jobs = []
+    for name in ("a.txt", "b.txt"):
+        rec = models.TranscriptionFile(user_id=user.id, original_filename=name, display_filename=name, language="text")
+        db.add(rec)
+        jobs.append(rec)
+    db.commit()
+    first, second = jobs
+
+    crud.reserve_funds(db, user, first, 600.0)
+    with pytest.raises(ValueError):
+        crud.reserve_funds(db, user, second, 600.0)
+    with pytest.raises(ValueError):
+        crud.debit_from_wallet(db, user=user, cost=500.0, description="رزرو دیگران خرج نمی‌شود")
+
+    crud.settle_reserved_funds(db, user, first, 250.0, "هزینه")
+    db.refresh(user)
+    assert (user.wallet_balance, user.reserved_balance) == (750.0, 0.0)
+
+    crud.reserve_funds(db, user, second, 600.0)
+    crud.update_transcription_status(db, second.id, "failed")
+    db.refresh(user)
+    assert crud.available_balance(user) == 750.0 and second.reserved_amount == 0.0
+
+
+def test_settle_after_concurrent_release_and_over_budget(db, user):
+    from types import SimpleNamespace
+
+    rec = models.TranscriptionFile(user_id=user.id, original_filename="a.txt", display_filename="a.txt", language="text")
+    db.add(rec)
+    db.commit()
+
+    crud.reserve_funds(db, user, rec, 400.0)
+    worker_copy = SimpleNamespace(id=rec.id, reserved_amount=400.0)  # نسخهٔ بارگذاری‌شدهٔ worker
+    crud.update_transcription_status(db, rec.id, "canceled")  # لغو هم‌زمان رزرو را آزاد می‌کند
+    assert crud.settle_reserved_funds(db, user, worker_copy, 100.0, "هزینه") == 0
+    db.refresh(user)
+    assert (user.wallet_balance, user.reserved_balance) == (900.0, 0.0)
+
+    # هزینهٔ بیش از موجودی: کار ناموفق نمی‌شود، کسر تا سقف موجودی و کسری برگردانده می‌شود
+    assert crud.settle_reserved_funds(db, user, worker_copy, 1000.0, "هزینه") == 100.0
+    db.refresh(user)
+    assert user.wallet_balance == 0.0
+
+
+def test_async_lookups_match_sync(tmp_path):
+    pytest.importorskip("aiosqlite")
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as db:
+        u = models.User(username="async", hashed_password="x")
+        db.add(u)
+        db.commit()
+        for i in range(3):
+            db.add(models.TranscriptionFile(user_id=u.id, original_filename=f"{i}.mp3", display_filename=f"{i}.mp3", language="fa-IR"))
+        db.commit()
+
+    async def lookup():
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            user = await crud.get_user_by_username_async(db, "async")
+            rows = await crud.get_user_transcriptions_async(db, user.id, limit=2)
+        await engine.dispose()
+        return user, rows
+
+    user, rows = asyncio.run(lookup())
+    assert user.username == "async" and len(rows) == 2
+
+
+def test_async_write_retry_does_not_sleep_on_loop():
+    import asyncio
+    from unittest.mock import patch
+    from sqlalchemy.exc import OperationalError
+    from app.database import retry_on_locked, run_sync_retrying
+
+    calls = []
+
+    @retry_on_locked
+    def write(db, value):
+        calls.append(value)
+        if len(calls) == 1:
+            raise OperationalError("UPDATE", {}, Exception("database is locked"))
+        return value
+
+    class FakeAsyncSession:
+        async def run_sync(self, fn, *args, **kwargs):
+            return fn(self, *args, **kwargs)
+
+        async def rollback(self):
+            pass
+
+    with patch("app.database.time.sleep", side_effect=AssertionError("event loop blocked")):
+        assert asyncio.run(run_sync_retrying(FakeAsyncSession(), write, 7)) == 7
+    assert calls == [7, 7]
+
+
+def _query_plans(db, run):
+    """جزئیات EXPLAIN QUERY PLAN همهٔ SELECTهایی که run اجرا می‌کند"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    conn = db.connection()
+    return [
+        row[-1]
+        for statement, parameters in statements
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    ]
+
+
+@pytest.mark.parametrize(
+    "run",
+    [
+        lambda db, uid: crud.get_user_transcriptions(db, user_id=uid),
+        lambda db, uid: crud.get_all_transcriptions(db),
+        lambda db, uid: crud.get_user_transactions(db, user_id=uid),
+        lambda db, uid: crud.get_all_transactions(db),
+        lambda db, uid: crud.get_all_transactions(db, username_filter="test"),
+    ],
+)
+def test_list_queries_use_indexes(db, user, run):
+    plans = _query_plans(db, lambda: run(db, user.id))
+    assert plans
+    for detail in plans:
+        assert "TEMP B-TREE" not in detail, detail
+        assert not (detail.startswith("SCAN") and "USING" not in detail), detail
@@ -1,9 +1,12 @@
+import shutil
+import subprocess
 import pytest
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 from app.services.audio_processing import AudioProcessor
 from app.services.ai_services import AIService
 
+
 @pytest.fixture
 def mock_audio_file(tmp_path):
     test_file = tmp_path / "test.wav"
@@ -11,6 +14,7 @@ def mock_audio_file(tmp_path):
     test_file.write_bytes(b"RIFF$\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00")
     return test_file
 
+
 def test_audio_processor_cleanup(mock_audio_file):
     processor = AudioProcessor()
     processor.transcribe_audio(mock_audio_file)
@@ -19,6 +23,7 @@ def test_audio_processor_cleanup(mock_audio_file):
     for temp_file in processor.temp_files:
         assert not temp_file.exists()
 
+
 def test_audio_chunk_size_config():
     processor = AudioProcessor()
     assert processor.chunk_sec == 50  # مقدار پیش‌فرض
@@ -27,7 +32,164 @@ def test_audio_chunk_size_config():
         processor = AudioProcessor()
         assert processor.chunk_sec == 30
 
-@patch("requests.post")
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg در دسترس نیست")
+def test_prepare_chunks_streaming(tmp_path):
+    src = tmp_path / "tone.wav"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "sine=duration=125", str(src)],
+        check=True,
+    )
+    with patch("app.core.config.settings.AUDIO_VAD_ENABLED", False), \
+            patch("app.core.config.settings.AUDIO_CHUNK_SIZE", 50), \
+            patch("app.core.config.settings.AUDIO_CHUNK_HANDOFF", "files"):
+        chunks = list(AudioProcessor.prepare_chunks(src))
+    assert [Path(c["path"]).name for c in chunks] == ["tone.part0.flac", "tone.part1.flac", "tone.part2.flac"]
+    assert [(c["start"], c["end"]) for c in chunks] == [(0, 50), (50, 100), (100, 125)]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg در دسترس نیست")
+def test_split_audio_wraps_prepare_chunks(tmp_path):
+    src = tmp_path / "tone.wav"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "sine=duration=70", str(src)],
+        check=True,
+    )
+    with patch("app.core.config.settings.AUDIO_VAD_ENABLED", False), \
+            patch("app.core.config.settings.AUDIO_CHUNK_HANDOFF", "memory"):
+        parts = AudioProcessor.split_audio(src, chunk_sec=30)
+    # فراخوان‌های قدیمی همچنان فهرست فایل‌های قطعه را می‌گیرند، مستقل از AUDIO_CHUNK_HANDOFF
+    assert [p.name for p in parts] == ["tone.part0.flac", "tone.part1.flac", "tone.part2.flac"]
+    assert all(p.exists() for p in parts)
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg در دسترس نیست")
+def test_prepare_chunks_attempt_keeps_other_attempts(tmp_path):
+    src = tmp_path / "tone.wav"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "sine=duration=60", str(src)],
+        check=True,
+    )
+    old_pack = tmp_path / "tone.a1.chunks"
+    old_pack.write_bytes(b"old")
+    with patch("app.core.config.settings.AUDIO_VAD_ENABLED", False), \
+            patch("app.core.config.settings.AUDIO_CHUNK_SIZE", 50), \
+            patch("app.core.config.settings.AUDIO_CHUNK_HANDOFF", "files"):
+        chunks = list(AudioProcessor.prepare_chunks(src, attempt="a2"))
+    assert [Path(c["path"]).name for c in chunks] == ["tone.a2.part0.flac", "tone.a2.part1.flac"]
+    # فایل اجرای قبلی برای تسک‌های در صف آن دست‌نخورده می‌ماند
+    assert old_pack.read_bytes() == b"old"
+
+def test_vad_cuts_in_pause_and_skips_silence():
+    np = pytest.importorskip("numpy")
+    from app.services.vad import iter_speech_chunks
+
+    rate = 8000
+    tone = (0.5 * 32767 * np.sin(2 * np.pi * 440 * np.arange(10 * rate) / rate)).astype(np.int16)
+    audio = np.concatenate([tone, np.zeros(5 * rate, dtype=np.int16), tone])
+    windows = np.array_split(audio, 25)
+
+    chunks = list(iter_speech_chunks(windows, rate, max_sec=12, min_sec=3, threshold_db=-40))
+    assert len(chunks) == 2
+    (s1, e1, _), (s2, e2, samples2) = chunks
+    assert s1 == 0 and 10 <= e1 <= 10.5
+    assert 14.5 <= s2 <= 15 and e2 == 25
+    assert len(samples2) == round((e2 - s2) * rate)
+
+    silent = [np.zeros(rate, dtype=np.int16)] * 5
+    assert list(iter_speech_chunks(silent, rate, max_sec=12, min_sec=3, threshold_db=-40)) == []
+
+
+def test_read_chunk_bytes_from_shared_pack(tmp_path):
+    pytest.importorskip("soundfile")
+    from app.services.audio_encoding import read_chunk_bytes
+
+    pack = tmp_path / "job.chunks"
+    pack.write_bytes(b"aaaa" + b"bbbbbb")
+    assert read_chunk_bytes({"path": str(pack), "offset": 4, "length": 6}) == b"bbbbbb"
+    assert read_chunk_bytes({"data": b"in-memory"}) == b"in-memory"
+
+
+def test_result_cache_lru_eviction_and_counters(tmp_path):
+    from app.services.result_cache import ResultCache
+
+    cache = ResultCache("test", backend="sqlite", path=str(tmp_path / "cache.db"), max_entries=2)
+    cache.set("a", "متن اول")
+    cache.set("b", "متن دوم")
+    assert cache.get("a") == "متن اول"  # a تازه‌تر از b می‌شود
+    cache.set("c", "متن سوم")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "متن سوم"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+
+
+def test_result_cache_batches_read_writes(tmp_path):
+    from app.services.result_cache import ResultCache
+
+    cache = ResultCache("test", backend="sqlite", path=str(tmp_path / "cache.db"))
+    cache.flush_every, cache.flush_interval = 3, 3600
+    cache.set("a", "متن")
+    cache.get("a")
+    cache.get("b")
+    conn = cache._sqlite()
+    assert conn.execute("SELECT COUNT(*) FROM cache_counters WHERE name IN ('hits', 'misses')").fetchone()[0] == 0
+
+    cache.get("a")  # سومین خواندن دسته را یک‌جا می‌نویسد
+    rows = dict(conn.execute("SELECT name, value FROM cache_counters WHERE name IN ('hits', 'misses')"))
+    assert rows == {"hits": 2, "misses": 1}
+
+
+def test_workspace_budget_evicts_oldest(tmp_path):
+    import os
+    from app.core.workspace import WorkspaceManager
+
+    manager = WorkspaceManager(tmpfs_dir="", disk_dir=str(tmp_path), max_bytes=150)
+    with patch.object(manager, "active_job_ids", return_value=set()):
+        first = manager.acquire(1)
+        (first / "a.chunks").write_bytes(b"x" * 100)
+        os.utime(first, (1, 1))
+        second = manager.acquire(2)
+        (second / "b.chunks").write_bytes(b"x" * 100)
+
+        third = manager.acquire(3)
+    assert not first.exists() and second.exists() and third.exists()
+
+    manager.release(2)
+    assert not second.exists()
+
+
+def test_workspace_budget_keeps_running_jobs(tmp_path):
+    import os
+    from app.core.workspace import WorkspaceBudgetExceeded, WorkspaceManager
+
+    manager = WorkspaceManager(tmpfs_dir="", disk_dir=str(tmp_path), max_bytes=150)
+    with patch.object(manager, "active_job_ids", return_value={1, 2}):
+        first = manager.acquire(1)
+        (first / "a.chunks").write_bytes(b"x" * 100)
+        os.utime(first, (1, 1))
+        second = manager.acquire(2)
+        (second / "b.chunks").write_bytes(b"x" * 100)
+
+        with pytest.raises(WorkspaceBudgetExceeded):
+            manager.acquire(3)
+        assert manager.acquire(1) == first  # اجرای مجدد کار در حال اجرا رد نمی‌شود
+    assert first.exists() and second.exists() and not manager.path_for(3).exists()
+
+
+def test_recognizer_not_called_without_rate_permit():
+    import speech_recognition as sr
+    from app.services import audio_processing
+
+    recognizer = MagicMock()
+    with patch.object(audio_processing.recognizer_limiter, "acquire", return_value=False):
+        with pytest.raises(sr.RequestError):
+            audio_processing.recognize_google_limited(recognizer, MagicMock(), "fa-IR")
+    recognizer.recognize_google.assert_not_called()
+
+
+@pytest.mark.usefixtures("ai_circuit")
+@patch("requests.Session.post")
 def test_ai_service_retry(mock_post):
     mock_post.side_effect = requests.exceptions.RequestException("Timeout")
     ai_service = AIService()
@@ -35,4 +197,163 @@ def test_ai_service_retry(mock_post):
     with pytest.raises(requests.exceptions.RequestException):
         ai_service.correct_text("test")
     
-    assert mock_post.call_count == 3  # مطابق با MAX_RETRIES
\ No newline at end of file
+    assert mock_post.call_count == 3  # مطابق با MAX_RETRIES
+
+
+def test_probe_media_rejects_unreadable_file(tmp_path):
+    from app.services.media_probe import MediaProbeError, probe_media
+
+    if shutil.which("ffprobe") is None:
+        pytest.skip("ffprobe در دسترس نیست")
+    junk = tmp_path / "broken.mp3"
+    junk.write_bytes(b"not an audio file" * 10)
+    with pytest.raises(MediaProbeError):
+        probe_media(str(junk))
+
+
+def test_probe_media_reads_duration_and_channels(tmp_path):
+    from app.services.media_probe import probe_media
+
+    if shutil.which("ffprobe") is None or shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg/ffprobe در دسترس نیست")
+    src = tmp_path / "tone.wav"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "sine=duration=3", str(src)],
+        check=True,
+    )
+    info = probe_media(str(src))
+    assert round(info["duration"]) == 3 and info["channels"] == 1
+
+
+def test_pipelined_correction_keeps_order():
+    import concurrent.futures
+    from app.tasks.helpers import correct_segments_pipelined
+
+    class FakeEngine:
+        # گروه اول آخر از همه تمام می‌شود تا ترتیب سرهم‌شدن بررسی شود
+        def __init__(self):
+            self.pool = concurrent.futures.ThreadPoolExecutor()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.pool.shutdown()
+
+        def cache_stats(self):
+            return {"hits": 0, "misses": 3}
+
+        def submit(self, text):
+            import time
+            delay = 0.05 if text.startswith("یک") else 0
+            return self.pool.submit(lambda: (time.sleep(delay), (text.upper(), 10))[1])
+
+    segments = ({"start": i, "end": i + 1, "text": t} for i, t in enumerate(["یک " * 400, "two " * 400, "three"]))
+    with patch("app.tasks.helpers.AICorrectionEngine", FakeEngine), \
+            patch("app.core.config.settings.AI_PIPELINE_CHUNK_TOKENS", 300):
+        raw, corrected, tokens, stats, failed = correct_segments_pipelined(segments, 1.0)
+
+    assert raw.splitlines()[0].startswith("یک")
+    assert corrected.split("\n")[0].startswith("یک") and "TWO" in corrected.split("\n")[1]
+    assert tokens == 30 and failed == 0
+
+
+def test_pipelined_correction_keeps_raw_text_of_failed_groups():
+    import concurrent.futures
+    from app.tasks.helpers import correct_segments_pipelined
+
+    class FakeEngine:
+        def __init__(self):
+            self.pool = concurrent.futures.ThreadPoolExecutor()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.pool.shutdown()
+
+        def cache_stats(self):
+            return {"hits": 0, "misses": 2}
+
+        def submit(self, text):
+            result = ("[خطا] timeout", 0) if text.startswith("two") else (text.upper(), 10)
+            return self.pool.submit(lambda: result)
+
+    segments = ({"start": i, "end": i + 1, "text": t} for i, t in enumerate(["one " * 400, "two " * 400]))
+    with patch("app.tasks.helpers.AICorrectionEngine", FakeEngine), \
+            patch("app.core.config.settings.AI_PIPELINE_CHUNK_TOKENS", 300):
+        raw, corrected, tokens, stats, failed = correct_segments_pipelined(segments, 1.0)
+
+    # گروه ناموفق با متن خام می‌ماند و توکن‌ها فقط از گروه موفق شمرده می‌شوند
+    assert corrected.split("\n") == ["ONE " * 399 + "ONE", "two " * 399 + "two"]
+    assert tokens == 10 and failed == 1
+
+
+def test_text_chunker_keeps_sentences_whole():
+    from app.services.text_processing import estimate_tokens, iter_text_chunks
+
+    sentences = [f"جملهٔ شمارهٔ {i} برای آزمایش تقسیم متن است." for i in range(40)]
+    text = " ".join(sentences[:20]) + "\n\n" + " ".join(sentences[20:])
+
+    chunks = list(iter_text_chunks(text, max_tokens=60, overlap_tokens=20))
+    assert len(chunks) > 1
+    for context, body in chunks:
+        assert estimate_tokens(body) <= 60
+        assert body.endswith(".")  # هیچ جمله‌ای وسط قطعه شکسته نشده است
+    assert " ".join(body for _, body in chunks).split() == text.split()
+    assert chunks[0][0] == "" and chunks[1][0] and chunks[0][1].endswith(chunks[1][0])
+
+
+def test_split_text_into_chunks_accepts_legacy_chunk_size():
+    from app.services.text_processing import split_text_into_chunks
+
+    text = " ".join(f"جملهٔ شمارهٔ {i} برای آزمایش تقسیم متن است." for i in range(40))
+    with pytest.warns(DeprecationWarning):
+        legacy = list(split_text_into_chunks(text, 200))
+    # ۲۰۰ نویسه با دو نویسه به ازای هر توکن همان سقف ۱۰۰ توکنی است
+    assert legacy == list(split_text_into_chunks(text, max_tokens=100))
+    assert len(legacy) > 1
+
+def test_result_cache_size_eviction_and_tokens(tmp_path):
+    from app.services.result_cache import ResultCache
+
+    cache = ResultCache("test", backend="sqlite", path=str(tmp_path / "cache.db"), max_bytes=25)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+    cache.get("a")  # b قدیمی‌ترین می‌شود
+    cache.set("c", "z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "z" * 10
+    assert cache.stats()["bytes"] == 20
+
+
+def test_ai_errors_classified_for_retry():
+    from types import SimpleNamespace
+    from app.services.circuit_breaker import CircuitOpenError, is_retryable, retry_after_of
+
+    def http_error(status, headers=None):
+        err = Exception(f"HTTP {status}")
+        err.response = SimpleNamespace(status_code=status, headers=headers or {})
+        return err
+
+    assert is_retryable(http_error(429)) and is_retryable(http_error(503))
+    assert not is_retryable(http_error(400)) and not is_retryable(http_error(401))
+    assert is_retryable(ConnectionError("reset"))
+    assert not is_retryable(CircuitOpenError(30))
+    assert retry_after_of(http_error(429, {"Retry-After": "12"})) == 12.0
+    assert retry_after_of(http_error(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after_of(http_error(503, {"Retry-After": "soon"})) is None
+
+
+def test_cost_estimates_scale_with_input():
+    from app.services.cost_estimator import (
+        estimate_audio_cost, estimate_audio_tokens, estimate_request_tokens, estimate_text_tokens,
+    )
+
+    short, long_ = "متن کوتاه.", " ".join(["این یک جملهٔ آزمایشی است."] * 500)
+    assert estimate_request_tokens(short) > 0
+    assert estimate_text_tokens(long_) > 10 * estimate_text_tokens(short)
+    assert estimate_audio_tokens(3600) > estimate_audio_tokens(60)
+    assert estimate_audio_cost(600, use_ai=False, token_price=10) == 0
+    assert estimate_audio_cost(600, use_ai=True, token_price=10) == round(estimate_audio_tokens(600) * 10, 2)